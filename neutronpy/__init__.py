@@ -1,33 +1,81 @@
 r"""NeutronPy: open source python library for neutron scattering data analysis
 
+Subpackages and their dependencies are imported on first access, *e.g.*
+``neutronpy.Material`` imports :py:mod:`neutronpy.crystal`, so that
+``import neutronpy`` is fast.
+
 """
 from __future__ import absolute_import
+import importlib
 import sys
 import warnings
-import pkg_resources
-
-from . import constants
-from . import fileio
-from . import functions
-from . import instrument
-from . import models
-from . import spurion
-from . import scattering
-from .crystal import Lattice
-from .crystal import Material
-from .crystal import Sample
-from .crystal import symmetry
-from .data import Data
-from .energy import Energy
-from .instrument import Instrument
-from .lsfit import Fitter
-
-try:
-    from . import gui
-except ImportError:
-    warnings.warn('PyQt5 not found, cannot run Resolution GUI')
-
-__version__ = pkg_resources.require("neutronpy")[0].version
+
+_SUBMODULES = ('constants', 'crystal', 'data', 'energy', 'fileio', 'functions', 'gui', 'instrument', 'lsfit',
+               'models', 'scattering', 'spurion')
+
+_ATTRIBUTES = {'Lattice': ('crystal', 'Lattice'),
+               'Material': ('crystal', 'Material'),
+               'Sample': ('crystal', 'Sample'),
+               'symmetry': ('crystal', 'symmetry'),
+               'Data': ('data', 'Data'),
+               'Energy': ('energy', 'Energy'),
+               'Instrument': ('instrument', 'Instrument'),
+               'Fitter': ('lsfit', 'Fitter')}
+
+__all__ = sorted(set(_SUBMODULES + tuple(_ATTRIBUTES)) - {'gui'})
+
+
+def _get_version():
+    try:
+        from importlib.metadata import version
+    except ImportError:
+        import pkg_resources
+
+        return pkg_resources.require("neutronpy")[0].version
+    return version("neutronpy")
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if name in _ATTRIBUTES:
+        module, attribute = _ATTRIBUTES[name]
+        value = getattr(importlib.import_module('.' + module, __name__), attribute)
+        globals()[name] = value
+        return value
+    if name == '__version__':
+        globals()['__version__'] = _get_version()
+        return globals()['__version__']
+    raise AttributeError('module {0} has no attribute {1}'.format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES) | set(_ATTRIBUTES) | {'__version__'})
+
+
+if sys.version_info < (3, 7):
+    from . import constants
+    from . import fileio
+    from . import functions
+    from . import instrument
+    from . import models
+    from . import spurion
+    from . import scattering
+    from .crystal import Lattice
+    from .crystal import Material
+    from .crystal import Sample
+    from .crystal import symmetry
+    from .data import Data
+    from .energy import Energy
+    from .instrument import Instrument
+    from .lsfit import Fitter
+
+    try:
+        from . import gui
+    except ImportError:
+        warnings.warn('PyQt5 not found, cannot run Resolution GUI')
+
+    __version__ = _get_version()
 
 if sys.version_info[:2] == (2, 6) or sys.version_info[:2] == (3, 3):
     warnings.warn('Support for Python 2.6 and Python 3.3 is depreciated and will be dropped in neutronpy 1.1.0',
@@ -5,6 +5,7 @@ r"""Useful constants for neutron scattering calculations, including:
 * ``periodic_table()`` : Periodic table values
 * ``scattering_lengths()`` : Neutron scattering lengths
 * ``symmetry()`` : Space group information
+* ``databases`` : Registry of the above databases, loaded once per process
 * ``JOULES_TO_MEV`` : Joules-to-meV conversion factor
 * ``BOLTZMANN_IN_MEV_K`` : Boltzmann constant in meV/K
 * ``N_A`` : Avogadro constant
@@ -12,8 +13,604 @@ r"""Useful constants for neutron scattering calculations, including:
 * ``e`` : Electric charge of an electron in Coulombs
 
 """
+import hashlib
 import json
 import os
+import re
+import struct
+import tempfile
+import threading
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+import numpy as np
+
+_DATABASE_FILES = {'magnetic_ion_j': 'magnetic_form_factors.json',
+                   'periodic_table': 'periodic_table.json',
+                   'scattering_lengths': 'scattering_lengths.json',
+                   'symmetry': 'symmetry.json'}
+
+_BINARY_MAGIC = b'NPYDB\x00\x01\x00'
+
+
+class _Missing(object):
+    r"""Marker of a field missing from a record
+    """
+
+
+_MISSING = _Missing()
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+_FLOAT, _INT, _NONE, _LIST = 0, 1, 2, 3
+
+
+def _encode_field(values):
+    r"""Encodes the values of a field of a table as arrays of the same
+    length as the table. Returns the kind of encoding and a dict of arrays.
+    """
+    arrays = {}
+    if any(value is _MISSING for value in values):
+        arrays['present'] = np.array([value is not _MISSING for value in values])
+    present = [value for value in values if value is not _MISSING]
+
+    if all(isinstance(value, str) for value in present):
+        arrays['values'] = np.array(['' if value is _MISSING else value for value in values], dtype=np.str_)
+        return 'str', arrays
+
+    if all(value is None or _is_number(value) or (isinstance(value, list) and len(value) == 2 and
+                                                   all(_is_number(item) for item in value)) for value in present):
+        values = [None if value is _MISSING else value for value in values]
+        arrays['values'] = np.array([complex(*value) if isinstance(value, list) else
+                                     (np.nan if value is None else value) for value in values], dtype=np.complex128)
+        if not any(isinstance(value, list) for value in values):
+            arrays['values'] = arrays['values'].real.copy()
+        arrays['flags'] = np.array([_LIST if isinstance(value, list) else _NONE if value is None else
+                                    _INT if isinstance(value, int) else _FLOAT for value in values], dtype=np.int8)
+        return 'number', arrays
+
+    if all(isinstance(value, list) for value in present):
+        values = [[] if value is _MISSING else value for value in values]
+        arrays['offsets'] = np.cumsum([0] + [len(value) for value in values])
+        flat = [item for value in values for item in value]
+        if all(_is_number(item) for item in flat):
+            arrays['values'] = np.array(flat, dtype=np.float64)
+            return 'numlist', arrays
+        if all(isinstance(item, str) for item in flat):
+            arrays['values'] = np.array(flat, dtype=np.str_)
+            return 'strlist', arrays
+
+    arrays['values'] = np.array([json.dumps(None if value is _MISSING else value) for value in values],
+                                dtype=np.str_)
+    return 'json', arrays
+
+
+def _decode_number(value, flag):
+    if flag == _FLOAT:
+        return float(value.real)
+    if flag == _INT:
+        return int(value.real)
+    if flag == _NONE:
+        return None
+    return [value.real, value.imag]
+
+
+class _Field(object):
+    r"""Field of a :py:class:`_Table`, decoded one value at a time, or as a
+    whole column
+    """
+
+    def __init__(self, kind, arrays):
+        self.kind = kind
+        self.arrays = arrays
+        self._column = None
+
+    def present(self, i):
+        return 'present' not in self.arrays or bool(self.arrays['present'][i])
+
+    def __getitem__(self, i):
+        values = self.arrays['values']
+        if self.kind == 'str':
+            return str(values[i])
+        if self.kind == 'number':
+            return _decode_number(values[i].item(), self.arrays['flags'][i])
+        if self.kind in ('numlist', 'strlist'):
+            offsets = self.arrays['offsets']
+            return values[offsets[i]:offsets[i + 1]].tolist()
+        return json.loads(values[i])
+
+    def column(self):
+        r"""Returns the values of every record, None where missing
+        """
+        if self._column is None:
+            values = self.arrays['values']
+            if self.kind == 'str':
+                column = values.tolist()
+            elif self.kind == 'number':
+                column = [_decode_number(value, flag) for value, flag in zip(values.tolist(),
+                                                                            self.arrays['flags'].tolist())]
+            elif self.kind in ('numlist', 'strlist'):
+                offsets, flat = self.arrays['offsets'].tolist(), values.tolist()
+                column = [flat[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+            else:
+                column = [json.loads(value) for value in values.tolist()]
+            if 'present' in self.arrays:
+                column = [value if present else None for value, present in zip(column, self.arrays['present'])]
+            self._column = column
+        return self._column
+
+
+class _Table(Mapping):
+    r"""Read-only mapping of record name to record dict, stored as one array
+    per field. Records are built on first access.
+    """
+
+    def __init__(self, names, fields):
+        self._names = names
+        self._position = dict((name, i) for i, name in enumerate(names))
+        self._fields = fields
+        self._records = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._records[name]
+        except KeyError:
+            i = self._position[name]
+
+        record = dict((key, field[i]) for key, field in self._fields.items() if field.present(i))
+        return self._records.setdefault(name, record)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._position
+
+    def column(self, field):
+        r"""Returns the values of a field for every record, in order, None
+        where missing
+        """
+        return self._fields[field].column()
+
+
+def _is_table(database):
+    return isinstance(database, dict) and len(database) > 0 and all(
+        isinstance(value, dict) for value in database.values())
+
+
+def _to_arrays(database):
+    r"""Converts a database of records, or of tables of records, to a dict of
+    arrays for :py:func:`_write_arrays`
+    """
+    tables = [('', database)] if not _is_table(next(iter(database.values()), None)) else list(database.items())
+    arrays = {'tables': np.array([path for path, table in tables], dtype=np.str_)}
+    for t, (path, table) in enumerate(tables):
+        fields = []
+        for record in table.values():
+            fields.extend(field for field in record if field not in fields)
+        arrays['{0}.names'.format(t)] = np.array(list(table.keys()), dtype=np.str_)
+        arrays['{0}.fields'.format(t)] = np.array(fields, dtype=np.str_)
+        kinds = []
+        for f, field in enumerate(fields):
+            kind, field_arrays = _encode_field([record.get(field, _MISSING) for record in table.values()])
+            kinds.append(kind)
+            for key, value in field_arrays.items():
+                arrays['{0}.{1}.{2}'.format(t, f, key)] = value
+        arrays['{0}.kinds'.format(t)] = np.array(kinds, dtype=np.str_)
+    return arrays
+
+
+def _from_arrays(arrays):
+    r"""Builds a database of :py:class:`_Table` from the arrays written by
+    :py:func:`_to_arrays`
+    """
+    database = {}
+    for t, path in enumerate(arrays['tables'].tolist()):
+        prefix = '{0}.'.format(t)
+        fields = {}
+        for f, (field, kind) in enumerate(zip(arrays[prefix + 'fields'].tolist(), arrays[prefix + 'kinds'].tolist())):
+            field_prefix = '{0}{1}.'.format(prefix, f)
+            fields[field] = _Field(kind, dict((key[len(field_prefix):], arrays[key]) for key in arrays
+                                              if key.startswith(field_prefix)))
+        table = _Table(arrays[prefix + 'names'].tolist(), fields)
+        if not path:
+            return table
+        database[path] = table
+    return database
+
+
+def _column(table, field):
+    r"""Returns the values of a field for every record of a table
+    """
+    if isinstance(table, _Table):
+        return table.column(field)
+    return [record.get(field) for record in table.values()]
+
+
+def _write_arrays(outfile, arrays):
+    r"""Writes arrays to a binary file: a magic string, the length of a text
+    header with one ``name, dtype, shape, offset`` line per array, the
+    header, and the raw 8-byte aligned data of the arrays
+    """
+    lines, chunks, offset = [], [], 0
+    for key, value in arrays.items():
+        value = np.ascontiguousarray(value)
+        lines.append('\t'.join((key, value.dtype.str, ','.join(str(n) for n in value.shape), str(offset))))
+        chunk = value.tobytes()
+        chunk += b'\0' * (-len(chunk) % 8)
+        chunks.append(chunk)
+        offset += len(chunk)
+
+    header = '\n'.join(lines).encode('utf8')
+    header += b'\n' * (-(len(_BINARY_MAGIC) + 4 + len(header)) % 8)
+    outfile.write(_BINARY_MAGIC)
+    outfile.write(struct.pack('<I', len(header)))
+    outfile.write(header)
+    for chunk in chunks:
+        outfile.write(chunk)
+
+
+def _read_arrays(filename):
+    r"""Reads the arrays written by :py:func:`_write_arrays`, as read-only
+    views of the file contents
+    """
+    with open(filename, 'rb') as infile:
+        contents = infile.read()
+    if not contents.startswith(_BINARY_MAGIC):
+        raise ValueError('{0} is not a binary database'.format(filename))
+
+    length = struct.unpack_from('<I', contents, len(_BINARY_MAGIC))[0]
+    start = len(_BINARY_MAGIC) + 4 + length
+    arrays = {}
+    for line in contents[start - length:start].decode('utf8').strip('\n').split('\n'):
+        key, dtype, shape, offset = line.split('\t')
+        shape = tuple(int(n) for n in shape.split(',')) if shape else ()
+        count = 1
+        for n in shape:
+            count *= n
+        arrays[key] = np.frombuffer(contents, np.dtype(dtype), count, start + int(offset)).reshape(shape)
+    return arrays
+
+
+class DatabaseRegistry(object):
+    r"""Process-wide registry of the neutronpy databases. Each database is
+    loaded from disk once, on first use, and indexed for constant time
+    lookups by ion, element symbol, element name, atomic number, and space
+    group symbol or number.
+
+    Databases are read from a binary form, NumPy arrays for the fields of
+    the records and an array of record names, which is faster to load than
+    the JSON source, and whose records are only built when accessed. The binary files are looked up in `directory`,
+    where they can be shipped, then in `cache_directory`, where they are
+    written on first use. Each binary file holds the SHA-1 checksum of its
+    JSON source, and is rebuilt when the source changes.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory containing the database files. Default: the neutronpy
+        ``database`` directory
+
+    cache_directory : str, optional
+        Directory where binary databases are written. Default: the
+        `NEUTRONPY_CACHE_DIR` environment variable, or
+        `~/.cache/neutronpy`, followed by `database`
+
+    binary : bool, optional
+        If False, databases are always parsed from JSON. Default: True
+
+    Attributes
+    ----------
+    directory : str
+    cache_directory : str
+    binary : bool
+    loaded : list of str
+        Names of the databases loaded so far
+
+    Methods
+    -------
+    get
+    compile
+    preload
+    warm_up
+    clear
+    element
+    scattering_length
+    magnetic_ion
+    space_group
+
+    Notes
+    -----
+    The returned databases and records are shared by every caller, and must
+    not be modified.
+
+    """
+
+    def __init__(self, directory=None, cache_directory=None, binary=True):
+        if directory is None:
+            directory = os.path.join(os.path.dirname(__file__), 'database')
+        if cache_directory is None:
+            cache_directory = os.path.join(os.environ.get('NEUTRONPY_CACHE_DIR', os.path.join(
+                os.path.expanduser('~'), '.cache', 'neutronpy')), 'database')
+        self.directory = directory
+        self.cache_directory = cache_directory
+        self.binary = binary
+        self._databases = {}
+        self._indexes = {}
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        r"""Names of the databases loaded so far
+        """
+        return sorted(self._databases.keys())
+
+    def get(self, name):
+        r"""Returns a database, loading it on first use.
+
+        Parameters
+        ----------
+        name : str
+            One of 'magnetic_ion_j', 'periodic_table', 'scattering_lengths',
+            or 'symmetry'
+
+        Returns
+        -------
+        database : Mapping
+            Read-only mapping of record name to record dict, or of table
+            name to such mappings for 'symmetry'
+
+        """
+        try:
+            return self._databases[name]
+        except KeyError:
+            pass
+
+        if name not in _DATABASE_FILES:
+            raise KeyError('{0} is not a valid database name'.format(name))
+
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = self._load(name)
+        return self._databases[name]
+
+    def _source(self, name):
+        return os.path.join(self.directory, _DATABASE_FILES[name])
+
+    def _binary(self, name, directory):
+        return os.path.join(directory, os.path.splitext(_DATABASE_FILES[name])[0] + '.bin')
+
+    def _load(self, name):
+        if not self.binary:
+            with open(self._source(name), 'r') as infile:
+                return json.load(infile)
+
+        with open(self._source(name), 'rb') as infile:
+            checksum = hashlib.sha1(infile.read()).hexdigest()
+        for directory in (self.directory, self.cache_directory):
+            try:
+                arrays = _read_arrays(self._binary(name, directory))
+                if arrays['checksum'] == checksum:
+                    return _from_arrays(arrays)
+            except (IOError, OSError, KeyError, ValueError, struct.error):
+                pass
+
+        arrays = self._compile(name)
+        try:
+            self._save(name, arrays, self.cache_directory)
+        except (IOError, OSError):
+            pass
+        return _from_arrays(arrays)
+
+    def _compile(self, name):
+        with open(self._source(name), 'rb') as infile:
+            source = infile.read()
+        arrays = _to_arrays(json.loads(source.decode('utf8')))
+        arrays['checksum'] = np.array(hashlib.sha1(source).hexdigest())
+        return arrays
+
+    def _save(self, name, arrays, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        handle, temp = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, 'wb') as outfile:
+                _write_arrays(outfile, arrays)
+            getattr(os, 'replace', os.rename)(temp, self._binary(name, directory))
+        except (IOError, OSError):
+            os.remove(temp)
+            raise
+        return self._binary(name, directory)
+
+    def compile(self, names=None, directory=None):
+        r"""Writes the binary form of databases, *e.g.* to ship them with
+        the package.
+
+        Parameters
+        ----------
+        names : list of str, optional
+            Names of the databases. Default: all of them
+
+        directory : str, optional
+            Output directory. Default: :py:attr:`cache_directory`
+
+        Returns
+        -------
+        filenames : list of str
+
+        """
+        return [self._save(name, self._compile(name), directory or self.cache_directory)
+                for name in (names or sorted(_DATABASE_FILES))]
+
+    def preload(self, names=None):
+        r"""Loads databases ahead of use, *e.g.* in the parent process before
+        forking worker processes, which then share them.
+
+        Parameters
+        ----------
+        names : list of str, optional
+            Names of the databases to load. Default: all of them
+
+        Returns
+        -------
+        self : :class:`DatabaseRegistry`
+
+        """
+        for name in (names or sorted(_DATABASE_FILES)):
+            self.get(name)
+        return self
+
+    def warm_up(self, names=None):
+        r"""Loads databases and builds their lookup indexes ahead of use,
+        *e.g.* as the initializer of a :py:class:`multiprocessing.Pool`.
+
+        Parameters
+        ----------
+        names : list of str, optional
+            Names of the databases to load. Default: all of them
+
+        Returns
+        -------
+        self : :class:`DatabaseRegistry`
+
+        """
+        names = names or sorted(_DATABASE_FILES)
+        self.preload(names)
+        if 'periodic_table' in names:
+            self._index('elements')
+        if 'symmetry' in names:
+            self._index('space_groups')
+        return self
+
+    def clear(self):
+        r"""Discards the loaded databases and indexes, which are loaded
+        again on next use
+        """
+        with self._lock:
+            self._databases.clear()
+            self._indexes.clear()
+
+    def _index(self, name):
+        try:
+            return self._indexes[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if name == 'elements':
+                table = self.get('periodic_table')
+                symbols = list(table)
+                index = {}
+                for num, element, symbol in zip(_column(table, 'num'), _column(table, 'name'), symbols):
+                    if num is not None:
+                        index[num] = symbol
+                    if element is not None:
+                        index[element.lower()] = symbol
+                index.update(zip(symbols, symbols))
+            elif name == 'space_groups':
+                table = self.get('symmetry')['space_groups']
+                symbols = list(table)
+                index = {}
+                for column in ('full_name', 'hermann-manguin_symbol', 'number'):
+                    for key, symbol in zip(_column(table, column), symbols):
+                        if key is not None:
+                            index.setdefault(key, symbol)
+                index.update(zip(symbols, symbols))
+            self._indexes[name] = index
+        return index
+
+    def element(self, key):
+        r"""Returns the periodic table record of an element.
+
+        Parameters
+        ----------
+        key : str or int
+            Element symbol, *e.g.* 'Fe', ion or isotope, *e.g.* 'Fe2+' or
+            '56Fe', element name, or atomic number
+
+        Returns
+        -------
+        element : dict
+            Database of mass, atomic number, density and name
+
+        """
+        index = self._index('elements')
+        table = self.get('periodic_table')
+        try:
+            return table[index[key]]
+        except (KeyError, TypeError):
+            pass
+
+        if isinstance(key, str):
+            if key.lower() in index:
+                return table[index[key.lower()]]
+            symbol = re.sub(r'^\d+|[\d+-]+$', '', key)
+            if symbol in index:
+                return table[index[symbol]]
+
+        raise KeyError('{0} is not a valid element'.format(key))
+
+    def scattering_length(self, ion):
+        r"""Returns the neutron scattering lengths and cross-sections of an
+        element or isotope, *e.g.* 'Fe' or '56Fe'
+
+        """
+        try:
+            return self.get('scattering_lengths')[ion]
+        except KeyError:
+            raise KeyError('{0} is not in the scattering length database'.format(ion))
+
+    def magnetic_ion(self, ion):
+        r"""Returns the j-values of a magnetic ion, *e.g.* 'Fe2+'
+        """
+        try:
+            return self.get('magnetic_ion_j')[ion]
+        except KeyError:
+            raise KeyError('{0} is not in the magnetic form factor database'.format(ion))
+
+    def space_group(self, key):
+        r"""Returns the symbol and record of a space group.
+
+        Parameters
+        ----------
+        key : str or int
+            International symbol, Hermann–Mauguin symbol, full name, or
+            number of the space group
+
+        Returns
+        -------
+        (symbol, space_group) : tuple of str and dict
+
+        """
+        try:
+            symbol = self._index('space_groups')[key]
+        except (KeyError, TypeError):
+            raise KeyError('{0} is not a valid International symbol, Hermann–Mauguin symbol, or space group '
+                           'number'.format(key))
+        return symbol, self.get('symmetry')['space_groups'][symbol]
+
+
+databases = DatabaseRegistry()
+
+
+def _as_dict(value):
+    r"""Returns a new dict from a database or record, recursively, so that
+    the caller can modify it without changing the shared databases
+    """
+    if isinstance(value, Mapping):
+        return dict((key, _as_dict(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_as_dict(item) for item in value]
+    return value
 
 
 def magnetic_ion_j():
@@ -26,12 +623,11 @@ def magnetic_ion_j():
     Returns
     -------
     magnetic_ion_j : dict
-        Database of j-values for magnetic ions
+        Database of j-values for magnetic ions. A new dict is returned,
+        see :py:data:`databases` for the shared, read-only database
 
     """
-    with open(os.path.join(os.path.dirname(__file__),
-                           "database/magnetic_form_factors.json"), 'r') as infile:
-        return json.load(infile)
+    return _as_dict(databases.get('magnetic_ion_j'))
 
 
 def periodic_table():
@@ -46,12 +642,11 @@ def periodic_table():
     -------
     periodic_table : dict
         Database of mass, atomic number, density, mass, and name for all
-        elements in the Periodic table
+        elements in the Periodic table. A new dict is returned, see
+        :py:data:`databases` for the shared, read-only database
 
     """
-    with open(os.path.join(os.path.dirname(__file__),
-                           "database/periodic_table.json"), 'r') as infile:
-        return json.load(infile)
+    return _as_dict(databases.get('periodic_table'))
 
 
 def scattering_lengths():
@@ -65,12 +660,11 @@ def scattering_lengths():
     -------
     scattering_lengths : dict
         Database of elements containing the absolute, coherent, incoheret, and
-        scattering cross-sections and scattering lengths
+        scattering cross-sections and scattering lengths. A new dict is
+        returned, see :py:data:`databases` for the shared, read-only database
 
     """
-    with open(os.path.join(os.path.dirname(__file__),
-                           "database/scattering_lengths.json"), 'r') as infile:
-        return json.load(infile)
+    return _as_dict(databases.get('scattering_lengths'))
 
 
 def symmetry():
@@ -83,12 +677,12 @@ def symmetry():
     Returns
     -------
     lattice_space_groups : dict
-        Database of 230 crystal lattice space groups and their generators
+        Database of 230 crystal lattice space groups and their generators. A
+        new dict is returned, see :py:data:`databases` for the shared,
+        read-only database
 
     """
-    with open(os.path.join(os.path.dirname(__file__),
-                           "database/symmetry.json"), 'r') as infile:
-        return json.load(infile)
+    return _as_dict(databases.get('symmetry'))
 
 
 JOULES_TO_MEV = 1. / 1.6021766208e-19 * 1.e3  # Joules to meV
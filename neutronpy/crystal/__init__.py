@@ -3,6 +3,7 @@ from .lattice import Lattice
 from .material import Material
 from .sample import Sample
 from .symmetry import SpaceGroup
-from .structure_factors import MagneticFormFactor, MagneticStructureFactor, NuclearStructureFactor
+from .structure_factors import (MagneticFormFactor, MagneticFormFactorTable, MagneticStructureFactor,
+                                MagneticStructureFactorEngine, NuclearStructureFactor, StructureFactorEngine)
 from . import symmetry
 from . import tools
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import numpy as np
 
-from ..constants import periodic_table, scattering_lengths
+from ..constants import databases
 
 
 class Atom(object):
@@ -42,21 +42,22 @@ class Atom(object):
         self.Uiso = Uiso
         self.Uaniso = np.matrix(Uaniso)
 
-        if isinstance(scattering_lengths()[ion]['Coh b'], list):
-            b = complex(*scattering_lengths()[ion]['Coh b'])
+        lengths = databases.scattering_length(ion)
+        if isinstance(lengths['Coh b'], list):
+            b = complex(*lengths['Coh b'])
         else:
-            b = scattering_lengths()[ion]['Coh b']
+            b = lengths['Coh b']
 
         if massNorm is True:
-            self.mass = periodic_table()[ion]['mass']
+            self.mass = databases.get('periodic_table')[ion]['mass']
 
             self.b = (b * self.occupancy * self.Mcell / np.sqrt(self.mass))
         else:
             self.b = b / 10.
 
-        self.coh_xs = scattering_lengths()[ion]['Coh xs']
-        self.inc_xs = scattering_lengths()[ion]['Inc xs']
-        self.abs_xs = scattering_lengths()[ion]['Abs xs']
+        self.coh_xs = lengths['Coh xs']
+        self.inc_xs = lengths['Inc xs']
+        self.abs_xs = lengths['Abs xs']
 
     def __repr__(self):
         return "Atom('{0}')".format(self.ion)
@@ -73,6 +74,15 @@ class MagneticAtom(object):
     pos : list(3)
         The position of the atom in r.l.u.
 
+    moment : list(3)
+        The moment of the atom in :math:`\mu_B` along the a, b, c axes
+
+    occupancy : float
+        Occupancy of the site
+
+    g : float, optional
+        Landé g-factor, for the magnetic form factor. Default: 2
+
     Return
     ------
     output : object
@@ -80,11 +90,12 @@ class MagneticAtom(object):
 
     """
 
-    def __init__(self, ion, pos, moment, occupancy):
+    def __init__(self, ion, pos, moment, occupancy, g=2.):
         self.ion = ion
         self.pos = np.array(pos)
         self.moment = moment
         self.occupancy = occupancy
+        self.g = g
 
     def __repr__(self):
         return "MagneticAtom('{0}')".format(self.ion, self.pos, self.moment, self.occupancy)
@@ -10,8 +10,7 @@ from .plot import PlotMaterial
 from .sample import Sample
 from .structure_factors import MagneticStructureFactor, NuclearStructureFactor
 from .symmetry import SpaceGroup
-
-# from ..scattering.pattern import HKLGenerator
+from ..scattering.pattern import HKLGenerator, PowderPattern
 
 
 class MagneticUnitCell(Sample):
@@ -24,22 +23,26 @@ class MagneticUnitCell(Sample):
             self.chirality = 0
         if 'ph' not in unit_cell:
             self.phase = 0
-        self.atoms = []
+        atoms = unit_cell['atoms']
+        for atom in atoms:
+            if 'occupancy' not in atom:
+                atom['occupancy'] = 1.
+
         if 'space_group' in unit_cell:
             self.space_group = SpaceGroup(unit_cell['space_group'])
-            for atom in unit_cell['atoms']:
-                symmetrized_positions = self.space_group.symmetrize_position(atom['pos'])
-                for pos in symmetrized_positions:
-                    self.atoms.append(MagneticAtom(atom['ion'],
-                                                   pos,
-                                                   atom['moment'],
-                                                   atom['occupancy']))
+            self.positions, self.occupancies, self.species, self.sites = self.space_group.expand_sites(
+                [atom['pos'] for atom in atoms],
+                [atom['occupancy'] for atom in atoms],
+                [atom['ion'] for atom in atoms])
         else:
-            for atom in unit_cell['atoms']:
-                self.atoms.append(MagneticAtom(atom['ion'],
-                                               atom['pos'],
-                                               atom['moment'],
-                                               atom['occupancy']))
+            self.positions = np.array([atom['pos'] for atom in atoms], dtype=float)
+            self.occupancies = np.array([atom['occupancy'] for atom in atoms], dtype=float)
+            self.species = np.array([atom['ion'] for atom in atoms])
+            self.sites = np.arange(len(atoms))
+
+        self.atoms = []
+        for pos, occupancy, ion, site in zip(self.positions, self.occupancies, self.species, self.sites):
+            self.atoms.append(MagneticAtom(ion, pos, atoms[site]['moment'], occupancy, atoms[site].get('g', 2.)))
 
         self.propagation_vector = unit_cell['propagation_vector']
 
@@ -51,7 +54,8 @@ class MagneticUnitCell(Sample):
         return "MagneticUnitCell('{0}')".format(self.propagation_vector)
 
 
-class Material(Sample, NuclearStructureFactor, MagneticStructureFactor, PlotMaterial):
+class Material(Sample, NuclearStructureFactor, MagneticStructureFactor, PlotMaterial, HKLGenerator,
+               PowderPattern):
     r"""Class for the Material being supplied for the structure factor calculation
 
     Parameters
@@ -126,6 +130,13 @@ class Material(Sample, NuclearStructureFactor, MagneticStructureFactor, PlotMate
     'space_group' : str or int
         Hermann–Mauguin symbol or international space group number
 
+    'magnetic_unit_cell' : dict
+        Magnetic structure, with 'atoms', a list of dicts with 'ion', 'pos',
+        'moment' in :math:`\mu_B` along a, b, c, and optional 'occupancy'
+        and 'g', and optional 'propagation_vector', 'lattice' and
+        'space_group', defaulting to zero, the lattice of the material and
+        no symmetry. 'magnetic_cell' is accepted as an alias.
+
     Returns
     -------
     output : object
@@ -133,6 +144,11 @@ class Material(Sample, NuclearStructureFactor, MagneticStructureFactor, PlotMate
 
     Attributes
     ----------
+    atoms
+    positions
+    occupancies
+    species
+    sites
     volume
     total_scattering_cross_section
     a
@@ -186,6 +202,8 @@ class Material(Sample, NuclearStructureFactor, MagneticStructureFactor, PlotMate
     find_equivalent_positions
     find_site_multiplicity
     generate_hkl_positions
+    calc_powder_peaks
+    calc_powder_pattern
 
     """
 
@@ -199,7 +217,7 @@ class Material(Sample, NuclearStructureFactor, MagneticStructureFactor, PlotMate
         for item in crystal['composition']:
             if 'occupancy' not in item:
                 item['occupancy'] = 1.
-            self.muCell += const.periodic_table()[item['ion']]['mass'] * item['occupancy']
+            self.muCell += const.databases.element(item['ion'])['mass'] * item['occupancy']
 
         self.Mcell = self.muCell * crystal['formulaUnits']
 
@@ -212,44 +230,42 @@ class Material(Sample, NuclearStructureFactor, MagneticStructureFactor, PlotMate
         else:
             self.wavelength = 2.359
 
+        for item in crystal['composition']:
+            if 'Uiso' not in item:
+                item['Uiso'] = 0
+            if 'Uaniso' not in item:
+                item['Uaniso'] = np.matrix(np.zeros((3, 3)))
+
+        composition = crystal['composition']
         if 'space_group' in crystal:
             self.space_group = SpaceGroup(crystal['space_group'])
-            self.atoms = []
-            for atom in crystal['composition']:
-                if 'Uiso' not in atom:
-                    atom['Uiso'] = 0
-                if 'Uaniso' not in item:
-                    atom['Uaniso'] = np.matrix(np.zeros((3, 3)))
-                if 'occupancy' not in item:
-                    atom['occupancy'] = 1.
-                symmetrized_positions = self.space_group.symmetrize_position(atom['pos'])
-                for pos in symmetrized_positions:
-                    self.atoms.append(Atom(atom['ion'],
-                                           pos,
-                                           atom['occupancy'],
-                                           self.Mcell,
-                                           crystal['massNorm'],
-                                           atom['Uiso'],
-                                           atom['Uaniso']))
+            self.positions, self.occupancies, self.species, self.sites = self.space_group.expand_sites(
+                [item['pos'] for item in composition],
+                [item['occupancy'] for item in composition],
+                [item['ion'] for item in composition])
         else:
-            self.atoms = []
-            for item in crystal['composition']:
-                if 'Uiso' not in item:
-                    item['Uiso'] = 0
-                if 'Uaniso' not in item:
-                    item['Uaniso'] = np.matrix(np.zeros((3, 3)))
-                if 'occupancy' not in item:
-                    item['occupancy'] = 1.
-                self.atoms.append(Atom(item['ion'],
-                                       item['pos'],
-                                       item['occupancy'],
-                                       self.Mcell,
-                                       crystal['massNorm'],
-                                       item['Uiso'],
-                                       item['Uaniso']))
-
-        if 'magnetic_unit_cell' in crystal:
-            self.magnetic_unit_cell = MagneticUnitCell(crystal['magnetic_cell'])
+            self.positions = np.array([item['pos'] for item in composition], dtype=float)
+            self.occupancies = np.array([item['occupancy'] for item in composition], dtype=float)
+            self.species = np.array([item['ion'] for item in composition])
+            self.sites = np.arange(len(composition))
+
+        self.atoms = []
+        for pos, occupancy, ion, site in zip(self.positions, self.occupancies, self.species, self.sites):
+            self.atoms.append(Atom(ion,
+                                   pos,
+                                   occupancy,
+                                   self.Mcell,
+                                   crystal['massNorm'],
+                                   composition[site]['Uiso'],
+                                   composition[site]['Uaniso']))
+
+        for key in ('magnetic_unit_cell', 'magnetic_cell'):
+            if key in crystal:
+                magnetic_unit_cell = dict(crystal[key])
+                magnetic_unit_cell.setdefault('lattice', crystal['lattice'])
+                magnetic_unit_cell.setdefault('propagation_vector', [0., 0., 0.])
+                self.magnetic_unit_cell = MagneticUnitCell(magnetic_unit_cell)
+                break
 
         if 'mosaic' not in crystal:
             crystal['mosaic'] = None
@@ -1,24 +1,178 @@
 # -*- coding: utf-8 -*-
 r"""Structure Factors
 
+StructureFactorEngine
 NuclearStructureFactor
+MagneticStructureFactorEngine
 MagneticStructureFactor
 MagneticFormFactor
+MagneticFormFactorTable
 
 """
 import numpy as np
 
-from ..constants import magnetic_ion_j
+from ..constants import databases
+
+
+class StructureFactorEngine(object):
+    r"""Array-backed structure factor calculator for many reflections.
+
+    Atom positions, scattering lengths and displacement parameters are
+    stored as arrays, and the structure factors of a chunk of reflections
+    are computed as one matrix product,
+    :math:`F = \exp(2\pi i \mathbf{H} \mathbf{X}^T) \mathbf{b}`, with
+    the Debye-Waller factor of every atom at every reflection.
+
+    Parameters
+    ----------
+    positions : array_like
+        Fractional coordinates of the atoms, shape (n_atoms, 3)
+
+    b : array_like
+        Scattering length of each atom, including occupancy
+
+    Uiso : array_like, optional
+        Isotropic displacement parameter of each atom in Å\ :sup:`2`.
+        Default: 0
+
+    Uaniso : array_like, optional
+        Anisotropic displacement parameters :math:`U_{ij}` of each atom in
+        Å\ :sup:`2`, shape (n_atoms, 3, 3). Default: 0
+
+    chunk_size : int, optional
+        Default: 1048576. Maximum number of elements of the (reflections,
+        atoms) arrays computed at once, which bounds memory use.
+
+    Attributes
+    ----------
+    positions : ndarray
+    b : ndarray
+    Uiso : ndarray
+    Uaniso : ndarray
+    chunk_size : int
+
+    Methods
+    -------
+    debye_waller
+    calculate
+
+    """
+
+    def __init__(self, positions, b, Uiso=0., Uaniso=None, chunk_size=2 ** 20):
+        self.positions = np.reshape(np.asarray(positions, dtype=float), (-1, 3))
+        n_atoms = len(self.positions)
+        self.b = np.broadcast_to(np.asarray(b, dtype=complex), (n_atoms,)).copy()
+        self.Uiso = np.broadcast_to(np.asarray(Uiso, dtype=float), (n_atoms,)).copy()
+        if Uaniso is None:
+            Uaniso = np.zeros((3, 3))
+        self.Uaniso = np.broadcast_to(np.asarray(Uaniso, dtype=float), (n_atoms, 3, 3)).copy()
+        self.chunk_size = int(chunk_size)
+
+    def debye_waller(self, hkl, Gstar):
+        r"""Calculates the Debye-Waller factor of every atom at every
+        reflection.
+
+        Parameters
+        ----------
+        hkl : array_like
+            Reflections in r.l.u., shape (n_hkl, 3)
+
+        Gstar : array_like
+            Metric tensor of the reciprocal lattice, see
+            :py:attr:`.Lattice.Gstar`
+
+        Returns
+        -------
+        dw : ndarray or None
+            Array of shape (n_hkl, n_atoms), None if every displacement
+            parameter is zero
+
+        Notes
+        -----
+        With :math:`s^2 = 1/d^2 = 4 \sin^2\theta / \lambda^2`, the factor
+        is :math:`\exp(-2 \pi^2 U_{iso} s^2)
+        \exp(-2 \pi^2 \sum_{ij} U_{ij} h_i h_j a^*_i a^*_j)`.
+
+        """
+        isotropic, anisotropic = np.any(self.Uiso), np.any(self.Uaniso)
+        if not (isotropic or anisotropic):
+            return None
+
+        hkl = np.reshape(np.asarray(hkl, dtype=float), (-1, 3))
+        gstar = np.asarray(Gstar, dtype=float) / 4. / np.pi ** 2
+        exponent = np.zeros((len(hkl), len(self.positions)))
+
+        if isotropic:
+            s2 = np.einsum('ni,ij,nj->n', hkl, gstar, hkl)
+            exponent += s2[:, np.newaxis] * self.Uiso[np.newaxis, :]
+        if anisotropic:
+            scaled = hkl * np.sqrt(np.diag(gstar))
+            exponent += np.einsum('ni,aij,nj->na', scaled, self.Uaniso, scaled)
+
+        return np.exp(-2. * np.pi ** 2 * exponent)
+
+    def calculate(self, hkl, Gstar=None):
+        r"""Calculates the structure factors of many reflections.
+
+        Parameters
+        ----------
+        hkl : array_like
+            Reflections in r.l.u., shape (n_hkl, 3)
+
+        Gstar : array_like, optional
+            Metric tensor of the reciprocal lattice, required for the
+            Debye-Waller factor. Default: None, no Debye-Waller factor
+
+        Returns
+        -------
+        F : ndarray
+            Complex structure factor of each reflection
+
+        """
+        hkl = np.reshape(np.asarray(hkl, dtype=float), (-1, 3))
+        output = np.empty(len(hkl), dtype=complex)
+        step = max(1, self.chunk_size // max(1, len(self.positions)))
+
+        for start in range(0, len(hkl), step):
+            chunk = hkl[start:start + step]
+            phase = np.exp(2j * np.pi * np.dot(chunk, self.positions.T))
+            if Gstar is not None:
+                dw = self.debye_waller(chunk, Gstar)
+                if dw is not None:
+                    phase *= dw
+            output[start:start + step] = np.dot(phase, self.b)
+
+        return output
 
 
 class NuclearStructureFactor(object):
     r"""Class containing nuclear structure factor calculator
 
+    Attributes
+    ----------
+    structure_factor_engine
+
     Methods
     -------
     calc_nuc_str_fac
 
     """
+    @property
+    def structure_factor_engine(self):
+        r"""The :class:`.StructureFactorEngine` of the atoms of the material,
+        built on first access and rebuilt if :attr:`atoms` is replaced or
+        resized
+        """
+        key = (id(self.atoms), len(self.atoms))
+        if getattr(self, '_structure_factor_engine_key', None) != key:
+            self._structure_factor_engine = StructureFactorEngine(
+                [atom.pos for atom in self.atoms],
+                [atom.occupancy * atom.b for atom in self.atoms],
+                [atom.Uiso for atom in self.atoms],
+                [np.asarray(atom.Uaniso) for atom in self.atoms])
+            self._structure_factor_engine_key = key
+        return self._structure_factor_engine
+
     def calc_nuc_str_fac(self, hkl):
         r"""Calculates the structural form factor of the material.
 
@@ -35,27 +189,26 @@ class NuclearStructureFactor(object):
 
         Notes
         -----
+        Computed by :attr:`structure_factor_engine` for all positions at
+        once, including the Debye-Waller factor of each position.
 
         """
+        h, k, l = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in hkl])
 
-        h, k, l = hkl
+        NSF = self.structure_factor_engine.calculate(np.stack((h.ravel(), k.ravel(), l.ravel()), axis=-1), self.Gstar)
 
-        # Ensures input arrays are complex ndarrays
-        if isinstance(h, (np.ndarray, list, tuple)):
-            h = np.array(h).astype(complex)
-        if isinstance(k, (np.ndarray, list, tuple)):
-            k = np.array(k).astype(complex)
-        if isinstance(l, (np.ndarray, list, tuple)):
-            l = np.array(l).astype(complex)
+        if h.ndim == 0:
+            return NSF[0]
+        return NSF.reshape(h.shape)
 
-        # construct structure factor
-        NSF = 0 * 1j
-        for atom in self.atoms:
-            NSF += atom.occupancy * atom.b * np.exp(1j * 2. * np.pi * (h * atom.pos[0] + k * atom.pos[1] + l * atom.pos[2])) * \
-                np.exp(-8 * np.pi ** 2 * atom.Uiso * np.sin(np.deg2rad(self.get_two_theta(atom.pos, self.wavelength) / 2.)) ** 2 / self.wavelength ** 2) * \
-                np.exp(-np.float(np.dot(np.dot(atom.pos, atom.Uaniso), atom.pos)))
 
-        return NSF
+def _j_expansion(coefficients, x2):
+    r"""Evaluates the 3-gaussian approximation of :math:`<j_l>`, without the
+    :math:`x^2` prefactor of l > 0, for coefficients of shape (n_ions, 7) and
+    :math:`x^2` of any shape; returns an array of shape (n_ions,) + x2.shape
+    """
+    c = np.reshape(np.asarray(coefficients, dtype=float)[:, :7], (-1, 7) + (1,) * np.ndim(x2))
+    return c[:, 0] * np.exp(-c[:, 1] * x2) + c[:, 2] * np.exp(-c[:, 3] * x2) + c[:, 4] * np.exp(-c[:, 5] * x2) + c[:, 6]
 
 
 class MagneticFormFactor(object):
@@ -78,12 +231,10 @@ class MagneticFormFactor(object):
 
     def __init__(self, ion):
         self.ion = ion
-        try:
-            self.j0 = magnetic_ion_j()[self.ion]['j0']
-            self.j2 = magnetic_ion_j()[self.ion]['j2']
-            self.j4 = magnetic_ion_j()[self.ion]['j4']
-        except ValueError:
-            raise ValueError('No such ion was found in database.')
+        j = databases.magnetic_ion(self.ion)
+        self.j0 = j['j0']
+        self.j2 = j['j2']
+        self.j4 = j['j4']
 
     def __repr__(self):
         return "MagneticFormFactor('{0}')".format(self.ion)
@@ -123,48 +274,408 @@ class MagneticFormFactor(object):
 
         if q is None:
             if qrange is None:
-                q = np.linspace(0., 2., 2. / 0.025 + 1)
-            else:
-                q = np.linspace(qrange[0], qrange[1], (qrange[1] - qrange[0]) / 0.025 + 1)
+                qrange = [0., 2.]
+            q = np.linspace(qrange[0], qrange[1], int(np.round((qrange[1] - qrange[0]) / 0.025)) + 1)
         if g is None:
             g = 2.
 
-        x = q / 4. / np.pi
-
-        j0 = (self.j0[0] * np.exp(-self.j0[1] * x ** 2) + self.j0[2] *
-              np.exp(-self.j0[3] * x ** 2) + self.j0[4] *
-              np.exp(-self.j0[5] * x ** 2) + self.j0[6])
+        x2 = (np.asarray(q) / 4. / np.pi) ** 2
 
-        j2 = x ** 2 * (self.j2[0] * np.exp(-self.j2[1] * x ** 2) +
-                       self.j2[2] * np.exp(-self.j2[3] * x ** 2) +
-                       self.j2[4] * np.exp(-self.j2[5] * x ** 2) +
-                       self.j2[6])
-
-        j4 = x ** 2 * (self.j4[0] * np.exp(-self.j4[1] * x ** 2) +
-                       self.j4[2] * np.exp(-self.j4[3] * x ** 2) +
-                       self.j4[4] * np.exp(-self.j4[5] * x ** 2) +
-                       self.j4[6])
+        j0 = _j_expansion([self.j0], x2)[0]
+        j2 = x2 * _j_expansion([self.j2], x2)[0]
+        j4 = x2 * _j_expansion([self.j4], x2)[0]
 
         ff = j0 + (2. / g - 1.) * j2
 
         return ff, q, j0, j2, j4
 
 
+class MagneticFormFactorTable(object):
+    r"""Magnetic form factors of many ions, tabulated once per ion and
+    g-factor for fast evaluation, *e.g.* at every quadrature point of a
+    resolution-convolved magnetic model.
+
+    Parameters
+    ----------
+    qmax : float, optional
+        Default: 25. Upper limit of the tables in Å\ :sup:`-1`. Form factors
+        at larger :math:`|Q|` are evaluated exactly.
+
+    step : float, optional
+        Default: 0.01. Spacing of the tables in Å\ :sup:`-1`. With the
+        default spacing, linear interpolation is accurate to 1e-5 for every
+        ion in the database and g between 1 and 2, see :py:meth:`accuracy`.
+
+    Attributes
+    ----------
+    qmax : float
+    step : float
+    q : ndarray
+        Points of the tables
+
+    Methods
+    -------
+    table
+    accuracy
+    calc_mag_form_fac
+    clear
+
+    """
+
+    def __init__(self, qmax=25., step=0.01):
+        self.qmax = float(qmax)
+        self.step = float(step)
+        self.q = np.arange(int(np.ceil(self.qmax / self.step)) + 1) * self.step
+        self._coefficients = {}
+        self._tables = {}
+
+    def _ion_coefficients(self, ions):
+        r"""Returns the j0 and j2 coefficients of the ions, shape (n_ions, 7)
+        """
+        for ion in ions:
+            if ion not in self._coefficients:
+                j = databases.magnetic_ion(ion)
+                self._coefficients[ion] = (np.asarray(j['j0'][:7], dtype=float), np.asarray(j['j2'][:7], dtype=float))
+        return (np.array([self._coefficients[ion][0] for ion in ions]),
+                np.array([self._coefficients[ion][1] for ion in ions]))
+
+    def _exact(self, ions, q, g):
+        j0, j2 = self._ion_coefficients(ions)
+        x2 = (q / 4. / np.pi) ** 2
+        g = np.reshape(g, (-1,) + (1,) * np.ndim(x2))
+        return _j_expansion(j0, x2) + (2. / g - 1.) * x2 * _j_expansion(j2, x2)
+
+    def table(self, ion, g=2.):
+        r"""Returns the form factor of an ion at the points :attr:`q`,
+        computed on first use and cached by ion and g-factor.
+
+        Parameters
+        ----------
+        ion : str
+            Name of the ion, *e.g.* 'Fe2+'
+
+        g : float, optional
+            Landé g-factor. Default: 2
+
+        Returns
+        -------
+        table : ndarray
+            Read-only array of the form factor at :attr:`q`
+
+        """
+        key = (ion, float(g))
+        if key not in self._tables:
+            table = self._exact([ion], self.q, [float(g)])[0]
+            table.flags.writeable = False
+            self._tables[key] = table
+        return self._tables[key]
+
+    def accuracy(self, ion, g=2.):
+        r"""Estimates the largest error of linear interpolation in the table
+        of an ion, from the error at the midpoints of the table.
+
+        Parameters
+        ----------
+        ion : str
+            Name of the ion
+
+        g : float, optional
+            Landé g-factor. Default: 2
+
+        Returns
+        -------
+        error : float
+            Largest absolute error
+
+        """
+        table = self.table(ion, g)
+        midpoints = self._exact([ion], self.q[:-1] + self.step / 2., [float(g)])[0]
+        return float(np.max(np.abs((table[:-1] + table[1:]) / 2. - midpoints)))
+
+    def calc_mag_form_fac(self, ions, q, g=2., interpolate=True):
+        r"""Calculates the magnetic form factors of one or many ions.
+
+        Parameters
+        ----------
+        ions : str or list of str
+            Name of the ion, or names of many ions, *e.g.* of the sites of a
+            magnetic structure
+
+        q : float or array_like
+            :math:`|Q|` in Å\ :sup:`-1`, of any shape
+
+        g : float or array_like, optional
+            Landé g-factor, or g-factor of each ion. Default: 2
+
+        interpolate : bool, optional
+            If True, form factors are interpolated in the tables, see
+            :py:meth:`accuracy`, else they are evaluated exactly. Default:
+            True
+
+        Returns
+        -------
+        ff : float or ndarray
+            Form factor of shape ``q.shape``, or ``(len(ions),) + q.shape``
+            if `ions` is a list
+
+        Notes
+        -----
+        The form factor is
+        :math:`f(q) = <j_0(q)> + (\frac{2}{g}-1)<j_2(q)>`, see
+        :py:meth:`MagneticFormFactor.calc_mag_form_fac`.
+
+        """
+        single = isinstance(ions, str)
+        if single:
+            ions = [ions]
+        q = np.abs(np.asarray(q, dtype=float))
+        shape, q = q.shape, q.ravel()
+        g = np.broadcast_to(np.asarray(g, dtype=float), (len(ions),))
+
+        if not interpolate:
+            ff = self._exact(ions, q, g)
+        else:
+            tables = np.array([self.table(ion, value) for ion, value in zip(ions, g)])
+            position = np.minimum(q, self.qmax) / self.step
+            index = np.minimum(position.astype(np.int64), len(self.q) - 2)
+            fraction = position - index
+            ff = tables[:, index] * (1. - fraction) + tables[:, index + 1] * fraction
+
+            outside = q > self.qmax
+            if np.any(outside):
+                ff[:, outside] = self._exact(ions, q[outside], g)
+
+        ff = ff.reshape((len(ions),) + shape)
+        return ff[0] if single else ff
+
+    def clear(self):
+        r"""Removes every cached table
+        """
+        self._tables.clear()
+
+
+magnetic_form_factors = MagneticFormFactorTable()
+
+
+class MagneticStructureFactorEngine(object):
+    r"""Array-backed magnetic structure factor calculator for many
+    wave-vectors, *e.g.* every harmonic of a propagation vector.
+
+    Atom positions, moments, occupancies and ions are stored as arrays, and
+    the magnetic structure factors of a chunk of wave-vectors are computed
+    as one matrix product,
+    :math:`\mathbf{F}_M = p \exp(2\pi i \mathbf{Q} \mathbf{X}^T)
+    (f \mathbf{M})`, with the form factor of every atom at every
+    wave-vector taken from a :class:`.MagneticFormFactorTable`.
+
+    Parameters
+    ----------
+    positions : array_like
+        Fractional coordinates of the atoms, shape (n_atoms, 3)
+
+    moments : array_like
+        Moments, or Fourier components of the moments, of the atoms in
+        :math:`\mu_B`, along the a, b, c axes, shape (n_atoms, 3)
+
+    ions : list of str
+        Ion of each atom, for the form factor
+
+    occupancies : array_like, optional
+        Occupancy of each atom. Default: 1
+
+    g : float or array_like, optional
+        Landé g-factor of each atom. Default: 2
+
+    form_factors : :class:`.MagneticFormFactorTable`, optional
+        Default: the shared table :py:data:`magnetic_form_factors`
+
+    chunk_size : int, optional
+        Default: 1048576. Maximum number of elements of the (wave-vectors,
+        atoms) arrays computed at once, which bounds memory use.
+
+    Attributes
+    ----------
+    positions : ndarray
+    moments : ndarray
+    ions : ndarray
+    occupancies : ndarray
+    g : ndarray
+    chunk_size : int
+
+    Methods
+    -------
+    calculate
+    interaction_vector
+
+    Notes
+    -----
+    :math:`p = 0.2695 \times 10^{-12}` cm is the magnetic scattering length
+    of one :math:`\mu_B`, in the units of the nuclear scattering lengths of
+    :class:`.StructureFactorEngine`.
+
+    """
+
+    def __init__(self, positions, moments, ions, occupancies=1., g=2., form_factors=None, chunk_size=2 ** 20):
+        self.positions = np.reshape(np.asarray(positions, dtype=float), (-1, 3))
+        n_atoms = len(self.positions)
+        self.moments = np.broadcast_to(np.asarray(moments, dtype=complex), (n_atoms, 3)).copy()
+        self.ions = np.broadcast_to(np.asarray(ions), (n_atoms,)).copy()
+        self.occupancies = np.broadcast_to(np.asarray(occupancies, dtype=float), (n_atoms,)).copy()
+        self.g = np.broadcast_to(np.asarray(g, dtype=float), (n_atoms,)).copy()
+        self.form_factors = magnetic_form_factors if form_factors is None else form_factors
+        self.chunk_size = int(chunk_size)
+
+        kinds = np.unique(np.stack((self.ions.astype(str), self.g.astype(str)), axis=-1), axis=0,
+                          return_inverse=True)
+        self._kinds, self._kind_index = kinds[0], np.ravel(kinds[1])
+
+    def _cartesian(self, Gstar):
+        r"""Returns the matrices converting wave-vectors in r.l.u. and moments
+        along the a, b, c axes to the same Cartesian frame
+        """
+        reciprocal = np.linalg.cholesky(np.asarray(Gstar, dtype=float)).T
+        real = 2. * np.pi * np.linalg.inv(reciprocal).T
+        return reciprocal, real / np.linalg.norm(real, axis=0)
+
+    def calculate(self, hkl, Gstar):
+        r"""Calculates the magnetic structure factors of many wave-vectors.
+
+        Parameters
+        ----------
+        hkl : array_like
+            Wave-vectors in r.l.u., *e.g.* :math:`\mathbf{G} \pm
+            \mathbf{k}`, shape (n_hkl, 3)
+
+        Gstar : array_like
+            Metric tensor of the reciprocal lattice, see
+            :py:attr:`.Lattice.Gstar`
+
+        Returns
+        -------
+        F : ndarray
+            Complex magnetic structure factor of each wave-vector, shape
+            (n_hkl, 3), in a Cartesian frame whose x axis is along
+            :math:`\mathbf{a}^*`
+
+        """
+        hkl = np.reshape(np.asarray(hkl, dtype=float), (-1, 3))
+        reciprocal, real = self._cartesian(Gstar)
+        moments = np.dot(self.moments, real.T) * self.occupancies[:, np.newaxis]
+        output = np.empty((len(hkl), 3), dtype=complex)
+        step = max(1, self.chunk_size // max(1, len(self.positions)))
+
+        for start in range(0, len(hkl), step):
+            chunk = hkl[start:start + step]
+            q = np.linalg.norm(np.dot(chunk, reciprocal.T), axis=-1)
+            ff = np.array([self.form_factors.calc_mag_form_fac(ion, q, float(g)) for ion, g in self._kinds])
+            phase = np.exp(2j * np.pi * np.dot(chunk, self.positions.T)) * ff[self._kind_index].T
+            output[start:start + step] = 0.2695 * np.dot(phase, moments)
+
+        return output
+
+    def interaction_vector(self, hkl, Gstar):
+        r"""Calculates the magnetic interaction vectors of many wave-vectors,
+        *i.e.* the component of the magnetic structure factor perpendicular
+        to the wave-vector,
+        :math:`\mathbf{M}_\perp = \mathbf{F}_M - (\mathbf{F}_M \cdot
+        \hat{\mathbf{Q}}) \hat{\mathbf{Q}}`.
+
+        Parameters
+        ----------
+        hkl : array_like
+            Wave-vectors in r.l.u., shape (n_hkl, 3)
+
+        Gstar : array_like
+            Metric tensor of the reciprocal lattice
+
+        Returns
+        -------
+        M : ndarray
+            Complex interaction vector of each wave-vector, shape (n_hkl, 3),
+            in the frame of :py:meth:`calculate`. Equal to the structure
+            factor at :math:`\mathbf{Q} = 0`.
+
+        """
+        hkl = np.reshape(np.asarray(hkl, dtype=float), (-1, 3))
+        F = self.calculate(hkl, Gstar)
+        q = np.dot(hkl, self._cartesian(Gstar)[0].T)
+        norm = np.linalg.norm(q, axis=-1, keepdims=True)
+        q = np.divide(q, norm, out=np.zeros_like(q), where=norm > 0)
+        return F - np.sum(F * q, axis=-1, keepdims=True) * q
+
+
 class MagneticStructureFactor(object):
     r"""Class containing magnetic structure factor calculator
 
+    Attributes
+    ----------
+    magnetic_structure_factor_engine
+
     Methods
     -------
     calc_mag_int_vec
     calc_mag_str_fac
 
     """
-    def calc_mag_int_vec(self):
-        r"""Calculates magnetic interaction vector
+    @property
+    def magnetic_structure_factor_engine(self):
+        r"""The :class:`.MagneticStructureFactorEngine` of the atoms of the
+        magnetic unit cell, built on first access and rebuilt if its
+        :attr:`atoms` is replaced or resized
         """
-        pass
+        cell = getattr(self, 'magnetic_unit_cell', None)
+        if cell is None:
+            raise AttributeError('{0} has no magnetic unit cell'.format(self))
+
+        key = (id(cell.atoms), len(cell.atoms))
+        if getattr(self, '_magnetic_structure_factor_engine_key', None) != key:
+            self._magnetic_structure_factor_engine = MagneticStructureFactorEngine(
+                [atom.pos for atom in cell.atoms],
+                [atom.moment for atom in cell.atoms],
+                [atom.ion for atom in cell.atoms],
+                [atom.occupancy for atom in cell.atoms],
+                [atom.g for atom in cell.atoms])
+            self._magnetic_structure_factor_engine_key = key
+        return self._magnetic_structure_factor_engine
+
+    def _calc_magnetic(self, hkl, method):
+        h, k, l = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in hkl])
+        output = method(np.stack((h.ravel(), k.ravel(), l.ravel()), axis=-1), self.magnetic_unit_cell.Gstar)
+        return output.reshape(h.shape + (3,))
+
+    def calc_mag_int_vec(self, hkl):
+        r"""Calculates magnetic interaction vector, the component of the
+        magnetic structure factor perpendicular to :math:`\mathbf{Q}`, whose
+        squared modulus is proportional to the magnetic intensity.
+
+        Parameters
+        ----------
+        hkl : tuple of floats, or tuple of array-like
+            Wave-vectors in r.l.u. of the magnetic unit cell, *e.g.* a
+            nuclear position plus the propagation vector
+
+        Returns
+        -------
+        M : ndarray
+            Interaction vectors, with shape ``h.shape + (3,)``, see
+            :py:meth:`.MagneticStructureFactorEngine.interaction_vector`
 
-    def calc_mag_str_fac(self):
+        """
+        return self._calc_magnetic(hkl, self.magnetic_structure_factor_engine.interaction_vector)
+
+    def calc_mag_str_fac(self, hkl):
         r"""Calculates magnetic structure factor
+
+        Parameters
+        ----------
+        hkl : tuple of floats, or tuple of array-like
+            Wave-vectors in r.l.u. of the magnetic unit cell
+
+        Returns
+        -------
+        F : ndarray
+            Vector magnetic structure factors, with shape ``h.shape + (3,)``,
+            see :py:meth:`.MagneticStructureFactorEngine.calculate`
+
         """
-        pass
+        return self._calc_magnetic(hkl, self.magnetic_structure_factor_engine.calculate)
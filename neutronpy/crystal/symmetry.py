@@ -2,11 +2,16 @@
 r"""Symmetry operations
 
 """
+import sys
+from fractions import Fraction
+
 import numpy as np
 
-from ..constants import symmetry
+from .. import constants
+from ..constants import databases
 
-space_groups = symmetry()['space_groups']
+_TRANSLATION_DENOMINATOR = 48
+_OPERATION_TABLES = {}
 
 
 class SpaceGroup(object):
@@ -27,32 +32,24 @@ class SpaceGroup(object):
     Methods
     -------
     symmetrize_position
+    expand_sites
 
     """
     def __init__(self, symbol='P1'):
-        if isinstance(symbol, int):
-            for key, value in space_groups.items():
-                if value['number'] == symbol:
-                    self._symbol = key
-        elif isinstance(symbol, str):
-            if symbol in space_groups:
-                self._symbol = symbol
-            else:
-                for key, value in space_groups.items():
-                    if value['hermann-manguin_symbol'] == symbol or value['full_name'] == symbol:
-                        self._symbol = key
-        else:
+        if not isinstance(symbol, (int, str)):
             raise KeyError('{0} is not a valid International symbol, Hermann–Mauguin symbol, or space group number'.format(symbol))
 
-        self.point_group = space_groups[self.symbol]['point_group']
-        self.full_name = space_groups[self.symbol]['full_name']
-        self._generators_str = space_groups[self.symbol]['generators']
-        self.lattice_type = space_groups[self.symbol]['type']
-        self.group_number = space_groups[self.symbol]['number']
-        self.hm_symbol = space_groups[self.symbol]['hermann-manguin_symbol']
+        self._symbol, space_group = databases.space_group(symbol)
+
+        self.point_group = space_group['point_group']
+        self.full_name = space_group['full_name']
+        self._generators_str = space_group['generators']
+        self.lattice_type = space_group['type']
+        self.group_number = space_group['number']
+        self.hm_symbol = space_group['hermann-manguin_symbol']
         self._generators_mat = get_generator_from_str(self._generators_str)
-        self.total_operations = space_groups[self.symbol]['total_operations']
-        self.symmetry_operations = self._symmetry_operations_from_generators()
+        self.total_operations = space_group['total_operations']
+        self.symmetry_operations = space_group_operations(self._symbol)
 
     def __repr__(self):
         return "SpaceGroup({0})".format(self.group_number)
@@ -79,31 +76,178 @@ class SpaceGroup(object):
         """
         return self._generators_mat
 
-    def _symmetry_operations_from_generators(self):
-        symm_ops, new_ops = [np.copy(self.generators)] * 2
-        while len(new_ops) > 0 and len(symm_ops) < self.total_operations:
-            gen_ops = []
-            for g in new_ops:
-                test_ops = np.einsum('ijk,kl', symm_ops, g)
-                for op in test_ops:
-                    op[:3, 3] = np.mod(get_translation(op), 1)
-                    op[np.where(np.abs(1 - get_translation(op)) < 1e-15), 3] = 0
-                    if not (np.abs(symm_ops - op) < 1e-15).all(axis=(1, 2)).any():
-                        gen_ops.append(op)
-                        symm_ops = np.append(symm_ops, [op], axis=0)
-            new_ops = gen_ops
-        assert len(symm_ops) == self.total_operations
-        return symm_ops
-
     def symmetrize_position(self, vector):
-        r"""Applies symmetry operations to a vector
+        r"""Applies symmetry operations to a vector, and returns the distinct
+        positions in the unit cell, see :py:meth:`expand_sites`
 
         """
-        positions = []
-        for op in self.symmetry_operations:
-            positions.append(np.dot(get_rotation(op), np.array(vector)) + get_translation(op))
+        return list(self.expand_sites([vector])[0])
+
+    def expand_sites(self, positions, occupancies=None, species=None, tol=1e-4):
+        r"""Generates the positions in the unit cell equivalent to the sites
+        of the asymmetric unit, applying every symmetry operation to every
+        site at once. Positions are wrapped into [0, 1), and positions of a
+        site equivalent within `tol`, *e.g.* on special Wyckoff positions,
+        are kept once.
+
+        Parameters
+        ----------
+        positions : array_like
+            Fractional coordinates of the sites, shape (n_sites, 3)
+
+        occupancies : array_like, optional
+            Occupancy of each site. Default: 1
+
+        species : list of str, optional
+            Ion of each site. Default: None
+
+        tol : float, optional
+            Tolerance in fractional coordinates. Default: 1e-4
+
+        Returns
+        -------
+        (positions, occupancies, species, sites) : tuple of ndarray
+            Positions of shape (n_atoms, 3), occupancy and ion of each atom,
+            and the index of the site each atom was generated from. Atoms are
+            ordered by site, then by symmetry operation.
+
+        """
+        positions = np.reshape(np.asarray(positions, dtype=float), (-1, 3))
+        n_sites = len(positions)
+        operations = self.symmetry_operations
+
+        expanded = np.einsum('oij,sj->soi', operations[:, :3, :3], positions) + operations[:, :3, 3]
+        expanded = np.mod(expanded, 1.)
+        expanded[expanded > 1. - tol] = 0.
+        expanded = expanded.reshape(-1, 3)
+        sites = np.repeat(np.arange(n_sites), len(operations))
+
+        grid = int(np.round(1. / tol))
+        cells = np.mod(np.round(expanded * grid).astype(np.int64), grid)
+        keys = ((sites * grid + cells[:, 0]) * grid + cells[:, 1]) * grid + cells[:, 2]
+        first = np.sort(np.unique(keys, return_index=True)[1])
+        expanded, sites = expanded[first], sites[first]
+
+        keep = np.ones(len(sites), dtype=bool)
+        for site in range(n_sites):
+            index = np.where(sites == site)[0]
+            delta = expanded[index][:, np.newaxis, :] - expanded[index][np.newaxis, :, :]
+            close = np.all(np.abs(delta - np.round(delta)) < tol, axis=-1)
+            keep[index] = ~np.any(np.triu(close, 1), axis=0)
+        expanded, sites = expanded[keep], sites[keep]
+
+        if occupancies is None:
+            occupancies = np.ones(n_sites)
+        occupancies = np.broadcast_to(np.asarray(occupancies, dtype=float), (n_sites,))[sites]
+
+        if species is not None:
+            species = np.asarray(species)[sites]
+
+        return expanded, occupancies, species, sites
+
+
+def _wrap_operations(operations):
+    r"""Returns a copy of operations with translations wrapped into [0, 1)
+    and rounded to multiples of 1/48
+    """
+    operations = np.array(operations, dtype=float)
+    translations = np.round(operations[:, :3, 3] * _TRANSLATION_DENOMINATOR)
+    operations[:, :3, 3] = np.mod(translations, _TRANSLATION_DENOMINATOR) / _TRANSLATION_DENOMINATOR
+    return operations
+
+
+def _operation_keys(operations):
+    r"""Returns an integer identifying each operation, from its rotation and
+    wrapped translation
+    """
+    rotations = np.round(operations[:, :3, :3]).astype(np.int64).reshape(-1, 9) + 1
+    translations = np.round(operations[:, :3, 3] * _TRANSLATION_DENOMINATOR).astype(np.int64)
+    keys = rotations.dot(3 ** np.arange(9))
+    for i in range(3):
+        keys = keys * _TRANSLATION_DENOMINATOR + translations[:, i]
+    return keys
 
-        return positions
+
+def closure(generators, total_operations=None):
+    r"""Returns the symmetry operations of the group generated by a set of
+    generators. Operations are added in batches, by multiplying the
+    operations found at the previous step by every generator at once.
+
+    Parameters
+    ----------
+    generators : list of ndarray
+        Generators with shape (4, 4), or their string representation
+
+    total_operations : int, optional
+        Expected number of operations. Default: None, not checked
+
+    Returns
+    -------
+    operations : ndarray
+        Array of shape (n_ops, 4, 4), starting with the generators
+
+    """
+    if isinstance(generators, str) or isinstance(generators[0], str):
+        generators = get_generator_from_str(generators)
+    generators = _wrap_operations(np.reshape(generators, (-1, 4, 4)))
+    keys = _operation_keys(generators)
+    first = np.sort(np.unique(keys, return_index=True)[1])
+    operations, keys = generators[first], keys[first]
+
+    new = operations
+    while len(new) > 0:
+        products = _wrap_operations(np.einsum('aij,bjk->abik', new, generators).reshape(-1, 4, 4))
+        product_keys = _operation_keys(products)
+        first = np.sort(np.unique(product_keys, return_index=True)[1])
+        first = first[~np.in1d(product_keys[first], keys)]
+        new = products[first]
+        operations = np.concatenate((operations, new))
+        keys = np.concatenate((keys, product_keys[first]))
+
+    if total_operations is not None and len(operations) != total_operations:
+        raise ValueError('Generators give {0} operations instead of {1}'.format(len(operations), total_operations))
+
+    return operations
+
+
+def space_group_operations(symbol):
+    r"""Returns the symmetry operations of a space group, computed once per
+    process and cached.
+
+    Parameters
+    ----------
+    symbol : str or int
+        International symbol, Hermann–Mauguin symbol, full name, or number
+        of the space group
+
+    Returns
+    -------
+    operations : ndarray
+        Read-only array of shape (n_ops, 4, 4)
+
+    """
+    symbol, space_group = databases.space_group(symbol)
+    try:
+        return _OPERATION_TABLES[symbol]
+    except KeyError:
+        operations = closure(space_group['generators'], space_group['total_operations'])
+        operations.flags.writeable = False
+        return _OPERATION_TABLES.setdefault(symbol, operations)
+
+
+def operation_tables():
+    r"""Returns the symmetry operations of all 230 space groups.
+
+    Returns
+    -------
+    tables : dict
+        Dictionary of space group symbol to read-only array of operations of
+        shape (n_ops, 4, 4). Operations of a space group given by number,
+        Hermann–Mauguin symbol or full name are returned by
+        :py:func:`space_group_operations`.
+
+    """
+    return dict((symbol, space_group_operations(symbol)) for symbol in databases.get('symmetry')['space_groups'])
 
 
 def get_formatted_operations(operations):
@@ -177,7 +321,7 @@ def get_generator_from_str(operations):
         for i, comp in enumerate(components):
             elements = comp.split('+')
             if len(elements) > 1:
-                translation[i] = eval(elements[-1].replace('/', './'))
+                translation[i] = float(Fraction(elements[-1]))
 
             if '-x' in elements[0]:
                 rotation[i, 0] = -1
@@ -256,3 +400,16 @@ def get_str_from_generator(operations):
         generators.append(','.join(line))
 
     return generators
+
+
+def __getattr__(name):
+    r"""Loads ``space_groups``, the dictionary of space groups from the
+    symmetry database, on first access instead of at import
+    """
+    if name != 'space_groups':
+        raise AttributeError('module {0} has no attribute {1}'.format(__name__, name))
+    return globals().setdefault(name, constants.symmetry()['space_groups'])
+
+
+if sys.version_info < (3, 7):
+    space_groups = constants.symmetry()['space_groups']
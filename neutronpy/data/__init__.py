@@ -1,4 +1,8 @@
-from .analysis import Analysis
+from .analysis import Analysis, MomentResult, batch_moments
+from .background import BackgroundPlan
 from .data import Data
+from .growable import GrowableData
+from .out_of_core import OutOfCoreData
+from .pipeline import LazyData
 from .plot import PlotData
 from .scans import Scans
@@ -1,11 +1,112 @@
 # -*- coding: utf-8 -*-
 import numbers
+from collections import namedtuple
 
 import numpy as np
 
 from ..constants import BOLTZMANN_IN_MEV_K
 from ..energy import Energy
 
+MomentResult = namedtuple('MomentResult', ['keys', 'integral', 'position', 'width'])
+MomentResult.__doc__ = r"""Zeroth, first and second moments of a data set, as returned by
+:py:meth:`.Analysis.moments` and :py:func:`.batch_moments`
+
+Attributes
+----------
+keys : list of str
+    Data column keys corresponding to the last axis of position and width
+
+integral : float or ndarray
+    Integrated intensity, with shape ``(n,)`` for a batch of ``n`` data
+    sets or regions of interest
+
+position : ndarray
+    Position in each dimension, with shape ``(len(keys),)`` or
+    ``(n, len(keys))``
+
+width : ndarray
+    Mean-squared width in each dimension, with the same shape as position
+
+"""
+
+
+def trapz_weights(x):
+    r"""Returns the weights :math:`w` such that ``np.dot(y, w)`` is equal to
+    ``np.trapz(y, x)`` for any ``y``.
+
+    Parameters
+    ----------
+    x : ndarray
+        Sample points, with integration along the last axis
+
+    Returns
+    -------
+    weights : ndarray
+        Weights with the same shape as x
+
+    """
+    x = np.asarray(x, dtype=float)
+    weights = np.zeros(x.shape)
+    if x.shape[-1] < 2:
+        return weights
+    dx = np.diff(x, axis=-1) / 2.
+    weights[..., :-1] += dx
+    weights[..., 1:] += dx
+    return weights
+
+
+def batch_moments(datasets, bounds=None, background=None, hkle=True):
+    r"""Calculates the integrated intensity, position and mean-squared width
+    of many data sets or regions of interest in one call.
+
+    Parameters
+    ----------
+    datasets : Data or list of Data
+        Data objects, which must have the same data columns. A single Data
+        object may be given together with a list of ``bounds`` to evaluate
+        many regions of interest of the same data set.
+
+    bounds : bool array or list of bool arrays, optional
+        A boolean expression representing the bounds, or one per data set or
+        region of interest. Default: None
+
+    background : float or dict, optional
+        Default: None. Evaluated once per data set.
+
+    hkle : bool, optional
+        If True, integrates only over h, k, l, e dimensions, otherwise
+        integrates over all dimensions in :py:attr:`.Data.data`
+
+    Returns
+    -------
+    result : :py:class:`.MomentResult`
+        Named tuple of keys, integral with shape ``(n,)``, position and width
+        with shape ``(n, len(keys))``
+
+    """
+    if not isinstance(datasets, (list, tuple)):
+        if isinstance(bounds, (list, tuple)):
+            return datasets.moments(bounds=list(bounds), background=background, hkle=hkle)
+        datasets = [datasets]
+
+    if bounds is None or not isinstance(bounds, (list, tuple)):
+        bounds = [bounds] * len(datasets)
+
+    if len(bounds) != len(datasets):
+        raise ValueError('One set of bounds is required per data set.')
+
+    results = [data.moments(bounds=_bounds, background=background, hkle=hkle)
+               for data, _bounds in zip(datasets, bounds)]
+
+    keys = results[0].keys
+    if any(result.keys != keys for result in results):
+        raise ValueError('All data sets must have the same data columns.')
+
+    return MomentResult(keys,
+                        np.array([result.integral for result in results]),
+                        np.vstack([result.position for result in results]),
+                        np.vstack([result.width for result in results]))
+
 
 class Analysis(object):
     r"""Class containing methods for the Data class
@@ -16,6 +117,7 @@ class Analysis(object):
 
     Methods
     -------
+    moments
     integrate
     position
     width
@@ -45,6 +147,65 @@ class Analysis(object):
 
         return 1. - np.exp(-self.Q[:, 3] / BOLTZMANN_IN_MEV_K / self.temp)
 
+    def moments(self, bounds=None, background=None, hkle=True):
+        r"""Returns the integrated intensity, position and mean-squared width
+        within the given bounds for all dimensions in a single pass. Bounds
+        and background are evaluated only once.
+
+        Parameters
+        ----------
+        bounds : bool array or list of bool arrays, optional
+            A boolean expression representing the bounds inside which the
+            calculation will be performed. If a list is given, the moments are
+            calculated for each region of interest.
+
+        background : float or dict, optional
+            Default: None
+
+        hkle : bool, optional
+            If True, integrates only over h, k, l, e dimensions, otherwise
+            integrates over all dimensions in :py:attr:`.Data.data`
+
+        Returns
+        -------
+        result : :py:class:`.MomentResult`
+            Named tuple of keys, integral, position and width. If a list of
+            bounds is given, the integral has shape ``(n,)`` and position and
+            width have shape ``(n, len(keys))``.
+
+        """
+        background = self.estimate_background(background)
+
+        if isinstance(bounds, (list, tuple)):
+            results = [self._moments(_bounds, background, hkle, 2) for _bounds in bounds]
+            return MomentResult(results[0].keys,
+                                np.array([result.integral for result in results]),
+                                np.vstack([result.position for result in results]),
+                                np.vstack([result.width for result in results]))
+
+        return self._moments(bounds, background, hkle, 2)
+
+    def _moments(self, bounds, background, hkle, order):
+        r"""Calculates moments up to ``order`` with an already estimated
+        background. Each trapezoidal integral over the key ``j`` is a dot
+        product with the weights ``trapz_weights(x_j)``, so the sum over all
+        keys is a single dot product with the summed weights.
+        """
+        keys = self.get_keys(hkle)
+        ind = self.get_bounds(bounds)
+
+        X = np.vstack([np.squeeze(self.data[key][ind]).reshape(-1) for key in keys])
+        weights = (self.intensity[ind] - background) * trapz_weights(X).sum(axis=0)
+
+        integral = np.sum(weights)
+        position, width = None, None
+        if order > 0:
+            position = np.dot(X, weights) / integral
+        if order > 1:
+            width = np.dot((X - position[:, np.newaxis]) ** 2, weights) / integral
+
+        return MomentResult(keys, integral, position, width)
+
     def integrate(self, bounds=None, background=None, hkle=True):
         r"""Returns the integrated intensity within given bounds
 
@@ -68,12 +229,7 @@ class Analysis(object):
             specified boundaries
 
         """
-        result = 0
-        for key in self.get_keys(hkle):
-            result += np.trapz(self.intensity[self.get_bounds(bounds)] - self.estimate_background(background),
-                               np.squeeze(self.data[key][self.get_bounds(bounds)]))
-
-        return result
+        return self._moments(bounds, self.estimate_background(background), hkle, 0).integral
 
     def position(self, bounds=None, background=None, hkle=True):
         r"""Returns the position of a peak within the given bounds
@@ -98,20 +254,12 @@ class Analysis(object):
             (h, k, l, e)
 
         """
-        result = ()
-        for key in self.get_keys(hkle):
-            _result = 0
-            for key_integrate in self.get_keys(hkle):
-                _result += np.trapz(self.data[key][self.get_bounds(bounds)] *
-                                    (self.intensity[self.get_bounds(bounds)] - self.estimate_background(background)),
-                                    self.data[key_integrate][self.get_bounds(bounds)]) / self.integrate(bounds, background)
-
-            result += (np.squeeze(_result),)
+        result = self._moments(bounds, self.estimate_background(background), hkle, 1)
 
         if hkle:
-            return result
+            return tuple(result.position)
         else:
-            return dict((key, value) for key, value in zip(self.get_keys(hkle), result))
+            return dict((key, value) for key, value in zip(result.keys, result.position))
 
     def width(self, bounds=None, background=None, fwhm=False, hkle=True):
         r"""Returns the mean-squared width of a peak within the given bounds
@@ -140,25 +288,16 @@ class Analysis(object):
             (h, k, l, e)
 
         """
+        result = self._moments(bounds, self.estimate_background(background), hkle, 2)
 
-        result = ()
-        for key in self.get_keys(hkle):
-            _result = 0
-            for key_integrate in self.get_keys(hkle):
-                _result += np.trapz((self.data[key][self.get_bounds(bounds)] -
-                                     self.position(bounds, background, hkle=False)[key]) ** 2 *
-                                    (self.intensity[self.get_bounds(bounds)] - self.estimate_background(background)),
-                                    self.data[key_integrate][self.get_bounds(bounds)]) / self.integrate(bounds, background)
-
-            if fwhm:
-                result += (np.sqrt(np.squeeze(_result)) * 2. * np.sqrt(2. * np.log(2.)),)
-            else:
-                result += (np.squeeze(_result),)
+        width = result.width
+        if fwhm:
+            width = np.sqrt(width) * 2. * np.sqrt(2. * np.log(2.))
 
         if hkle:
-            return result
+            return tuple(width)
         else:
-            return dict((key, value) for key, value in zip(self.get_keys(hkle), result))
+            return dict((key, value) for key, value in zip(result.keys, width))
 
     def scattering_function(self, material, ei):
         r"""Returns the neutron scattering function, i.e. the detector counts
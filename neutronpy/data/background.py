@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+r"""Reusable interpolation of background data
+
+"""
+import numpy as np
+
+
+def _column(data, key):
+    r"""Returns a data column by key, or by the name of a Q_key
+    """
+    try:
+        return np.asarray(data.data[key])
+    except KeyError:
+        try:
+            return np.asarray(data.data[data.Q_keys[key]])
+        except (AttributeError, KeyError):
+            raise KeyError('Invalid key for data_column.')
+
+
+class BackgroundPlan(object):
+    r"""Interpolation plan of a background data set, used to subtract the same
+    background from many data sets that are not taken at exactly the same
+    points. The interpolation structure is built once, and the interpolation
+    weights of the last grid are reused.
+
+    Parameters
+    ----------
+    background_data : Data object
+        Data object containing the background
+
+    x : str or list of str
+        data_column key, or keys, of the values over which the background
+        is interpolated
+
+    method : str, optional
+        'nearest' or 'linear'. Points outside of the convex hull of the
+        background are nan for 'linear'. Default: 'nearest'
+
+    Attributes
+    ----------
+    background : Data object
+    keys : list of str
+    method : str
+
+    Methods
+    -------
+    weights
+    interpolate
+    subtract
+
+    """
+
+    def __init__(self, background_data, x, method='nearest'):
+        if isinstance(x, str):
+            x = [x]
+
+        self.background = background_data
+        self.keys = list(x)
+        self.method = method
+
+        points = self._points(background_data)
+        self._intensity = np.asarray(background_data.intensity, dtype=float)
+        self._variance = np.asarray(background_data.error, dtype=float) ** 2
+        self._last = None
+
+        if method == 'nearest':
+            from scipy.spatial import cKDTree
+
+            self._tree = cKDTree(points)
+        elif method == 'linear':
+            if points.shape[1] == 1:
+                self._order = np.argsort(points[:, 0], kind='mergesort')
+                self._x = points[self._order, 0]
+            else:
+                from scipy.spatial import Delaunay
+
+                self._tri = Delaunay(points)
+        else:
+            raise ValueError("Interpolation method must be 'nearest' or 'linear'.")
+
+    def _points(self, data):
+        return np.vstack([_column(data, key).ravel() for key in self.keys]).T.astype(float)
+
+    def weights(self, points):
+        r"""Returns the indices of the background points and the weights used
+        to interpolate the background at the given points.
+
+        Parameters
+        ----------
+        points : ndarray
+            Points with shape ``(n, len(keys))``
+
+        Returns
+        -------
+        (indices, weights) : tuple of ndarrays
+            Arrays of shape ``(n, m)``, where ``m`` is the number of
+            background points contributing to each point
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, len(self.keys))
+
+        if self.method == 'nearest':
+            indices = self._tree.query(points)[1][:, np.newaxis]
+            return indices, np.ones(indices.shape)
+
+        if points.shape[1] == 1:
+            x, p = self._x, points[:, 0]
+            i = np.clip(np.searchsorted(x, p, side='right') - 1, 0, max(len(x) - 2, 0))
+            j = np.minimum(i + 1, len(x) - 1)
+            dx = x[j] - x[i]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = np.where(dx > 0, (p - x[i]) / dx, 0.)
+            weights = np.vstack((1. - t, t)).T
+            weights[(p < x[0]) | (p > x[-1])] = np.nan
+            return np.vstack((self._order[i], self._order[j])).T, weights
+
+        ndim = points.shape[1]
+        simplex = self._tri.find_simplex(points)
+        transform = self._tri.transform[simplex]
+        b = np.einsum('ijk,ik->ij', transform[:, :ndim], points - transform[:, ndim])
+        weights = np.hstack((b, 1. - b.sum(axis=1, keepdims=True)))
+        weights[simplex == -1] = np.nan
+        return self._tri.simplices[simplex], weights
+
+    def interpolate(self, data):
+        r"""Returns the background intensity and error interpolated at the
+        points of a data set.
+
+        Parameters
+        ----------
+        data : Data object
+            Data object at the points of which the background is interpolated
+
+        Returns
+        -------
+        (intensity, error) : tuple of ndarrays
+
+        """
+        points = self._points(data)
+        if self._last is not None and np.array_equal(self._last[0], points):
+            indices, weights = self._last[1:]
+        else:
+            indices, weights = self.weights(points)
+            self._last = (points, indices, weights)
+
+        intensity = np.sum(weights * self._intensity[indices], axis=1)
+        error = np.sqrt(np.sum(weights * self._variance[indices], axis=1))
+
+        return intensity, error
+
+    def subtract(self, data, ret=True):
+        r"""Subtracts the background from a data set, see
+        :py:meth:`.Data.subtract_background`.
+
+        Parameters
+        ----------
+        data : Data object
+            Data object from which the background is subtracted
+
+        ret : bool, optional
+            Set False if background should be subtracted in place.
+            Default: True
+
+        Returns
+        -------
+        data : Data object
+            Data object contained subtracted data
+
+        """
+        return data.subtract_background(self, ret=ret)
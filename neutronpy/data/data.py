@@ -9,6 +9,7 @@ import numpy as np
 from collections import OrderedDict
 from multiprocessing import cpu_count, Pool  # @UnresolvedImport
 from .analysis import Analysis
+from .background import BackgroundPlan
 from .plot import PlotData
 
 
@@ -19,6 +20,30 @@ def _call_bin_parallel(arg, **kwarg):
     return Data._bin_parallel(*arg, **kwarg)
 
 
+def _shared_view(value):
+    r"""Returns a read-only view of an array, which can be shared by copies of
+    a data object without making the array itself read-only
+    """
+    if isinstance(value, np.ndarray) and value.flags.writeable:
+        value = value.view()
+        value.flags.writeable = False
+    return value
+
+
+def _same_source(cached, current):
+    r"""Checks whether a source of a cached derived column is unchanged.
+    Arrays are compared by identity, scalars by value.
+    """
+    if cached is current:
+        return True
+    if isinstance(cached, np.ndarray) or isinstance(current, np.ndarray):
+        return False
+    try:
+        return bool(cached == current)
+    except (TypeError, ValueError):
+        return False
+
+
 class Data(PlotData, Analysis):
     u"""Data class for handling multi-dimensional scattering data. If input
     file type is not supported, data can be entered manually.
@@ -71,6 +96,8 @@ class Data(PlotData, Analysis):
     Methods
     -------
     bin
+    copy
+    lazy
     combine_data
     subtract_background
     integrate
@@ -86,6 +113,16 @@ class Data(PlotData, Analysis):
     plot_line
     get_keys
     get_bounds
+    invalidate_cache
+
+    Notes
+    -----
+    :attr:`Q`, :attr:`intensity` and :attr:`error` are cached, and returned
+    as read-only arrays. The cache is invalidated by the setters of the data
+    columns, :attr:`error` and :attr:`time_norm`, and whenever a column array
+    is replaced. If a column is modified in place through :attr:`data`, call
+    :py:meth:`invalidate_cache`. Columns shared with a copy, see
+    :py:meth:`copy`, are read-only and are replaced instead.
 
     """
 
@@ -142,6 +179,7 @@ class Data(PlotData, Analysis):
             self.combine_data(right, ret=False)
         except TypeError:
             raise
+        return self
 
     def __sub__(self, right):
         try:
@@ -154,44 +192,53 @@ class Data(PlotData, Analysis):
             self.subtract_background(right, ret=False)
         except (TypeError, ValueError):
             raise
+        return self
 
     def __mul__(self, right):
-        temp_obj = copy.deepcopy(self)
+        temp_obj = self.copy()
         temp_obj.detector = self.detector * right
         return temp_obj
 
     def __imul__(self, right):
-        self.detector *= right
+        self.detector = self.detector * right
+        return self
 
     def __div__(self, right):
-        temp_obj = copy.deepcopy(self)
+        temp_obj = self.copy()
         temp_obj.detector = self.detector / right
         return temp_obj
 
     def __idiv__(self, right):
-        self.detector /= right
+        self.detector = self.detector / right
+        return self
 
     def __truediv__(self, right):
-        temp_obj = copy.deepcopy(self)
+        temp_obj = self.copy()
         temp_obj.detector = self.detector / right
         return temp_obj
 
     def __itruediv__(self, right):
-        self.detector /= right
+        self.detector = self.detector / right
+        return self
 
     def __floordiv__(self, right):
-        temp_obj = copy.deepcopy(self)
+        temp_obj = self.copy()
         temp_obj.detector = self.detector // right
         return temp_obj
 
-    def __ifloordiv__(self, other):
-        self.detector //= right
+    def __ifloordiv__(self, right):
+        self.detector = self.detector // right
+        return self
 
     def __pow__(self, right):
-        temp_obj = copy.deepcopy(self)
-        temp_obj.detector **= right
+        temp_obj = self.copy()
+        temp_obj.detector = self.detector ** right
         return temp_obj
 
+    def __ipow__(self, right):
+        self.detector = self.detector ** right
+        return self
+
     def __eq__(self, right):
         if not np.all(sorted(list(self.data.keys())) == sorted(list(right.data.keys()))):
             return False
@@ -209,12 +256,14 @@ class Data(PlotData, Analysis):
     def Q(self):
         r"""Returns a Q matrix with columns h,k,l,e,temp
         """
-        return np.vstack((self.data[self.Q_keys[i]].flatten() for i in ['h', 'k', 'l', 'e', 'temp'])).T
+        columns = tuple(self.data[self.Q_keys[i]] for i in ['h', 'k', 'l', 'e', 'temp'])
+        return self._get_derived('Q', columns, lambda: np.vstack([col.flatten() for col in columns]).T)
 
     @Q.setter
     def Q(self, value):
         for col, key in zip(value.T, ['h', 'k', 'l', 'e', 'temp']):
             self._data[self.Q_keys[key]] = col
+        self.invalidate_cache()
 
     @property
     def detector(self):
@@ -225,6 +274,7 @@ class Data(PlotData, Analysis):
     @detector.setter
     def detector(self, value):
         self.data[self.data_keys['detector']] = value
+        self.invalidate_cache()
 
     @property
     def monitor(self):
@@ -235,6 +285,7 @@ class Data(PlotData, Analysis):
     @monitor.setter
     def monitor(self, value):
         self.data[self.data_keys['monitor']] = value
+        self.invalidate_cache()
 
     @property
     def time(self):
@@ -245,6 +296,7 @@ class Data(PlotData, Analysis):
     @time.setter
     def time(self, value):
         self.data[self.data_keys['time']] = value
+        self.invalidate_cache()
 
     @property
     def h(self):
@@ -267,6 +319,7 @@ class Data(PlotData, Analysis):
 
         else:
             self.data[self.Q_keys['h']] = np.array(value)
+            self.invalidate_cache()
 
     @property
     def k(self):
@@ -289,6 +342,7 @@ class Data(PlotData, Analysis):
 
         else:
             self.data[self.Q_keys['k']] = np.array(value)
+            self.invalidate_cache()
 
     @property
     def l(self):
@@ -311,6 +365,7 @@ class Data(PlotData, Analysis):
 
         else:
             self.data[self.Q_keys['l']] = np.array(value)
+            self.invalidate_cache()
 
     @property
     def e(self):
@@ -333,6 +388,7 @@ class Data(PlotData, Analysis):
 
         else:
             self.data[self.Q_keys['e']] = np.array(value)
+            self.invalidate_cache()
 
     @property
     def temp(self):
@@ -355,44 +411,55 @@ class Data(PlotData, Analysis):
 
         else:
             self.data[self.Q_keys['temp']] = np.array(value)
+            self.invalidate_cache()
 
     @property
-    def intensity(self):
-        r"""Returns the monitor or time normalized intensity
-
+    def time_norm(self):
+        r"""If True, :attr:`intensity` and :attr:`error` are normalized to
+        time instead of monitor
         """
+        return self._time_norm
+
+    @time_norm.setter
+    def time_norm(self, value):
+        self._time_norm = value
+        self.invalidate_cache()
 
+    def _normalization(self):
+        r"""Returns the normalization column and factor
+        """
         if self.time_norm:
             if self.t0 == 0:
                 self.t0 = np.nanmax(self.time)
-            return self.detector / self.time * self.t0
+            return self.time, self.t0
         else:
             if self.m0 == 0:
                 self.m0 = np.nanmax(self.monitor)
-            return self.detector / self.monitor * self.m0
+            return self.monitor, self.m0
+
+    @property
+    def intensity(self):
+        r"""Returns the monitor or time normalized intensity
+
+        """
+        norm, norm0 = self._normalization()
+        detector = self.detector
+        return self._get_derived('intensity', (detector, norm, norm0, self.time_norm),
+                                 lambda: detector / norm * norm0)
 
     @property
     def error(self):
         r"""Returns error of monitor or time normalized intensity
 
         """
-        try:
-            if self._err is not None:
-                err = self._err
-            else:
-                err = np.sqrt(self.detector)
-        except AttributeError:
+        err = getattr(self, '_err', None)
+        if err is None:
             self._err = None
-            err = np.sqrt(self.detector)
+            detector = self.detector
+            err = self._get_derived('sqrt_detector', (detector,), lambda: np.sqrt(detector))
 
-        if self.time_norm:
-            if self.t0 == 0:
-                self.t0 = np.nanmax(self.time)
-            return err / self.time * self.t0
-        else:
-            if self.m0 == 0:
-                self.m0 = np.nanmax(self.monitor)
-            return err / self.monitor * self.m0
+        norm, norm0 = self._normalization()
+        return self._get_derived('error', (err, norm, norm0, self.time_norm), lambda: err / norm * norm0)
 
     @error.setter
     def error(self, value):
@@ -405,6 +472,7 @@ class Data(PlotData, Analysis):
             raise ValueError("""Input value must have the shape ({0},) or be a float.""".format(self.detector.shape[0]))
 
         self._err = value
+        self.invalidate_cache()
 
     @property
     def data(self):
@@ -415,6 +483,34 @@ class Data(PlotData, Analysis):
     @data.setter
     def data(self, value):
         self._data = value
+        self.invalidate_cache()
+
+    def _get_derived(self, name, sources, func):
+        r"""Returns the cached derived column ``name`` if none of its sources
+        have changed, otherwise computes it with ``func`` and caches it.
+        """
+        cache = self.__dict__.setdefault('_derived', {})
+        try:
+            cached_sources, value = cache[name]
+        except KeyError:
+            pass
+        else:
+            if len(cached_sources) == len(sources) and all(
+                    _same_source(a, b) for a, b in zip(cached_sources, sources)):
+                return value
+
+        value = func()
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        cache[name] = (sources, value)
+        return value
+
+    def invalidate_cache(self):
+        r"""Clears the cached :attr:`Q`, :attr:`intensity` and :attr:`error`.
+        Only needed after modifying a column array in place through
+        :attr:`data`.
+        """
+        self.__dict__['_derived'] = {}
 
     @property
     def data_columns(self):
@@ -422,6 +518,54 @@ class Data(PlotData, Analysis):
         """
         return list(self.data.keys())
 
+    def copy(self, deep=False):
+        r"""Returns a copy of the data object.
+
+        Parameters
+        ----------
+        deep : bool, optional
+            Default: False. If False, the copy shares the column buffers with
+            this object, and shares the remaining attributes (instrument,
+            header, *etc.*). Both objects hold read-only views of the shared
+            buffers, so that neither can modify them in place, and a column
+            is only allocated when it is replaced, *e.g.* by assigning to
+            :attr:`data` or a column property, or by an in-place operator,
+            *i.e.* copy on write. If True, everything is copied.
+
+        Returns
+        -------
+        data : :class:`.Data` object
+
+        """
+        if deep:
+            return copy.deepcopy(self)
+
+        self._data = OrderedDict((key, _shared_view(value)) for key, value in self._data.items())
+        if getattr(self, '_err', None) is not None:
+            self._err = _shared_view(self._err)
+
+        output = copy.copy(self)
+        output.__dict__['_derived'] = {}
+        output._data = copy.copy(self._data)
+        output.data_keys = dict(self.data_keys)
+        if hasattr(self, 'Q_keys'):
+            output.Q_keys = dict(self.Q_keys)
+
+        return output
+
+    def lazy(self):
+        r"""Returns a lazy expression starting from this data object, in
+        which operations are recorded and fused when evaluated.
+
+        Returns
+        -------
+        expression : :class:`.LazyData` object
+
+        """
+        from .pipeline import LazyData
+
+        return LazyData(self)
+
     def combine_data(self, obj, **kwargs):
         r"""Combines multiple data sets
 
@@ -447,8 +591,9 @@ class Data(PlotData, Analysis):
         except KeyError:
             pass
 
-        # combine
-        _data_temp = copy.deepcopy(self._data)
+        # combine, only the summed columns are modified in place
+        _data_temp = OrderedDict((key, np.array(value) if key in self.data_keys.values() else value)
+                                 for key, value in self._data.items())
         for i in range(len(obj._data[obj.data_keys['detector']])):
             new_vals = np.array([val[i] for k, val in obj._data.items() if k not in list(obj.data_keys.values())])
             for j in range(len(self._data[self.data_keys['detector']])):
@@ -474,89 +619,94 @@ class Data(PlotData, Analysis):
             output._data = _data
             return output
         else:
-            self._data = _data
+            self.data = _data
 
-    def subtract_background(self, background_data, x=None, ret=True):
+    def subtract_background(self, background_data, x=None, ret=True, method='nearest'):
         r"""Subtract background data.
 
         Parameters
         ----------
-        background_data : Data object
-            Data object containing the data wishing to be subtracted
+        background_data : Data object or BackgroundPlan
+            Data object containing the data wishing to be subtracted, or a
+            :class:`.BackgroundPlan` built from it, which is reused when the
+            same background is subtracted from many data sets
 
-        x : str, optional
-            data_column key of x-axis values over which background should be
-            subtracted. Used for cases where background data is not taken at
-            exactly same points as data being subtracted. Default: None
+        x : str or list of str, optional
+            data_column key, or keys, of x-axis values over which background
+            should be subtracted. Used for cases where background data is not
+            taken at exactly same points as data being subtracted.
+            Default: None
 
         ret : bool, optional
             Set False if background should be subtracted in place.
             Default: True
 
+        method : str, optional
+            Interpolation method used with `x`, 'nearest' or 'linear'.
+            Default: 'nearest'
+
         Returns
         -------
         data : Data object
             Data object contained subtracted data
 
         """
-        if not isinstance(background_data, Data):
+        try:
+            _new_intensity, _new_error = self._background_difference(background_data, x, method)
+        except ImportError:
+            warnings.warn('Background subtraction failed. Scipy Import Error, use more recent version of Python')
+            if ret:
+                return self
+            return
+
+        if ret:
+            data_obj = self.copy()
+        else:
+            data_obj = self
+
+        _sub_data = copy.copy(data_obj.data)
+        _sub_data[self.data_keys['detector']] = _new_intensity
+        _sub_data[self.data_keys['monitor']] = np.ones(_new_intensity.shape)
+        _sub_data[self.data_keys['time']] = np.ones(_new_intensity.shape)
+
+        data_obj.t0 = 1
+        data_obj.m0 = 1
+        data_obj._err = _new_error
+        data_obj.data = _sub_data
+
+        if ret:
+            return data_obj
+
+    def _background_difference(self, background_data, x=None, method='nearest'):
+        r"""Returns the background subtracted intensity and its error, see
+        :py:meth:`subtract_background`
+        """
+        if isinstance(background_data, BackgroundPlan):
+            plan = background_data
+            background_data = plan.background
+        elif isinstance(background_data, Data):
+            plan = None
+        else:
             raise TypeError('You can only combine two Data objects: input object is the wrong format!')
 
         if self.time_norm != background_data.time_norm:
             warnings.warn(
                 'Normalization of detector is different. One is normalized to time, and the other to monitor.')
 
-        if x is None:
-            try:
-                _new_intensity = self.intensity - background_data.intensity
-                _new_error = np.sqrt(
-                    np.array([np.max([err1 ** 2, err2 ** 2]) for err1, err2 in zip(self.error, background_data.error)]))
-            except ValueError:
+        if plan is None and x is None:
+            bg_intensity, bg_error = background_data.intensity, background_data.error
+            if np.shape(bg_intensity) != np.shape(self.intensity):
                 raise ValueError(
                     'Data objects are incompatible shapes: try subtract_background method for more options')
         else:
-            try:
-                bg_x = background_data.data[x]
-                self_x = self.data[x]
-            except KeyError:
-                try:
-                    bg_x = background_data.data[self.Q_keys[x]]
-                    self_x = self.data[self.Q_keys[x]]
-                except (AttributeError, KeyError):
-                    raise KeyError('Invalid key for data_column.')
+            if plan is None:
+                plan = BackgroundPlan(background_data, x, method=method)
+            bg_intensity, bg_error = plan.interpolate(self)
 
-            try:
-                from scipy.interpolate import griddata
+        _new_intensity = self.intensity - bg_intensity
+        _new_error = np.sqrt(np.maximum(self.error ** 2, bg_error ** 2))
 
-                bg_intensity_grid = griddata(bg_x, background_data.intensity, self_x, method='nearest')
-                bg_error_grid = np.sqrt(griddata(bg_x, background_data.error ** 2, self_x, method='nearest'))
-            except ImportError:
-                warnings.warn('Background subtraction failed. Scipy Import Error, use more recent version of Python')
-
-                if ret:
-                    return self
-
-            _new_intensity = self.intensity - bg_intensity_grid.flatten()
-            _new_error = np.sqrt(
-                np.array([np.max([err1 ** 2, err2 ** 2]) for err1, err2 in zip(self.error, bg_error_grid.flatten())]))
-
-        _sub_data = copy.copy(self.data)
-        _sub_data[self.data_keys['detector']] = _new_intensity
-        _sub_data[self.data_keys['monitor']] = np.ones(_new_intensity.shape)
-        _sub_data[self.data_keys['time']] = np.ones(_new_intensity.shape)
-
-        if ret:
-            data_obj = copy.deepcopy(self)
-            data_obj.t0 = 1
-            data_obj.m0 = 1
-            data_obj._err = _new_error
-            data_obj._data = _sub_data
-            return data_obj
-        else:
-            self.t0 = 1
-            self.m0 = 1
-            self._err = _new_error
-            self._data = _sub_data
+        return _new_intensity, _new_error
 
     def _bin_parallel(self, Q_chunk):
         r"""Performs binning by finding data chunks to bin together.
@@ -680,8 +830,8 @@ class Data(PlotData, Analysis):
             else:
                 _data[key] = Q[:, self.bin_keys.index(key)]
 
-        output = copy.deepcopy(self)
-        output._data = _data
+        output = self.copy()
+        output.data = _data
         output._err = data_out[-1]
 
         return output
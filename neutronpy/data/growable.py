@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+r"""Data with columns that can be appended to
+
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from .data import Data
+
+
+class GrowableData(Data):
+    r"""Data class whose columns are views of over-allocated buffers, so that
+    rows can be appended in amortized constant time, *e.g.* while a file is
+    still being written during an acquisition, see :class:`.SpiceTail`.
+
+    The normalization factors m0 and t0, if derived from the data, are
+    derived again after each :py:meth:`append`, so that the intensities
+    match those of the whole file loaded at once. Values set by the user are
+    kept.
+
+    Buffers double in size when full. Arrays previously returned by
+    :attr:`data`, :attr:`intensity`, *etc.* and copies made with
+    :py:meth:`copy` keep their length and values, *i.e.* they are snapshots
+    of the data at the time they were taken.
+
+    Parameters
+    ----------
+    columns : dict, optional
+        Dictionary of column name to array. Default: None, the columns are
+        created by the first call to :py:meth:`append`
+
+    data_keys : dict, optional
+        Default: ``{'detector': 'detector', 'monitor': 'monitor', 'time':
+        'time'}``. Mapping of the detector, monitor and time columns.
+
+    Q_keys : dict, optional
+        Default: ``{'h': 'h', 'k': 'k', 'l': 'l', 'e': 'e', 'temp': 'temp'}``.
+        Mapping of the h, k, l, e, temp columns.
+
+    Attributes
+    ----------
+    n_rows
+    capacity
+
+    Methods
+    -------
+    append
+    subscribe
+    unsubscribe
+
+    """
+
+    def __init__(self, columns=None, data_keys=None, Q_keys=None, **kwargs):
+        super(GrowableData, self).__init__(**kwargs)
+
+        self._data = OrderedDict()
+        self._err = None
+        self.m0 = 0
+        self.t0 = 0
+        if data_keys is not None:
+            self.data_keys = dict(data_keys)
+        if Q_keys is not None:
+            self.Q_keys = dict(Q_keys)
+
+        self._buffers = OrderedDict()
+        self._n_rows = 0
+        self._subscribers = []
+        self._auto_m0 = None
+        self._auto_t0 = None
+
+        if columns:
+            self.append(columns)
+
+    @property
+    def n_rows(self):
+        r"""Number of rows
+        """
+        return self._n_rows
+
+    @property
+    def capacity(self):
+        r"""Number of rows that fit in the buffers before they are grown
+        """
+        return min([len(buffer) for buffer in self._buffers.values()] or [0])
+
+    def _sync(self):
+        r"""Rebuilds the buffers from the columns if columns were replaced
+        through the setters of :class:`.Data`
+        """
+        views = list(self._data.values())
+        if self._err is not None:
+            views.append(self._err)
+        keys = list(self._data.keys()) + (['_err'] if self._err is not None else [])
+
+        if keys == list(self._buffers.keys()) and all(
+                view.base is self._buffers[key] and len(view) == self._n_rows for key, view in zip(keys, views)):
+            return
+
+        self._n_rows = len(views[0]) if views else 0
+        self._buffers = OrderedDict((key, np.array(view, dtype=np.float64)) for key, view in zip(keys, views))
+
+    def _normalization(self):
+        r"""Returns the normalization column and factor, and remembers the
+        factors derived from the data, so that :py:meth:`append` refreshes
+        them
+        """
+        m0, t0 = self.m0, self.t0
+        output = super(GrowableData, self)._normalization()
+        if m0 == 0 and self.m0 != 0:
+            self._auto_m0 = self.m0
+        if t0 == 0 and self.t0 != 0:
+            self._auto_t0 = self.t0
+        return output
+
+    def _reset_normalization(self):
+        r"""Resets m0 and t0 to be derived again from the data, unless they
+        were set by the user
+        """
+        if self._auto_m0 is not None and self.m0 == self._auto_m0:
+            self.m0 = 0
+        if self._auto_t0 is not None and self.t0 == self._auto_t0:
+            self.t0 = 0
+        self._auto_m0 = self._auto_t0 = None
+
+    def _reserve(self, n_rows):
+        r"""Grows the buffers geometrically to fit at least `n_rows` rows
+        """
+        capacity = self.capacity
+        if n_rows <= capacity and len(self._buffers):
+            return
+
+        capacity = max(n_rows, 2 * capacity, 16)
+        for key, buffer in self._buffers.items():
+            grown = np.empty(capacity, dtype=np.float64)
+            grown[:self._n_rows] = buffer[:self._n_rows]
+            self._buffers[key] = grown
+
+    def append(self, columns, error=None):
+        r"""Appends rows to the data, and notifies the subscribers.
+
+        Parameters
+        ----------
+        columns : dict
+            Dictionary of column name to values of the new rows. Must contain
+            every existing column.
+
+        error : array_like, optional
+            Error in detector counts of the new rows. Required if
+            :attr:`error` was set.
+
+        Returns
+        -------
+        rows : slice
+            Indices of the new rows
+
+        """
+        self._sync()
+        columns = OrderedDict((key, np.atleast_1d(np.asarray(value, dtype=np.float64)).ravel())
+                              for key, value in columns.items())
+        if error is not None:
+            columns['_err'] = np.atleast_1d(np.asarray(error, dtype=np.float64)).ravel()
+
+        if self._buffers:
+            if set(columns.keys()) != set(self._buffers.keys()):
+                raise KeyError('Appended columns must match the existing columns: {0}'.format(
+                    ', '.join(key for key in self._buffers.keys() if key != '_err')))
+        else:
+            self._buffers = OrderedDict((key, np.empty(0)) for key in columns.keys())
+
+        n_new = len(next(iter(columns.values())))
+        if any(len(value) != n_new for value in columns.values()):
+            raise ValueError('Appended columns must have the same length.')
+
+        start, stop = self._n_rows, self._n_rows + n_new
+        self._reserve(stop)
+        for key, buffer in self._buffers.items():
+            buffer[start:stop] = columns[key]
+        self._n_rows = stop
+
+        self._data = OrderedDict((key, buffer[:stop]) for key, buffer in self._buffers.items() if key != '_err')
+        if '_err' in self._buffers:
+            self._err = self._buffers['_err'][:stop]
+        self._reset_normalization()
+        self.invalidate_cache()
+
+        rows = slice(start, stop)
+        for callback in list(self._subscribers):
+            callback(self, rows)
+
+        return rows
+
+    def subscribe(self, callback):
+        r"""Registers a function called after rows are appended.
+
+        Parameters
+        ----------
+        callback : callable
+            Called as ``callback(data, rows)``, where ``rows`` is the slice of
+            the new rows, *e.g.* to update a plot or a fit
+
+        """
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        r"""Removes a function registered with :py:meth:`subscribe`
+        """
+        self._subscribers.remove(callback)
+
+    def copy(self, deep=False):
+        output = super(GrowableData, self).copy(deep=deep)
+        output._buffers = OrderedDict()
+        output._subscribers = []
+        return output
+
+    copy.__doc__ = Data.copy.__doc__
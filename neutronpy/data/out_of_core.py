@@ -0,0 +1,656 @@
+# -*- coding: utf-8 -*-
+r"""Out-of-core data handling
+
+"""
+import numbers
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+
+from .analysis import MomentResult
+from .data import Data
+
+
+class OutOfCoreData(Data):
+    r"""Data class whose columns are backed by h5py datasets or
+    :py:class:`numpy.memmap` arrays instead of in-memory arrays. Columns are
+    only read from disk when they are requested, and :attr:`intensity`,
+    :attr:`error`, :py:meth:`bin`, :py:meth:`moments`, :py:meth:`integrate`,
+    :py:meth:`position` and :py:meth:`width` are evaluated chunk by chunk, so
+    that datasets larger than the available memory can be reduced.
+
+    Parameters
+    ----------
+    columns : dict
+        Dictionary of column name to h5py dataset, :py:class:`numpy.memmap`,
+        ndarray, or path to a ``.npy`` file (opened with ``mmap_mode='r'``).
+        All columns must have the same length.
+
+    data_keys : dict, optional
+        Default: ``{'detector': 'detector', 'monitor': 'monitor', 'time':
+        'time'}``. Mapping of the detector, monitor and time columns.
+
+    Q_keys : dict, optional
+        Default: ``{'h': 'h', 'k': 'k', 'l': 'l', 'e': 'e', 'temp': 'temp'}``.
+        Mapping of the h, k, l, e, temp columns.
+
+    error : str or array_like, optional
+        Default: None. Name of the column in ``columns`` holding the error in
+        detector counts, or a backed array of the errors. If None,
+        :math:`\sqrt{\mathrm{detector}}` is used.
+
+    chunk_size : int, optional
+        Default: 1048576. Number of rows read from disk at once.
+
+    time_norm : bool, optional
+        Default: False. If True, calls to :attr:`intensity` and :attr:`error`
+        with normalize to time instead of monitor
+
+    Attributes
+    ----------
+    chunk_size
+    n_rows
+
+    Methods
+    -------
+    from_hdf5
+    from_memmap
+    close
+    column
+    iter_chunks
+    iter_intensity
+    iter_error
+    select
+
+    """
+
+    def __init__(self, columns, data_keys=None, Q_keys=None, error=None, chunk_size=2 ** 20, time_norm=False,
+                 **kwargs):
+        self._data = OrderedDict()
+        for key, value in columns.items():
+            if isinstance(value, str):
+                value = np.load(value, mmap_mode='r')
+            self._data[key] = value
+
+        lengths = set(len(value) for value in self._data.values())
+        if len(lengths) > 1:
+            raise ValueError('All columns must have the same length.')
+
+        if data_keys is None:
+            data_keys = {'monitor': 'monitor', 'detector': 'detector', 'time': 'time'}
+        if Q_keys is None:
+            Q_keys = {'h': 'h', 'k': 'k', 'l': 'l', 'e': 'e', 'temp': 'temp'}
+
+        self.data_keys = data_keys
+        self.Q_keys = Q_keys
+        self.chunk_size = int(chunk_size)
+        self.time_norm = time_norm
+
+        if isinstance(error, str):
+            error = self._data.pop(error)
+        self._err = error
+
+        self._file = None
+        self._m0 = None
+        self._t0 = None
+
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return "OutOfCoreData({0} rows, columns={1})".format(self.n_rows, self.data_columns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            return self.column(item)
+        return self.select(rows=item)
+
+    def __getstate__(self):
+        if self._file is not None:
+            raise TypeError('OutOfCoreData backed by an open HDF5 file cannot be pickled.')
+        return self.__dict__
+
+    @classmethod
+    def from_hdf5(cls, filename, group='data', columns=None, chunk_size=2 ** 20, **kwargs):
+        r"""Opens an HDF5 file, *e.g.* one written by
+        :py:func:`.fileio.save_data`, without reading any of its columns.
+
+        Parameters
+        ----------
+        filename : str
+            Path to the HDF5 file
+
+        group : str, optional
+            Default: `'data'`. Group containing the data columns
+
+        columns : list of str, optional
+            Default: None. If given, only these columns (plus the detector,
+            monitor and time columns) are made available.
+
+        chunk_size : int, optional
+            Default: 1048576. Number of rows read from disk at once.
+
+        Returns
+        -------
+        data : :class:`OutOfCoreData`
+            Data object backed by the datasets in the file. Call
+            :py:meth:`close` (or use as a context manager) to release the
+            file handle.
+
+        """
+        import h5py
+
+        f = h5py.File(filename, 'r')
+        try:
+            root = f[group]
+
+            data_keys, Q_keys = None, None
+            if 'data_keys' in root:
+                data_keys = dict((key, _to_str(value)) for key, value in root['data_keys'].attrs.items())
+            if 'Q_keys' in root:
+                Q_keys = dict((key, _to_str(value)) for key, value in root['Q_keys'].attrs.items())
+
+            required = list((data_keys or {'detector': 'detector', 'monitor': 'monitor',
+                                           'time': 'time'}).values())
+
+            # HDF5 groups iterate alphabetically, restore the h, k, l, e, temp column order of Data
+            q_order = [(Q_keys or {}).get(key, key) for key in ('h', 'k', 'l', 'e', 'temp')]
+            names = [key for key in q_order if key in root] + [key for key in root.keys() if key not in q_order]
+
+            _columns = OrderedDict()
+            error = None
+            for key in names:
+                value = root[key]
+                if not isinstance(value, h5py.Dataset):
+                    continue
+                if key == 'error':
+                    error = value
+                elif columns is None or key in columns or key in required:
+                    _columns[key] = value
+
+            if 'file_header' in root.attrs:
+                kwargs.setdefault('file_header', _to_str(root.attrs['file_header']))
+
+            output = cls(_columns, data_keys=data_keys, Q_keys=Q_keys, error=error, chunk_size=chunk_size,
+                         **kwargs)
+        except Exception:
+            f.close()
+            raise
+
+        output._file = f
+        return output
+
+    @classmethod
+    def from_memmap(cls, columns, chunk_size=2 ** 20, **kwargs):
+        r"""Builds a data object from memory-mapped arrays.
+
+        Parameters
+        ----------
+        columns : dict
+            Dictionary of column name to :py:class:`numpy.memmap` or path to a
+            ``.npy`` file, which will be opened with ``mmap_mode='r'``.
+
+        chunk_size : int, optional
+            Default: 1048576. Number of rows read from disk at once.
+
+        kwargs : optional
+            Passed to :class:`OutOfCoreData`
+
+        Returns
+        -------
+        data : :class:`OutOfCoreData`
+
+        """
+        return cls(columns, chunk_size=chunk_size, **kwargs)
+
+    def close(self):
+        r"""Closes the underlying HDF5 file, if any.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def n_rows(self):
+        r"""Number of rows in the data set
+        """
+        return len(self._data[self.data_keys['detector']])
+
+    @property
+    def m0(self):
+        r"""Monitor normalization, the maximum of the monitor column
+        """
+        if self._m0 is None:
+            self._m0 = self._reduce_column(self.data_keys['monitor'], np.nanmax, max)
+        return self._m0
+
+    @m0.setter
+    def m0(self, value):
+        self._m0 = value
+
+    @property
+    def t0(self):
+        r"""Time normalization, the maximum of the time column
+        """
+        if self._t0 is None:
+            self._t0 = self._reduce_column(self.data_keys['time'], np.nanmax, max)
+        return self._t0
+
+    @t0.setter
+    def t0(self, value):
+        self._t0 = value
+
+    @property
+    def Q(self):
+        r"""Returns a Q matrix with columns h,k,l,e,temp. This reads five
+        columns entirely into memory.
+        """
+        return np.vstack([self.column(self.Q_keys[i]) for i in ['h', 'k', 'l', 'e', 'temp']]).T
+
+    @Q.setter
+    def Q(self, value):
+        raise AttributeError('Q of OutOfCoreData is read-only.')
+
+    @property
+    def intensity(self):
+        r"""Returns the monitor or time normalized intensity, evaluated
+        chunk by chunk
+        """
+        return self._concatenate(self.iter_intensity())
+
+    @property
+    def error(self):
+        r"""Returns error of monitor or time normalized intensity, evaluated
+        chunk by chunk
+        """
+        return self._concatenate(self.iter_error())
+
+    @error.setter
+    def error(self, value):
+        if isinstance(value, numbers.Number):
+            value = np.full(self.n_rows, value, dtype=float)
+        if len(value) != self.n_rows:
+            raise ValueError("""Input value must have the shape ({0},) or be a float.""".format(self.n_rows))
+        self._err = value
+
+    def column(self, key, rows=None):
+        r"""Reads a single column from disk.
+
+        Parameters
+        ----------
+        key : str
+            Name of the column, or `'intensity'` or `'error'`
+
+        rows : slice, optional
+            Default: None. Rows to read.
+
+        Returns
+        -------
+        column : ndarray
+
+        """
+        if key in ('intensity', 'error'):
+            chunks = (chunk[key] for sl, chunk in self.iter_chunks(columns=[key], rows=rows))
+            return self._concatenate(chunks)
+
+        if key not in self._data:
+            raise KeyError(key)
+
+        if rows is None:
+            rows = slice(None)
+        return np.asarray(self._data[key][rows])
+
+    def iter_chunks(self, columns=None, rows=None, chunk_size=None):
+        r"""Iterates over the data set in chunks of rows, reading only the
+        requested columns.
+
+        Parameters
+        ----------
+        columns : list of str, optional
+            Default: None. Columns to read. `'intensity'` and `'error'` may be
+            requested and are computed on the fly. If None all raw columns are
+            read.
+
+        rows : slice, optional
+            Default: None. Restrict iteration to a contiguous range of rows.
+
+        chunk_size : int, optional
+            Default: :attr:`chunk_size`.
+
+        Yields
+        ------
+        (rows, chunk) : tuple
+            Slice of rows covered by the chunk, and an ``OrderedDict`` of the
+            requested columns as ndarrays.
+
+        """
+        if columns is None:
+            columns = list(self._data.keys())
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+
+        start, stop, step = (rows or slice(None)).indices(self.n_rows)
+        if step != 1:
+            raise ValueError('Only contiguous row ranges may be iterated over.')
+
+        derived = [key for key in columns if key in ('intensity', 'error')]
+        raw = [key for key in columns if key not in derived]
+        if derived:
+            norm_key = self.data_keys['time'] if self.time_norm else self.data_keys['monitor']
+            norm = self.t0 if self.time_norm else self.m0
+            raw_needed = raw + [key for key in (self.data_keys['detector'], norm_key) if key not in raw]
+        else:
+            raw_needed = raw
+
+        for i in range(start, stop, chunk_size):
+            sl = slice(i, min(i + chunk_size, stop))
+            chunk = OrderedDict((key, np.asarray(self._data[key][sl])) for key in raw_needed)
+
+            if 'intensity' in derived:
+                chunk['intensity'] = chunk[self.data_keys['detector']] / chunk[norm_key] * norm
+            if 'error' in derived:
+                if self._err is not None:
+                    err = np.asarray(self._err[sl])
+                else:
+                    err = np.sqrt(chunk[self.data_keys['detector']])
+                chunk['error'] = err / chunk[norm_key] * norm
+
+            yield sl, OrderedDict((key, chunk[key]) for key in columns)
+
+    def iter_intensity(self, rows=None):
+        r"""Iterates over the normalized intensity chunk by chunk
+        """
+        for sl, chunk in self.iter_chunks(columns=['intensity'], rows=rows):
+            yield chunk['intensity']
+
+    def iter_error(self, rows=None):
+        r"""Iterates over the error of the normalized intensity chunk by chunk
+        """
+        for sl, chunk in self.iter_chunks(columns=['error'], rows=rows):
+            yield chunk['error']
+
+    def select(self, rows=None, columns=None):
+        r"""Reads a subset of the data into an in-memory :class:`.Data`
+        object.
+
+        Parameters
+        ----------
+        rows : slice, int array or bool array, optional
+            Default: None. Rows to read. Boolean masks are applied chunk by
+            chunk.
+
+        columns : list of str, optional
+            Default: None. Columns to read, in addition to the detector,
+            monitor and time columns which are always read.
+
+        Returns
+        -------
+        data : :class:`.Data`
+
+        """
+        keys = list(self._data.keys()) if columns is None else list(columns)
+        for key in self.data_keys.values():
+            if key not in keys:
+                keys.append(key)
+
+        if rows is None:
+            rows = slice(None)
+
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(self.n_rows)
+            _data = OrderedDict((key, np.asarray(self._data[key][start:stop])[::step]) for key in keys)
+            err = None if self._err is None else np.asarray(self._err[start:stop])[::step]
+        else:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                if rows.shape != (self.n_rows,):
+                    raise IndexError('Boolean index must have shape ({0},)'.format(self.n_rows))
+                parts = OrderedDict((key, []) for key in keys)
+                err_parts = []
+                for sl, chunk in self.iter_chunks(columns=keys):
+                    mask = rows[sl]
+                    for key in keys:
+                        parts[key].append(chunk[key][mask])
+                    if self._err is not None:
+                        err_parts.append(np.asarray(self._err[sl])[mask])
+                _data = OrderedDict((key, self._concatenate(value)) for key, value in parts.items())
+                err = self._concatenate(err_parts) if self._err is not None else None
+            else:
+                order = np.argsort(rows, kind='mergesort')
+                inverse = np.argsort(order, kind='mergesort')
+                _rows = rows[order]
+                _data = OrderedDict((key, np.asarray(self._data[key][_rows])[inverse]) for key in keys)
+                err = None if self._err is None else np.asarray(self._err[_rows])[inverse]
+
+        output = Data()
+        output._data = _data
+        output.data_keys = dict(self.data_keys)
+        output.Q_keys = dict(self.Q_keys)
+        output.time_norm = self.time_norm
+        output.m0 = self.m0
+        output.t0 = self.t0
+        output._err = err
+        return output
+
+    def estimate_background(self, bg_params):
+        r"""Estimate the background according to ``type`` specified. See
+        :py:meth:`.Analysis.estimate_background`. `'minimum'` is evaluated
+        chunk by chunk, `'percent'` reads the intensity into memory.
+        """
+        if isinstance(bg_params, dict) and bg_params.get('type') == 'minimum':
+            return min(np.nanmin(chunk) for chunk in self.iter_intensity())
+        return super(OutOfCoreData, self).estimate_background(bg_params)
+
+    def _moments(self, bounds, background, hkle, order):
+        r"""Calculates moments up to ``order`` in a single pass over the
+        chunks, accumulating the moments :math:`\int w`,
+        :math:`\int (x - x_0) w` and :math:`\int (x - x_0)^2 w` about the mean
+        :math:`x_0` of the first chunk, which avoids the cancellation of raw
+        moments in the width. Bounds may be a boolean array or a function
+        taking a chunk (``OrderedDict`` of columns) and returning the mask for
+        that chunk.
+        """
+        keys = self.get_keys(hkle)
+        n_keys = len(keys)
+        shift = []
+
+        def func(chunk):
+            weights = chunk['intensity'] - background
+            if order == 0:
+                return weights[np.newaxis]
+            X = np.vstack([chunk[key] for key in keys])
+            if not shift:
+                shift.append(X.mean(axis=1))
+            X = X - shift[0][:, np.newaxis]
+            terms = [weights[np.newaxis], X * weights]
+            if order > 1:
+                terms.append(X ** 2 * weights)
+            return np.vstack(terms)
+
+        totals = sum(self._chunked_trapz(keys, bounds, func).values())
+
+        integral = totals[0]
+        position, width = None, None
+        if order > 0:
+            offset = totals[1:1 + n_keys] / integral
+            position = offset + shift[0] if shift else offset
+        if order > 1:
+            width = np.maximum(totals[1 + n_keys:] / integral - offset ** 2, 0.)
+
+        return MomentResult(keys, integral, position, width)
+
+    def bin(self, to_bin, build_hkl=True):
+        r"""Rebin the data into the specified shape, accumulating the binned
+        sums chunk by chunk. Memory use is bounded by the size of the output
+        grid. See :py:meth:`.Data.bin`.
+
+        Parameters
+        ----------
+        to_bin : dict
+            A dictionary containing information about which data_column
+            should be binned in the following format:
+
+                `'key': [lower_bound, upper_bound, num_points]`
+
+        build_hkl : bool, optional
+            Toggle to build hkle. Default: True
+
+        Returns
+        -------
+        binned_data : :class:`.Data` object
+            In-memory data object with values binned to the specified bounds
+
+        """
+        bin_keys = list(to_bin.keys())
+        if build_hkl:
+            for key, value in self.Q_keys.items():
+                if key in bin_keys:
+                    bin_keys.remove(key)
+                bin_keys.append(value)
+
+        for key in bin_keys:
+            if key not in self._data:
+                raise KeyError(key)
+
+        args = []
+        for key in bin_keys:
+            try:
+                args.append(to_bin[key])
+            except KeyError:
+                if key in self.Q_keys.values():
+                    args.append([self._reduce_column(key, np.nanmin, min), self._reduce_column(key, np.nanmax, max), 1])
+                else:
+                    raise KeyError
+
+        q, qstep = [], []
+        for arg in args:
+            if arg[-1] == 1:
+                q.append(np.array([np.average(arg[:2])]))
+                qstep.append(arg[1] - arg[0])
+            else:
+                _q, _qstep = np.linspace(arg[0], arg[1], int(arg[2]), retstep=True)
+                q.append(_q)
+                qstep.append(_qstep)
+
+        # accumulate in the index order produced by np.meshgrid(*q).flatten()
+        shape = [len(_q) for _q in q]
+        order = list(range(len(q)))
+        if len(order) > 1:
+            order[0], order[1] = 1, 0
+        grid_shape = tuple(shape[i] for i in order)
+        n_bins = int(np.prod(grid_shape))
+
+        other_keys = [key for key in self._data.keys() if key not in bin_keys]
+        sums = OrderedDict((key, np.zeros(n_bins)) for key in other_keys)
+        err_sq = np.zeros(n_bins)
+        counts = np.zeros(n_bins)
+
+        for sl, chunk in self.iter_chunks(columns=list(self._data.keys()) + ['error']):
+            inside = np.ones(sl.stop - sl.start, dtype=bool)
+            index = []
+            for key, _q, step in zip(bin_keys, q, qstep):
+                values = chunk[key]
+                if len(_q) == 1:
+                    ind = np.zeros(values.shape, dtype=int)
+                    inside &= np.abs(values - _q[0]) <= step / 2.
+                else:
+                    ind = np.floor((values - _q[0]) / step + 0.5).astype(int)
+                    inside &= (ind >= 0) & (ind < len(_q))
+                index.append(ind)
+
+            flat = np.ravel_multi_index(tuple(index[i][inside] for i in order), grid_shape)
+            counts += np.bincount(flat, minlength=n_bins)
+            err_sq += np.bincount(flat, weights=chunk['error'][inside] ** 2, minlength=n_bins)
+            for key in other_keys:
+                sums[key] += np.bincount(flat, weights=chunk[key][inside], minlength=n_bins)
+
+        filled = counts > 0
+        Q = np.vstack([item.flatten() for item in np.meshgrid(*q)]).T[filled]
+
+        _data = OrderedDict()
+        for key in self._data.keys():
+            if key in bin_keys:
+                _data[key] = Q[:, bin_keys.index(key)]
+            else:
+                _data[key] = sums[key][filled] / counts[filled]
+
+        output = Data()
+        output._data = _data
+        output.data_keys = dict(self.data_keys)
+        output.Q_keys = dict(self.Q_keys)
+        output.time_norm = self.time_norm
+        output.m0 = self.m0
+        output.t0 = self.t0
+        output._err = np.sqrt(err_sq[filled] / counts[filled])
+        output.bin_keys = bin_keys
+        return output
+
+    def _chunked_trapz(self, keys, bounds, func):
+        r"""Evaluates ``np.trapz(func(chunk)[..., bounds], data[key][bounds])``
+        for every key in ``keys`` over the whole data set, one chunk at a
+        time. Segments spanning two chunks are accounted for by carrying the
+        last point of the previous chunk.
+        """
+        results = OrderedDict((key, 0.) for key in keys)
+        carry = OrderedDict((key, None) for key in keys)
+        columns = list(self._data.keys()) + ['intensity']
+
+        for sl, chunk in self.iter_chunks(columns=columns):
+            mask = self._chunk_bounds(bounds, sl, chunk)
+            y = np.asarray(func(chunk))[..., mask]
+            if y.shape[-1] == 0:
+                continue
+
+            for key in keys:
+                x = chunk[key][mask]
+                if carry[key] is not None:
+                    x_prev, y_prev = carry[key]
+                    results[key] = results[key] + (x[0] - x_prev) * (y[..., 0] + y_prev) / 2.
+                results[key] = results[key] + np.trapz(y, x, axis=-1)
+                carry[key] = (x[-1], y[..., -1])
+
+        return results
+
+    def _chunk_bounds(self, bounds, sl, chunk):
+        r"""Returns the boolean mask of rows inside ``bounds`` for one chunk,
+        consistent with :py:meth:`.Analysis.get_bounds`
+        """
+        if bounds is None:
+            return chunk[self.Q_keys['h']] != 0
+        if callable(bounds):
+            return np.asarray(bounds(chunk), dtype=bool)
+        return np.asarray(bounds[sl], dtype=bool)
+
+    def _reduce_column(self, key, chunk_func, combine):
+        r"""Reduces a column chunk by chunk
+        """
+        values = [chunk_func(chunk[key]) for sl, chunk in self.iter_chunks(columns=[key]) if chunk[key].size]
+        if not values:
+            warnings.warn('Column {0} is empty.'.format(key))
+            return np.nan
+        return combine(values)
+
+    @staticmethod
+    def _concatenate(chunks):
+        chunks = list(chunks)
+        if not chunks:
+            return np.array([])
+        return np.concatenate(chunks)
+
+
+def _to_str(value):
+    r"""Decodes HDF5 string attributes
+    """
+    if isinstance(value, bytes):
+        return value.decode('utf8')
+    return str(value)
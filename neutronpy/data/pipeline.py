@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+r"""Lazy evaluation of chained operations on Data objects
+
+"""
+import numbers
+from collections import OrderedDict
+
+import numpy as np
+
+from .background import BackgroundPlan
+from .data import Data
+
+
+def _merge_columns(datasets, factors, tols=None):
+    r"""Merges any number of data sets in one pass per data set, with the same
+    result as chaining :py:meth:`.Data.combine_data`.
+
+    Parameters
+    ----------
+    datasets : list of Data
+        Data objects to merge, which must have the same data columns
+
+    factors : list of float
+        Scale factors applied to the detector column of each data set
+
+    tols : ndarray, optional
+        Tolerances of the non data columns within which two points are
+        considered equal. Default: 5e-4
+
+    Returns
+    -------
+    data : OrderedDict
+        The merged and sorted data columns
+
+    """
+    from scipy.spatial import cKDTree
+
+    base = datasets[0]
+    data_columns = list(base.data_keys.values())
+    keys = list(base._data.keys())
+    q_keys = [key for key in keys if key not in data_columns]
+
+    if tols is None:
+        tols = np.array([5.e-4 for key in q_keys])
+    tols = np.array(tols, dtype=float)
+    scale = np.where(tols > 0, tols, np.finfo(float).eps)
+
+    columns = OrderedDict()
+    for key in keys:
+        if key in data_columns:
+            columns[key] = np.array(base._data[key], dtype=float)
+        else:
+            columns[key] = np.asarray(base._data[key])
+    columns[base.data_keys['detector']] *= factors[0]
+
+    for data, factor in zip(datasets[1:], factors[1:]):
+        try:
+            new_columns = OrderedDict((key, np.asarray(data._data[key])) for key in keys)
+        except KeyError:
+            raise ValueError('Data objects must have the same data columns to be combined.')
+        new_columns[base.data_keys['detector']] = new_columns[base.data_keys['detector']] * factor
+
+        points = np.vstack([columns[key] for key in q_keys]).T / scale
+        new_points = np.vstack([new_columns[key] for key in q_keys]).T / scale
+
+        dist, ind = cKDTree(points).query(new_points, p=np.inf, distance_upper_bound=1. + 1.e-9)
+        matched = np.isfinite(dist)
+
+        for key in keys:
+            if key in data_columns:
+                np.add.at(columns[key], ind[matched], new_columns[key][matched])
+        for key in keys:
+            columns[key] = np.concatenate((columns[key], new_columns[key][~matched]))
+
+    ind = np.lexsort(tuple(columns[key] for key in q_keys))
+
+    return OrderedDict((key, value[ind]) for key, value in columns.items())
+
+
+class _Node(object):
+    r"""Base class of the nodes of a lazy expression. ``factor`` is a scale
+    factor applied to the detector column of the output of the node.
+    """
+    name = 'Node'
+
+    def __init__(self, children, factor=1.):
+        self.children = list(children)
+        self.factor = factor
+
+    def describe(self):
+        r"""Returns a one line description of the node
+        """
+        description = self.name
+        if self.factor != 1:
+            description += ' (detector * {0:g})'.format(self.factor)
+        return description
+
+    def lines(self, indent=0):
+        r"""Returns the description of the node and its children
+        """
+        output = ['    ' * indent + self.describe()]
+        for child in self.children:
+            output += child.lines(indent + 1)
+        return output
+
+    def passes(self):
+        r"""Returns the number of passes over the data needed to evaluate the
+        node and its children
+        """
+        return 1 + sum(child.passes() for child in self.children)
+
+    def _scale(self, data):
+        if self.factor != 1:
+            data.detector = data.detector * self.factor
+        return data
+
+
+class _Source(_Node):
+    name = 'Source'
+
+    def __init__(self, data, factor=1.):
+        super(_Source, self).__init__([], factor)
+        self.data = data
+
+    def describe(self):
+        description = 'Source: {0} points, {1} columns'.format(len(self.data.detector), len(self.data.data))
+        if self.factor != 1:
+            description += ' (detector * {0:g})'.format(self.factor)
+        return description
+
+    def passes(self):
+        return int(self.factor != 1)
+
+    def evaluate(self):
+        if self.factor != 1:
+            return self.data * self.factor
+        return self.data
+
+
+class _Scale(_Node):
+    name = 'Scale'
+
+    def describe(self):
+        return 'Scale: detector * {0:g}'.format(self.factor)
+
+    def evaluate(self):
+        return self.children[0].evaluate() * self.factor
+
+
+class _Merge(_Node):
+    name = 'Merge'
+
+    def __init__(self, children, tols=None, factor=1.):
+        super(_Merge, self).__init__(children, factor)
+        self.tols = tols
+
+    def describe(self):
+        description = 'Merge: {0} data sets'.format(len(self.children))
+        if self.tols is not None:
+            description += ', tols={0}'.format(list(self.tols))
+        if self.factor != 1:
+            description += ' (detector * {0:g})'.format(self.factor)
+        return description
+
+    def passes(self):
+        return len(self.children) + sum(child.passes() for child in self.children if not isinstance(child, _Source))
+
+    def evaluate(self):
+        datasets, factors = [], []
+        for child in self.children:
+            if isinstance(child, _Source):
+                datasets.append(child.data)
+                factors.append(child.factor * self.factor)
+            else:
+                datasets.append(child.evaluate())
+                factors.append(self.factor)
+
+        output = Data()
+        output.data_keys = dict(datasets[0].data_keys)
+        output.Q_keys = dict(datasets[0].Q_keys)
+        output.data = _merge_columns(datasets, factors, self.tols)
+        return output
+
+
+class _Subtract(_Node):
+    name = 'Subtract background'
+
+    def __init__(self, children, x=None, method='nearest', plan=None, factor=1.):
+        super(_Subtract, self).__init__(children, factor)
+        self.x = x
+        self.method = method
+        self.plan = plan
+
+    def describe(self):
+        description = 'Subtract background'
+        if self.plan is not None:
+            description += ': reused {0} plan along {1}'.format(self.plan.method, self.plan.keys)
+        elif self.x is not None:
+            description += ': {0} interpolation along {1}'.format(self.method, self.x)
+        if self.factor != 1:
+            description += ' (detector * {0:g})'.format(self.factor)
+        return description
+
+    def evaluate(self):
+        data = self.children[0].evaluate()
+        if self.plan is not None:
+            background = self.plan
+        else:
+            background = self.children[1].evaluate()
+
+        intensity, error = data._background_difference(background, self.x, self.method)
+        if self.factor != 1:
+            intensity = intensity * self.factor
+
+        output = data.copy()
+        _data = OrderedDict(output.data)
+        _data[data.data_keys['detector']] = intensity
+        _data[data.data_keys['monitor']] = np.ones(intensity.shape)
+        _data[data.data_keys['time']] = np.ones(intensity.shape)
+        output.t0 = 1
+        output.m0 = 1
+        output._err = error
+        output.data = _data
+        return output
+
+
+class _Bin(_Node):
+    name = 'Bin'
+
+    def __init__(self, children, to_bin, build_hkl=True, factor=1.):
+        super(_Bin, self).__init__(children, factor)
+        self.to_bin = to_bin
+        self.build_hkl = build_hkl
+
+    def describe(self):
+        description = 'Bin: ' + ', '.join('{0}={1}'.format(key, list(value)) for key, value in self.to_bin.items())
+        if self.factor != 1:
+            description += ' (detector * {0:g})'.format(self.factor)
+        return description
+
+    def evaluate(self):
+        output = self.children[0].evaluate().bin(self.to_bin, build_hkl=self.build_hkl)
+        return self._scale(output)
+
+
+def _optimize(node):
+    r"""Returns a fused copy of the expression: scale factors are folded into
+    the node that produces the scaled data, and nested merges with the same
+    tolerances are flattened into a single merge.
+    """
+    if isinstance(node, _Source):
+        return _Source(node.data, node.factor)
+
+    children = [_optimize(child) for child in node.children]
+
+    if isinstance(node, _Scale):
+        child = children[0]
+        child.factor *= node.factor
+        return child
+
+    if isinstance(node, _Merge):
+        flat = []
+        for child in children:
+            if isinstance(child, _Merge) and _same_tols(child.tols, node.tols):
+                for grandchild in child.children:
+                    grandchild.factor *= child.factor
+                    flat.append(grandchild)
+            else:
+                flat.append(child)
+        return _Merge(flat, node.tols, node.factor)
+
+    if isinstance(node, _Subtract):
+        return _Subtract(children, node.x, node.method, node.plan, node.factor)
+
+    if isinstance(node, _Bin):
+        return _Bin(children, node.to_bin, node.build_hkl, node.factor)
+
+    raise TypeError('Unknown node in the expression.')
+
+
+def _same_tols(tols1, tols2):
+    if tols1 is None or tols2 is None:
+        return tols1 is None and tols2 is None
+    return np.array_equal(tols1, tols2)
+
+
+class LazyData(object):
+    r"""A deferred chain of operations on :class:`.Data` objects. Operations
+    are recorded, and fused when the expression is evaluated, so that no
+    intermediate Data object is materialized for merges and scaling.
+
+    Parameters
+    ----------
+    data : Data or LazyData
+        The data object at the start of the chain
+
+    Attributes
+    ----------
+    node : object
+        The root of the recorded expression
+
+    Methods
+    -------
+    combine_data
+    subtract_background
+    bin
+    evaluate
+    explain
+    integrate
+    position
+    width
+    moments
+
+    Notes
+    -----
+    The usual operators record operations instead of executing them, *e.g.*
+    ``(d1.lazy() + d2 - bg) * norm`` records a merge, a background
+    subtraction and a scaling. When evaluated, merges of any number of data
+    sets are performed in a single vectorized pass over each data set, and
+    scale factors are applied by the node that produces the data, without
+    copying it.
+
+    """
+
+    def __init__(self, data):
+        if isinstance(data, LazyData):
+            self.node = data.node
+        elif isinstance(data, Data):
+            self.node = _Source(data)
+        else:
+            raise TypeError('LazyData must be built from a Data object.')
+
+    @classmethod
+    def _from_node(cls, node):
+        output = cls.__new__(cls)
+        output.node = node
+        return output
+
+    @staticmethod
+    def _as_node(obj):
+        if isinstance(obj, LazyData):
+            return obj.node
+        elif isinstance(obj, Data):
+            return _Source(obj)
+        else:
+            raise TypeError('You can only combine two Data objects: input object is the wrong format!')
+
+    def __add__(self, right):
+        return self.combine_data(right)
+
+    def __sub__(self, right):
+        return self.subtract_background(right)
+
+    def __mul__(self, right):
+        if not isinstance(right, numbers.Number):
+            return NotImplemented
+        return self._from_node(_Scale([self.node], right))
+
+    def __rmul__(self, left):
+        return self.__mul__(left)
+
+    def __truediv__(self, right):
+        if not isinstance(right, numbers.Number):
+            return NotImplemented
+        return self._from_node(_Scale([self.node], 1. / right))
+
+    __div__ = __truediv__
+
+    def __repr__(self):
+        return '<LazyData>\n' + '\n'.join(self.node.lines())
+
+    def combine_data(self, obj, tols=None):
+        r"""Records the merge of another data set, see
+        :py:meth:`.Data.combine_data`.
+
+        Parameters
+        ----------
+        obj : Data or LazyData
+            The data set to be merged
+
+        tols : ndarray, optional
+            Tolerances of the non data columns. Default: 5e-4
+
+        Returns
+        -------
+        expression : :class:`.LazyData`
+
+        """
+        return self._from_node(_Merge([self.node, self._as_node(obj)], tols))
+
+    def subtract_background(self, background_data, x=None, method='nearest'):
+        r"""Records the subtraction of background data, see
+        :py:meth:`.Data.subtract_background`.
+
+        Parameters
+        ----------
+        background_data : Data, LazyData or BackgroundPlan
+            The background data, or an interpolation plan built from it
+
+        x : str or list of str, optional
+            data_column key, or keys, of x-axis values over which background
+            should be subtracted. Default: None
+
+        method : str, optional
+            Interpolation method used with `x`. Default: 'nearest'
+
+        Returns
+        -------
+        expression : :class:`.LazyData`
+
+        """
+        if isinstance(background_data, BackgroundPlan):
+            return self._from_node(_Subtract([self.node], plan=background_data))
+        return self._from_node(_Subtract([self.node, self._as_node(background_data)], x, method))
+
+    def bin(self, to_bin, build_hkl=True):
+        r"""Records the rebinning of the data, see :py:meth:`.Data.bin`.
+
+        Parameters
+        ----------
+        to_bin : dict
+            A dictionary containing information about which data_column
+            should be binned
+
+        build_hkl : bool, optional
+            Toggle to build hkle. Default: True
+
+        Returns
+        -------
+        expression : :class:`.LazyData`
+
+        """
+        return self._from_node(_Bin([self.node], to_bin, build_hkl))
+
+    def evaluate(self):
+        r"""Evaluates the fused expression.
+
+        Returns
+        -------
+        data : :class:`.Data` object
+
+        """
+        return _optimize(self.node).evaluate()
+
+    def explain(self, optimize=True):
+        r"""Returns a description of the evaluation plan.
+
+        Parameters
+        ----------
+        optimize : bool, optional
+            If True, describes the fused plan that is evaluated, otherwise
+            the operations as recorded. Default: True
+
+        Returns
+        -------
+        plan : str
+
+        """
+        node = _optimize(self.node) if optimize else self.node
+        lines = node.lines()
+        lines.append('Passes over the data: {0}'.format(node.passes()))
+        return '\n'.join(lines)
+
+    def integrate(self, *args, **kwargs):
+        r"""Evaluates the expression and returns the integrated intensity, see
+        :py:meth:`.Analysis.integrate`
+        """
+        return self.evaluate().integrate(*args, **kwargs)
+
+    def position(self, *args, **kwargs):
+        r"""Evaluates the expression and returns the position, see
+        :py:meth:`.Analysis.position`
+        """
+        return self.evaluate().position(*args, **kwargs)
+
+    def width(self, *args, **kwargs):
+        r"""Evaluates the expression and returns the width, see
+        :py:meth:`.Analysis.width`
+        """
+        return self.evaluate().width(*args, **kwargs)
+
+    def moments(self, *args, **kwargs):
+        r"""Evaluates the expression and returns the moments, see
+        :py:meth:`.Analysis.moments`
+        """
+        return self.evaluate().moments(*args, **kwargs)
@@ -4,8 +4,6 @@ r"""A class for handeling a collection of scans
 """
 import collections
 
-import matplotlib.colors as mpl_c
-import matplotlib.pyplot as plt
 import numpy as np
 
 
@@ -18,6 +16,14 @@ class Scans(object):
         A dictionary of scan objects
     num_scans : int
         The number of scans
+    offsets : ndarray
+        Start of each scan in the stacked columns, with the total number of
+        points as last element
+    lengths : ndarray
+        Number of points in each scan
+    index : dict
+        For collections built by :py:func:`.load_scans`, the modification
+        time, size, key and metadata of each file, by path
 
     Methods
     -------
@@ -27,18 +33,37 @@ class Scans(object):
     min_col
     max_col
     mean_col
+    sum_col
+    column
+    segment_reduce
     update
+    invalidate_cache
     scans_check
 
+    Notes
+    -----
+    Columns of the scans are stacked on first use, *i.e.* concatenated into a
+    single array together with the offsets of each scan, so that reductions
+    over every scan run as segment operations. The stacked columns are
+    rebuilt when scans are added, replaced or given new column arrays; after
+    modifying a column array in place, call :py:meth:`invalidate_cache`.
+
     """
 
-    def __init__(self, scans_dict=None):
+    def __init__(self, scans_dict=None, index=None):
         if scans_dict is not None:
             if not isinstance(scans_dict, collections.OrderedDict):
                 raise RuntimeError(
                     "the input dictionary must be of type OrderedDict")
-            self.num_scans = len(scans_dict)
         self.scans = scans_dict
+        self.index = index
+        self._stacked = {}
+
+    @property
+    def num_scans(self):
+        r"""The number of scans
+        """
+        return len(self.scans) if self.scans is not None else 0
 
     def update(self, scans_dict):
         r"""Update the scans_dict to include the dictionary scans_dict
@@ -54,8 +79,15 @@ class Scans(object):
         if not isinstance(scans_dict, collections.OrderedDict):
             raise RuntimeError(
                 "the input dictionary must be of type OrderedDict")
+        if self.scans is None:
+            self.scans = collections.OrderedDict()
         self.scans.update(scans_dict)
-        self.num_scans = len(scans_dict)
+
+    def invalidate_cache(self):
+        r"""Clears the stacked columns. Only needed after modifying a column
+        array of a scan in place.
+        """
+        self._stacked = {}
 
     def scans_check(self):
         r"""Check to see if their are scans in the object.
@@ -72,6 +104,90 @@ class Scans(object):
         if self.scans is None:
             raise RuntimeError('There must be at lest one scan')
 
+    @property
+    def offsets(self):
+        r"""Start of each scan in the stacked columns, with the total number
+        of points as last element
+        """
+        self.scans_check()
+        lengths = [len(next(iter(scan.data.values()))) for scan in self.scans.values()]
+        return np.concatenate(([0], np.cumsum(lengths))).astype(int)
+
+    @property
+    def lengths(self):
+        r"""Number of points in each scan
+        """
+        return np.diff(self.offsets)
+
+    def column(self, col):
+        r"""Returns a column of every scan in the collection, concatenated
+        in the order of the scans
+
+        Parameters
+        ----------
+        col : str
+            The name of the column
+
+        Returns
+        -------
+        ndarray
+            The stacked column, where the points of scan ``i`` are
+            ``column[offsets[i]:offsets[i + 1]]``
+
+        """
+        self.scans_check()
+        sources = [scan.data[col] for scan in self.scans.values()]
+        try:
+            cached_sources, values = self._stacked[col]
+        except KeyError:
+            pass
+        else:
+            if len(cached_sources) == len(sources) and all(a is b for a, b in zip(cached_sources, sources)):
+                return values
+
+        values = np.concatenate([np.asarray(source).ravel() for source in sources])
+        if len(values) != self.offsets[-1]:
+            raise ValueError('Column {0} does not have the same length as the scans.'.format(col))
+        values.flags.writeable = False
+        self._stacked[col] = (sources, values)
+        return values
+
+    def segment_reduce(self, col, how):
+        r"""Reduces a column of every scan in the collection in a single
+        vectorized pass
+
+        Parameters
+        ----------
+        col : str
+            The name of the column
+
+        how : str
+            One of `'sum'`, `'mean'`, `'min'` or `'max'`
+
+        Returns
+        -------
+        array_like
+            an array where each element is the reduced column of a specific
+            scan in the collection, nan for empty scans
+
+        """
+        ufuncs = {'sum': np.add, 'mean': np.add, 'min': np.minimum, 'max': np.maximum}
+        if how not in ufuncs:
+            raise ValueError("how must be one of 'sum', 'mean', 'min' or 'max'")
+
+        values = np.asarray(self.column(col), dtype=float)
+        offsets = self.offsets
+        lengths = np.diff(offsets)
+        nonempty = lengths > 0
+
+        res = np.full(self.num_scans, np.nan)
+        if np.any(nonempty):
+            res[nonempty] = ufuncs[how].reduceat(values, offsets[:-1][nonempty])
+        if how == 'mean':
+            res[nonempty] /= lengths[nonempty]
+
+        return res
+
     def waterfall(self, x='e', y='detector', label_column='h', offset=5, fmt='b-', legend=False, show_plot=False):
         r"""Create a waterfall plot of all the scans in the collection
 
@@ -100,6 +216,8 @@ class Scans(object):
             Flag to plot a legend, where True plots a legend. Default: False.
 
         """
+        import matplotlib.pyplot as plt
+
         self.scans_check()
         fh = plt.figure()
         plt.hold(True)
@@ -136,7 +254,24 @@ class Scans(object):
             scan in the collection
 
         """
-        return self.func_col(col, np.mean)
+        return self.segment_reduce(col, 'mean')
+
+    def sum_col(self, col):
+        r"""Take the sum of a given column in every scan of the collection
+
+        Parameters
+        ----------
+        col : str
+           The name of the column for the sum
+
+        Returns
+        -------
+        array_like
+            an array where each element is the sum of the column of a specific
+            scan in the collection
+
+        """
+        return self.segment_reduce(col, 'sum')
 
     def func_col(self, col, func):
         r""" apply a function to a column an return the value for each scan
@@ -147,14 +282,21 @@ class Scans(object):
             The name of the column for the mean
 
         func: function
-            The function to apply
+            The function to apply. `np.sum`, `np.mean`, `np.min` and `np.max`
+            are evaluated as segment reductions of the stacked column.
 
         """
         self.scans_check()
+        for how, _func in (('sum', np.sum), ('mean', np.mean), ('min', np.min), ('max', np.max)):
+            if func is _func:
+                return self.segment_reduce(col, how)
+
+        values = self.column(col)
+        offsets = self.offsets
         res = np.empty(self.num_scans)
 
-        for idx, scan_key in enumerate(self.scans.keys()):
-            res[idx] = func(self.scans[scan_key].data[col])
+        for idx, (start, stop) in enumerate(zip(offsets[:-1], offsets[1:])):
+            res[idx] = func(values[start:stop])
 
         return res
 
@@ -173,7 +315,7 @@ class Scans(object):
                 scan in the collection
 
         """
-        return self.func_col(col, np.min)
+        return self.segment_reduce(col, 'min')
 
     def max_col(self, col):
         r""" find the minimum of a given collum in every scan of the collection
@@ -190,7 +332,7 @@ class Scans(object):
                 scan in the collection
 
         """
-        return self.func_col(col, np.max)
+        return self.segment_reduce(col, 'max')
 
     def pcolor(self, x, y, z='detector', clims=None, color_norm='linear', cmap='jet', show_plot=True):
         r"""Create a false colormap for a coloction of scans.
@@ -224,6 +366,10 @@ class Scans(object):
             A matplotlib colormaps.  Default: `'jet'`.
 
         """
+        import matplotlib.colors as mpl_c
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import PolyCollection
+
         self.scans_check()
         fh = plt.figure()
 
@@ -242,42 +388,49 @@ class Scans(object):
         # generate the last bin boundary to be the same distance from the mean as the next to last.
         biny[-1] = 2 * meany[-1] - biny[-2]
 
+        zvals = self.column(z)
+
         if clims is None:
             # calculate intensity range
-            intens_max = 0.
-            intens_min = 1.
-
-            for idx, scan_num in enumerate(self.scans.keys()):
-                maxz = self.scans[scan_num].data[z].max()
-                minz = self.scans[scan_num].data[z].min()
-
-                if maxz > intens_max:
-                    intens_max = maxz
-
-                if (minz < intens_min) & (minz > 0):
-                    intens_min = minz
+            intens_max = max(0., zvals.max())
+            minz = self.segment_reduce(z, 'min')
+            minz = minz[(minz < 1.) & (minz > 0)]
+            intens_min = minz.min() if len(minz) > 0 else 1.
         else:
             intens_max = clims[1]
             intens_min = clims[0]
 
-        for idx, scan_num in enumerate(self.scans.keys()):
-            meansx = self.scans[scan_num].data[x]
-            zvals = self.scans[scan_num].data[z]
-            yvals = np.array([biny[idx], meany[idx], biny[idx + 1]])
-            xvals = np.zeros(len(meansx) + 1)
-            xvals[1:-1] = (meansx[:-1] + meansx[1:]) / 2.
-            xvals[0] = 2 * meansx[0] - xvals[1]
-            xvals[-1] = 2 * meansx[-1] - xvals[-2]
-            xmat = np.vstack((xvals, xvals, xvals))
-            ymat = np.tile(yvals, (len(xvals), 1)).T
-            zmat = np.vstack((zvals, zvals))
-
-            if color_norm == 'log':
-                plt.pcolor(xmat, ymat, zmat, norm=mpl_c.LogNorm(
-                    vmin=intens_min, vmax=intens_max), cmap=cmap)
-            else:
-                plt.pcolor(xmat, ymat, zmat, vmin=intens_min,
-                           vmax=intens_max, cmap=cmap)
+        # bin boundaries of the x axis of every scan, from the stacked column
+        xvals = self.column(x)
+        first = np.zeros(len(xvals), dtype=bool)
+        last = np.zeros(len(xvals), dtype=bool)
+        first[self.offsets[:-1][self.lengths > 0]] = True
+        last[self.offsets[1:][self.lengths > 0] - 1] = True
+
+        mid = (xvals[:-1] + xvals[1:]) / 2.
+        left, right = np.empty(len(xvals)), np.empty(len(xvals))
+        left[1:], right[:-1] = mid, mid
+        left[first] = 2 * xvals[first] - right[first]
+        right[last] = 2 * xvals[last] - left[last]
+        single = first & last
+        left[single], right[single] = xvals[single], xvals[single]
+
+        scan_index = np.repeat(np.arange(self.num_scans), self.lengths)
+        bottom, top = biny[scan_index], biny[scan_index + 1]
+
+        verts = np.stack((np.vstack((left, bottom)).T, np.vstack((right, bottom)).T,
+                          np.vstack((right, top)).T, np.vstack((left, top)).T), axis=1)
+
+        if color_norm == 'log':
+            norm = mpl_c.LogNorm(vmin=intens_min, vmax=intens_max)
+        else:
+            norm = mpl_c.Normalize(vmin=intens_min, vmax=intens_max)
+
+        mesh = PolyCollection(verts, array=zvals, cmap=cmap, norm=norm, edgecolors='none', rasterized=True)
+        ax = plt.gca()
+        ax.add_collection(mesh)
+        ax.autoscale_view(tight=True)
+        plt.sci(mesh)
 
         plt.xlabel(x)
         plt.ylabel(y)
@@ -1,3 +1,6 @@
-from . import loaders
-from .data import load_data, detect_filetype, save_data
+from .cache import DataCache
+from .data import load_data, load_scans, open_data, detect_filetype, detect_filetypes, save_data
 from .instrument import load_instrument, save_instrument
+from .nexus import NexusReader
+from .registry import LoaderRegistry, register_loader
+from .tail import SpiceTail
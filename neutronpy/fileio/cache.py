@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+r"""Binary cache of parsed data files
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _hash(*args):
+    return hashlib.sha1('\0'.join(str(arg) for arg in args).encode('utf8')).hexdigest()[:16]
+
+
+def _load(filename):
+    try:
+        return np.load(filename, mmap_mode='c')
+    except ValueError:
+        return np.load(filename)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError
+
+
+class DataCache(object):
+    r"""Cache of parsed data files, stored as a memory-mapped binary array
+    of columns in a cache directory, see :py:func:`.load_data`.
+
+    Entries are keyed by the path, size and modification time of the
+    original file, so that a modified file is parsed again. The least
+    recently used entries are removed when the total size of the cache
+    exceeds `max_size`.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Cache directory. Default: the `NEUTRONPY_CACHE_DIR` environment
+        variable, or `~/.cache/neutronpy`
+
+    max_size : int, optional
+        Maximum size of the cache in bytes. Default: 1 GiB
+
+    Attributes
+    ----------
+    directory : str
+    max_size : int
+    size : int
+
+    Methods
+    -------
+    get
+    put
+    invalidate
+    clear
+
+    """
+
+    def __init__(self, directory=None, max_size=2 ** 30):
+        if directory is None:
+            directory = os.environ.get('NEUTRONPY_CACHE_DIR',
+                                       os.path.join(os.path.expanduser('~'), '.cache', 'neutronpy'))
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def _prefix(self, filename):
+        return _hash(os.path.abspath(filename))
+
+    def _entry(self, filename, build_hkl):
+        stat = os.stat(filename)
+        return os.path.join(self.directory, '{0}_{1}'.format(
+            self._prefix(filename), _hash(stat.st_size, repr(stat.st_mtime), bool(build_hkl))))
+
+    def _entries(self):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                if os.path.isfile(os.path.join(self.directory, name, 'meta.json'))]
+
+    @staticmethod
+    def _entry_size(entry):
+        return sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+
+    @property
+    def size(self):
+        r"""Total size of the cache in bytes
+        """
+        return sum(self._entry_size(entry) for entry in self._entries())
+
+    def get(self, filename, cls, build_hkl=True):
+        r"""Returns the cached data of a file, or None if the file is not in
+        the cache or was modified.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the original file
+
+        cls : type
+            Loader class of the file, *e.g.* :class:`.Spice`
+
+        build_hkl : bool, optional
+            Option used when the file was loaded. Default: True
+
+        Returns
+        -------
+        data : `cls` object or None
+            Data object whose columns are copy-on-write memory maps of the
+            cache
+
+        """
+        entry = self._entry(filename, build_hkl)
+        try:
+            with open(os.path.join(entry, 'meta.json')) as f:
+                meta = json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if meta['class'] != cls.__name__:
+            return None
+
+        data = cls()
+        for key, value in meta['attributes'].items():
+            setattr(data, key, value)
+
+        columns = _load(os.path.join(entry, 'columns.npy'))
+        data._data = OrderedDict(zip(meta['columns'], columns))
+        if meta['error']:
+            data._err = columns[-1]
+
+        os.utime(os.path.join(entry, 'meta.json'), None)
+
+        return data
+
+    def put(self, filename, data, build_hkl=True):
+        r"""Stores the parsed data of a file in the cache, replacing older
+        entries of the same file.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the original file
+
+        data : Data object
+            The data loaded from the file
+
+        build_hkl : bool, optional
+            Option used when the file was loaded. Default: True
+
+        """
+        entry = self._entry(filename, build_hkl)
+        self.invalidate(filename)
+
+        attributes = OrderedDict()
+        for key, value in data.__dict__.items():
+            if key in ('_data', '_err', '_derived'):
+                continue
+            try:
+                json.dumps(value, default=_json_default)
+            except (TypeError, ValueError):
+                continue
+            attributes[key] = value
+
+        error = getattr(data, '_err', None)
+        meta = OrderedDict([('filename', os.path.abspath(filename)),
+                            ('class', type(data).__name__),
+                            ('columns', list(data._data.keys())),
+                            ('error', error is not None),
+                            ('attributes', attributes)])
+
+        columns = list(data._data.values())
+        if error is not None:
+            columns.append(error)
+        try:
+            columns = np.vstack([np.asarray(value, dtype=np.float64).ravel() for value in columns])
+        except ValueError:
+            return
+
+        temp = tempfile.mkdtemp(dir=self.directory)
+        try:
+            np.save(os.path.join(temp, 'columns.npy'), columns)
+            with open(os.path.join(temp, 'meta.json'), 'w') as f:
+                json.dump(meta, f, default=_json_default)
+            os.rename(temp, entry)
+        except OSError:
+            shutil.rmtree(temp, ignore_errors=True)
+            return
+
+        self._evict()
+
+    def invalidate(self, filename=None):
+        r"""Removes the cached data of a file, or of every file.
+
+        Parameters
+        ----------
+        filename : str, optional
+            Path of the original file. Default: None, clears the cache
+
+        """
+        if filename is None:
+            return self.clear()
+
+        prefix = self._prefix(filename) + '_'
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def clear(self):
+        r"""Removes every entry of the cache
+        """
+        for entry in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def _evict(self):
+        r"""Removes the least recently used entries until the cache is no
+        larger than max_size
+        """
+        entries = sorted(self._entries(), key=lambda entry: os.path.getmtime(os.path.join(entry, 'meta.json')))
+        sizes = [self._entry_size(entry) for entry in entries]
+        total = sum(sizes)
+        for entry, size in zip(entries, sizes):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
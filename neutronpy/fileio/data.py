@@ -1,14 +1,23 @@
 # -*- coding: utf-8 -*-
-import copy
+import glob
 import numbers
+import os
+import re
+import warnings
+from collections import OrderedDict
+from multiprocessing import cpu_count, Pool  # @UnresolvedImport
 
 import numpy as np
 
+from .cache import DataCache
 from .instrument import save_instrument
-from .loaders import DcsMslice, Grasp, Ice, Icp, Mad, Neutronpy, Spice
+from .registry import registry
+from ..data import OutOfCoreData, Scans
 
+_CACHED_FILETYPES = ('dcs_mslice', 'ice', 'icp', 'mad', 'spice')
 
-def load_data(files, filetype='auto', tols=1e-4, build_hkl=True, load_instrument=False):
+
+def load_data(files, filetype='auto', tols=1e-4, build_hkl=True, load_instrument=False, cache=None):
     r"""Loads one or more files and creates a :class:`Data` object with the
     loaded data.
 
@@ -32,6 +41,12 @@ def load_data(files, filetype='auto', tols=1e-4, build_hkl=True, load_instrument
         If an array is given tolerances should be in the format
         `[h, k, l, e, temp]`.
 
+    cache : bool, str or :class:`.DataCache`, optional
+        Default: None. If given, parsed ascii files are stored in a binary
+        cache, and loaded from it as long as the file is not modified. True
+        uses the default cache directory, a str the given directory. Not used
+        if `load_instrument` is True.
+
     Returns
     -------
     Data : object
@@ -39,17 +54,14 @@ def load_data(files, filetype='auto', tols=1e-4, build_hkl=True, load_instrument
         files.
 
     """
-    load_filetype = {'dcs_mslice': DcsMslice,
-                     'grasp': Grasp,
-                     'ice': Ice,
-                     'icp': Icp,
-                     'mad': Mad,
-                     'neutronpy': Neutronpy,
-                     'spice': Spice}
-
     if not isinstance(files, (tuple, list)):
         files = (files,)
 
+    if cache is True:
+        cache = DataCache()
+    elif isinstance(cache, str):
+        cache = DataCache(cache)
+
     for filename in files:
         if filetype == 'auto':
             try:
@@ -57,11 +69,19 @@ def load_data(files, filetype='auto', tols=1e-4, build_hkl=True, load_instrument
             except ValueError:
                 raise
 
-        try:
-            _data_object_temp = load_filetype[filetype.lower()]()
+        loader = registry.get_loader(filetype)
+
+        use_cache = cache and not load_instrument and filetype.lower() in _CACHED_FILETYPES
+
+        _data_object_temp = None
+        if use_cache:
+            _data_object_temp = cache.get(filename, loader, build_hkl=build_hkl)
+
+        if _data_object_temp is None:
+            _data_object_temp = loader()
             _data_object_temp.load(filename, build_hkl=build_hkl, load_instrument=load_instrument)
-        except KeyError:
-            raise KeyError('Filetype not supported.')
+            if use_cache:
+                cache.put(filename, _data_object_temp, build_hkl=build_hkl)
 
         if isinstance(tols, numbers.Number):
             tols = [tols for i in range(len(_data_object_temp._data) - len(_data_object_temp.data_keys))]
@@ -69,11 +89,180 @@ def load_data(files, filetype='auto', tols=1e-4, build_hkl=True, load_instrument
         try:
             _data_object.combine_data(_data_object_temp, tols=tols)
         except (NameError, UnboundLocalError):
-            _data_object = copy.deepcopy(_data_object_temp)
+            _data_object = _data_object_temp
 
     return _data_object
 
 
+def _load_file(args):
+    r"""Loads a single file for :py:func:`load_scans`. Module level function
+    so that it can be used with the multiprocessing library.
+
+    Returns
+    -------
+    (filename, filetype, data, error) : tuple
+        data is None and error describes the exception if the file could not
+        be loaded, so that a malformed file does not abort the whole ingest
+
+    """
+    filename, filetype, build_hkl, load_instrument, cache = args
+    try:
+        if filetype == 'auto':
+            filetype = detect_filetype(filename)
+        data = load_data(filename, filetype=filetype, build_hkl=build_hkl, load_instrument=load_instrument,
+                         cache=cache)
+    except Exception as error:
+        return filename, filetype, None, '{0}: {1}'.format(type(error).__name__, error)
+
+    return filename, filetype, data, None
+
+
+def _scan_metadata(filename, filetype, data):
+    r"""Returns the metadata of a scan, from the 'key = value' lines of the
+    file header, with the scan number as 'scan'
+    """
+    metadata = OrderedDict()
+    header = getattr(data, 'file_header', [])
+    if isinstance(getattr(data, 'header', None), dict):
+        metadata.update(data.header)
+    elif isinstance(header, (list, tuple)):
+        for line in header:
+            if '=' in line:
+                key, value = line.split('=', 1)
+                if key.strip():
+                    metadata[key.strip()] = value.strip()
+
+    try:
+        metadata['scan'] = int(metadata['scan'])
+    except (KeyError, ValueError):
+        match = re.findall(r'(\d+)', os.path.splitext(os.path.basename(filename))[0])
+        metadata['scan'] = int(match[-1]) if match else os.path.basename(filename)
+
+    metadata['filetype'] = filetype
+    metadata['points'] = len(data.detector)
+
+    return metadata
+
+
+def load_scans(files, pattern='*', filetype='auto', build_hkl=True, load_instrument=False, processes=None,
+               scans=None, cache=None):
+    r"""Loads every file in a directory, or matching a glob pattern, into a
+    :class:`.Scans` collection keyed by scan number. Files are parsed
+    concurrently.
+
+    Parameters
+    ----------
+    files : str or list of str
+        A directory, a glob pattern, or a list of files
+
+    pattern : str, optional
+        Glob pattern of the files if `files` is a directory. Default: `'*'`
+
+    filetype : str, optional
+        Default: `'auto'`. Specify file type, see :py:func:`load_data`. By
+        default the filetype of each file is detected with
+        :py:func:`detect_filetype`, and files of unknown type are skipped.
+
+    build_hkl : bool, optional
+        Option to build Q = [h, k, l, e, temp]. Default: True
+
+    load_instrument : bool, optional
+        Option to build Instrument from file header. Default: False
+
+    processes : int, optional
+        Number of processes used to parse the files. Default: number of CPUs
+
+    scans : :class:`.Scans`, optional
+        A collection previously returned by this function. Only files that
+        are new, or whose modification time or size changed since, are
+        parsed; the others are taken from `scans`. Default: None
+
+    cache : bool, str or :class:`.DataCache`, optional
+        Binary cache of the parsed files, see :py:func:`load_data`.
+        Default: None
+
+    Returns
+    -------
+    scans : :class:`.Scans`
+        The collection, sorted by scan number, with :py:attr:`.Scans.index`
+        giving for each file its scan number, modification time, size, and
+        metadata from its header, and the error for files that could not be
+        parsed.
+
+    """
+    if isinstance(files, (tuple, list)):
+        filenames = list(files)
+    elif os.path.isdir(files):
+        filenames = glob.glob(os.path.join(files, pattern))
+    else:
+        filenames = glob.glob(files)
+    filenames = sorted(os.path.abspath(filename) for filename in filenames if os.path.isfile(filename))
+
+    previous = getattr(scans, 'index', None) or {}
+
+    index, loaded, to_load = OrderedDict(), {}, []
+    for filename in filenames:
+        stat = os.stat(filename)
+        entry = previous.get(filename)
+        if entry is not None and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size and (
+                        entry['key'] is None or entry['key'] in scans.scans):
+            index[filename] = dict(entry)
+            if entry['key'] is not None:
+                loaded[filename] = scans.scans[entry['key']]
+        else:
+            index[filename] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'error': None}
+            to_load.append(filename)
+
+    if filetype == 'auto':
+        filetypes = registry.detect_many(to_load)
+    else:
+        filetypes = [filetype] * len(to_load)
+
+    for filename, _filetype in zip(to_load, filetypes):
+        if _filetype is None:
+            index[filename].update(key=None, metadata=None)
+    to_load = [(filename, _filetype, build_hkl, load_instrument, cache)
+               for filename, _filetype in zip(to_load, filetypes) if _filetype is not None]
+
+    if processes is None:
+        processes = cpu_count()
+    processes = max(1, min(processes, len(to_load)))
+
+    if processes > 1:
+        pool = Pool(processes=processes)
+        try:
+            outputs = pool.map(_load_file, to_load)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        outputs = [_load_file(args) for args in to_load]
+
+    for filename, _filetype, data, error in outputs:
+        if data is None:
+            index[filename].update(key=None, metadata=None, error=error)
+        else:
+            index[filename].update(key=None, metadata=_scan_metadata(filename, _filetype, data))
+            loaded[filename] = data
+
+    def _sort_key(filename):
+        scan = index[filename]['metadata']['scan']
+        if isinstance(scan, numbers.Integral):
+            return 0, scan, filename
+        return 1, 0, str(scan) + filename
+
+    scans_dict = OrderedDict()
+    for filename in sorted(loaded, key=_sort_key):
+        key = index[filename]['metadata']['scan']
+        if key in scans_dict:
+            warnings.warn('Scan {0} is duplicated, {1} is keyed by its path.'.format(key, filename))
+            key = filename
+        index[filename]['key'] = key
+        scans_dict[key] = loaded[filename]
+
+    return Scans(scans_dict, index=index)
+
+
 def save_data(obj, filename, filetype='ascii', save_instr=False, overwrite=False, **kwargs):
     """Saves a given object to a file in a specified format.
 
@@ -96,6 +285,23 @@ def save_data(obj, filename, filetype='ascii', save_instr=False, overwrite=False
     overwrite : bool, optional
         Default: False.
 
+    kwargs : optional
+        For `'ascii'`, passed to :py:func:`numpy.savetxt`. For `'hdf5'`, the
+        columns are written as chunked datasets, with the options
+
+            `compression` : str, Default: `'gzip'`. HDF5 compression filter,
+            *e.g.* `'gzip'` or `'lzf'`, or None.
+
+            `compression_opts` : Default: 4. Options of the compression
+            filter, the level for `'gzip'`.
+
+            `shuffle` : bool, Default: True. Byte shuffle before compression.
+
+            `chunk_size` : int, Default: 65536. Number of rows per chunk.
+
+            `float32` : bool, Default: False. Store floating point columns
+            in single precision.
+
     """
     if filetype == 'ascii':
         from datetime import datetime
@@ -160,11 +366,25 @@ def save_data(obj, filename, filetype='ascii', save_instr=False, overwrite=False
                 for key, value in obj.Q_keys.items():
                     Q_keys.attrs.create(key, value.encode('utf8'))
 
-            for key, value in obj.data.items():
-                data.create_dataset(key, data=value)
-
-            if hasattr(obj, '_err'):
-                data.create_dataset('error', data=obj._err)
+            columns = OrderedDict(obj.data)
+            if getattr(obj, '_err', None) is not None:
+                columns['error'] = obj._err
+
+            compression = kwargs.get('compression', 'gzip')
+            options = {'compression': compression,
+                       'compression_opts': kwargs.get('compression_opts', 4 if compression == 'gzip' else None),
+                       'shuffle': kwargs.get('shuffle', True) and compression is not None}
+
+            for key, value in columns.items():
+                value = np.asarray(value)
+                if kwargs.get('float32', False) and value.dtype.kind == 'f':
+                    value = value.astype(np.float32)
+                chunks = (max(1, min(int(kwargs.get('chunk_size', 2 ** 16)), len(value))),) if value.ndim == 1 and len(
+                    value) > 0 else None
+                if chunks is None:
+                    data.create_dataset(key, data=value)
+                else:
+                    data.create_dataset(key, data=value, chunks=chunks, **options)
 
         if save_instr:
             try:
@@ -180,8 +400,49 @@ def save_data(obj, filename, filetype='ascii', save_instr=False, overwrite=False
         raise ValueError("""Format not supported. Please use 'ascii', 'hdf5', or 'pickle'""")
 
 
+def open_data(filename, columns=None, rows=None, chunk_size=2 ** 20):
+    r"""Opens a neutronpy HDF5 file, *e.g.* one written by
+    :py:func:`save_data`, reading only the requested columns and rows.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the HDF5 file
+
+    columns : list of str, optional
+        Default: None. Columns to read, in addition to the detector, monitor
+        and time columns which are always read. By default every column.
+
+    rows : slice, int array or bool array, optional
+        Default: None. Rows to read.
+
+    chunk_size : int, optional
+        Default: 1048576. Number of rows read from disk at once.
+
+    Returns
+    -------
+    data : :class:`.OutOfCoreData` or :class:`.Data`
+        If `rows` is None, an :class:`.OutOfCoreData` object backed by the
+        datasets in the file, which are read on demand; call its `close`
+        method, or use it as a context manager, to release the file.
+        Otherwise an in-memory :class:`.Data` object with the selected rows
+        and columns, normalized to the monitor and time of the whole file.
+
+    """
+    data = OutOfCoreData.from_hdf5(filename, columns=columns, chunk_size=chunk_size)
+    if rows is None:
+        return data
+
+    try:
+        return data.select(rows=rows, columns=columns)
+    finally:
+        data.close()
+
+
 def detect_filetype(filename):
-    r"""Simple method for quickly determining filetype of a given input file.
+    r"""Simple method for quickly determining filetype of a given input file,
+    from its extension or first bytes. Formats added with
+    :py:func:`register_loader` are also detected.
 
     Parameters
     ----------
@@ -194,27 +455,22 @@ def detect_filetype(filename):
         The filetype of the given input file
 
     """
-    if filename[-3:].lower() == 'nxs':
-        return 'grasp'
-    elif (filename[-4:].lower() == 'iexy') or (filename[-3:].lower() == 'spe') or (filename[-3:].lower() == 'xye') or (filename[-4:] == 'xyie'):
-        return 'dcs_mslice'
-    elif filename[-2:].lower() == 'h5' or filename[-3:].lower() == 'npy':
-        return 'neutronpy'
-    else:
-        with open(filename) as f:
-            first_line = f.readline()
-            second_line = f.readline()
-            if '#ICE' in first_line:
-                return 'ice'
-            elif '# scan' in first_line:
-                return 'spice'
-            elif 'GRASP' in first_line.upper():
-                return 'grasp'
-            elif 'Filename' in second_line:
-                return 'icp'
-            elif 'RRR' in first_line or 'AAA' in first_line or 'VVV' in first_line:
-                return 'mad'
-            elif 'NeutronPy' in first_line:
-                return 'neutronpy'
-            else:
-                raise ValueError('Unknown filetype.')
+    return registry.detect(filename)
+
+
+def detect_filetypes(filenames):
+    r"""Determines the filetypes of many files, reading only the first bytes
+    of files whose extension is not known.
+
+    Parameters
+    ----------
+    filenames : list of str
+        File paths
+
+    Returns
+    -------
+    filetypes : list of str or None
+        The filetype of each file, None if unknown
+
+    """
+    return registry.detect_many(filenames)
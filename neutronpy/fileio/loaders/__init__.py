@@ -1,7 +1,30 @@
-from .dcs_mslice import DcsMslice
-from .grasp import Grasp
-from .ice import Ice
-from .icp import Icp
-from .mad import Mad
-from .neutronpy import Neutronpy
-from .spice import Spice
+import importlib
+import sys
+
+_LOADERS = {'DcsMslice': 'dcs_mslice',
+            'Grasp': 'grasp',
+            'Ice': 'ice',
+            'Icp': 'icp',
+            'Mad': 'mad',
+            'Neutronpy': 'neutronpy',
+            'Spice': 'spice'}
+
+__all__ = sorted(_LOADERS)
+
+
+def __getattr__(name):
+    try:
+        module = importlib.import_module('.' + _LOADERS[name], __name__)
+    except KeyError:
+        raise AttributeError('module {0} has no attribute {1}'.format(__name__, name))
+    return getattr(module, name)
+
+
+if sys.version_info < (3, 7):
+    from .dcs_mslice import DcsMslice
+    from .grasp import Grasp
+    from .ice import Ice
+    from .icp import Icp
+    from .mad import Mad
+    from .neutronpy import Neutronpy
+    from .spice import Spice
@@ -1,3 +1,5 @@
+import re
+import warnings
 from collections import OrderedDict
 
 import numpy as np
@@ -5,6 +7,17 @@ import numpy as np
 from ...data import Data
 
 
+def _fromstring(text):
+    r"""Converts a block of whitespace separated numbers with one bulk
+    conversion. Fixed-width columns in which a negative number runs into the
+    previous one, *e.g.* ``-0.01452-0.0005235``, are separated first.
+    """
+    text = re.sub(r'(?<=[0-9.])-', ' -', text)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        return np.fromstring(text, dtype=np.float64, sep=' ')
+
+
 class DcsMslice(Data):
     r"""Loads DCS_MSLICE (NCNR) exported ascii data files.
 
@@ -57,88 +70,57 @@ class DcsMslice(Data):
 
     def load_spe(self, filename):
         with open(filename) as f:
-            data = []
-            for line in f:
-                if '###' not in line:
-                    _line = line.replace('\n', '').replace('-', ' -').replace('e -', 'e-').split()
-                else:
-                    _line = line.replace('\n', '')
-                data.append(_line)
-
-            shape = tuple(int(i) for i in data[0])
-            i = 1
-            col_headers = []
-            for line in data:
-                if '###' in line:
-                    col_headers.append(line.split('### ')[-1])
-                    if len(col_headers) == 4:
-                        break
-
-            x = []
-            for n, line in enumerate(data[2:]):
-                if '###' in line or len(x) >= shape[0]:
-                    line_num = 3 + n
-                    break
-                x.extend(line)
-
-            y = []
-            for n, line in enumerate(data[line_num:]):
-                if '###' in line or len(x) >= shape[1]:
-                    line_num += n + 1
-                    break
-                y.extend(line)
-
-            x = np.squeeze(np.array(x).astype(float))[:shape[0]]
-            y = np.squeeze(np.array(y).astype(float))[:shape[1]]
-            X, Y = np.meshgrid(x, y)
-
-            _temp_int_err = []
-            for i in range(shape[0] * 2):
-                _temp_data = []
-                for n, line in enumerate(data[line_num:]):
-                    if '###' in line:
-                        line_num += n + 1
-                        break
-                    else:
-                        _temp_data.extend(line)
-                _temp_int_err.append(np.squeeze(np.array(_temp_data).astype(float))[:shape[1]])
-            intensity = np.array(_temp_int_err[0::2]).T
-            err = np.array(_temp_int_err[1::2]).T
-
-            self._data = OrderedDict(intensity=intensity.flatten(),
-                                     error=err.flatten(),
-                                     x=X.flatten(),
-                                     y=X.flatten(),
-                                     monitor=np.ones(len(intensity)).flatten(),
-                                     time=np.ones(len(intensity)).flatten())
-            self.data_keys = {'detector': 'intensity', 'monitor': 'monitor', 'time': 'time'}
-            self._err = err
+            text = f.read()
+
+        # blocks[0] is the shape, then x, y, and intensity and error of each
+        # group, each block starting after a '###' line
+        blocks = re.split(r'^###.*$', text, flags=re.M)
+        shape = tuple(int(i) for i in blocks[0].split())
+
+        if len(blocks) < 3 + 2 * shape[0]:
+            raise ValueError('File was not loaded correctly!')
+
+        x = _fromstring(blocks[1])[:shape[0]]
+        y = _fromstring(blocks[2])[:shape[1]]
+        X, Y = np.meshgrid(x, y)
+
+        groups = blocks[3:3 + 2 * shape[0]]
+        values = _fromstring('\n'.join(groups))
+        if values.size == 2 * shape[0] * shape[1]:
+            values = values.reshape(2 * shape[0], shape[1])
+        else:
+            values = np.array([_fromstring(group)[:shape[1]] for group in groups])
+
+        intensity = values[0::2].T.flatten()
+        err = values[1::2].T.flatten()
+
+        self._set_data(intensity, err, X.flatten(), Y.flatten())
 
     def load_xyie(self, filename):
         with open(filename) as f:
-            data = []
-            for line in f:
-                data.append(line.replace('\n', '').split())
-
-        shape = tuple(int(i) for i in data[0])
-        x = np.squeeze(np.array(data[2:2 + shape[0]]).astype(float))
-        y = np.squeeze(np.array(data[3 + shape[0]:3 + shape[0] + shape[1]]).astype(float))
-        i = np.array(data[4 + np.sum(shape):4 + np.sum(shape) + shape[1]]).astype(float)
-        e = np.array(data[5 + np.sum(shape) + shape[1]:5 + np.sum(shape) + 2 * shape[1]]).astype(float)
-
-        if x.shape[0] == shape[0] and y.shape[0] == shape[1] and i.T.shape == shape and e.T.shape == shape:
-            X, Y = np.meshgrid(x, y)
-            self._data = OrderedDict(intensity=i.flatten(),
-                                     error=e.flatten(),
-                                     x=X.flatten(),
-                                     y=X.flatten(),
-                                     monitor=np.ones(len(i)).flatten(),
-                                     time=np.ones(len(i)).flatten())
-            self.data_keys = {'detector': 'intensity', 'monitor': 'monitor', 'time': 'time'}
-            self._err = e
-        else:
+            shape = tuple(int(i) for i in f.readline().split())
+            values = _fromstring(f.read())
+
+        size = shape[0] * shape[1]
+        if values.size != shape[0] + shape[1] + 2 * size:
             raise ValueError('File was not loaded correctly!')
 
+        offsets = np.cumsum([0, shape[0], shape[1], size, size])
+        x, y, i, e = (values[start:stop] for start, stop in zip(offsets[:-1], offsets[1:]))
+
+        X, Y = np.meshgrid(x, y)
+        self._set_data(i, e, X.flatten(), Y.flatten())
+
+    def _set_data(self, intensity, error, x, y):
+        self._data = OrderedDict(intensity=intensity,
+                                 error=error,
+                                 x=x,
+                                 y=y,
+                                 monitor=np.ones(len(intensity)),
+                                 time=np.ones(len(intensity)))
+        self.data_keys = {'detector': 'intensity', 'monitor': 'monitor', 'time': 'time'}
+        self._err = error
+
     def load_xye(self, filename):
         x, y, e = np.loadtxt(filename, unpack=True)
         self._data = OrderedDict(intensity=y, error=e, x=x, monitor=np.ones(len(y)), time=np.ones(len(y)))
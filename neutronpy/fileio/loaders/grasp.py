@@ -3,6 +3,7 @@ from collections import OrderedDict
 import numpy as np
 
 from ...data import Data
+from ..nexus import NexusReader
 
 
 class Grasp(Data):
@@ -34,29 +35,29 @@ class Grasp(Data):
             else:
                 raise IOError
 
-    def load_nxs(self, filename, **kwargs):
-        import h5py
+    def load_nxs(self, filename, paths=None, **kwargs):
+        r"""Loads a NeXus/HDF5 file, see :class:`.NexusReader`
 
-        f = h5py.File(filename)
+        Parameters
+        ----------
+        filename : str
+            Path to file to open
 
-        intensity = np.squeeze(np.array(f['entry0/data1/intensity1']))
-        qx = np.squeeze(np.array(f['entry0/data1/qx1']))
-        qy = np.squeeze(np.array(f['entry0/data1/qy1']))
-        qangles = np.squeeze(np.array(f['entry0/data1/qangle1']))
-        mod_q = np.squeeze(np.array(f['entry0/data1/mod_q1']))
-        err_intensity = np.squeeze(np.array(f['entry0/data1/err_intensity1']))
+        paths : dict, optional
+            Dictionary of column name to dataset path, which must include
+            'intensity' and 'err_intensity'. Default: GRASP exported datasets
 
-        self._data = OrderedDict(intensity=intensity,
-                                 qx=qx,
-                                 qy=qy,
-                                 qangles=qangles,
-                                 mod_q=mod_q,
-                                 err_intensity=err_intensity,
-                                 monitor=np.ones(intensity.shape),
-                                 time=np.ones(intensity.shape))
+        """
+        with NexusReader(filename, paths=paths) as reader:
+            data = OrderedDict((key, np.squeeze(reader.read(key))) for key in reader.paths)
+
+        intensity = data['intensity']
+        data['monitor'] = np.ones(intensity.shape)
+        data['time'] = np.ones(intensity.shape)
 
+        self._data = data
         self.data_keys = {'detector': 'intensity', 'monitor': 'monitor', 'time': 'time'}
-        self._err = err_intensity
+        self._err = data['err_intensity']
 
     def load_dat(self, filename, **kwargs):
         with open(filename) as f:
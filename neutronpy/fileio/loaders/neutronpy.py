@@ -3,7 +3,7 @@ from collections import OrderedDict
 
 import numpy as np
 
-from ...data import Data
+from ...data import Data, OutOfCoreData
 from ..instrument import load_instrument as load_instr
 
 
@@ -40,7 +40,7 @@ class Neutronpy(Data):
                 else:
                     raise IOError
 
-    def load_hdf5(self, filename, build_hkl=True, load_instrument=False):
+    def load_hdf5(self, filename, build_hkl=True, load_instrument=False, columns=None, rows=None):
         r"""Loads data from HDF5 format file
 
         Parameters
@@ -54,25 +54,28 @@ class Neutronpy(Data):
         load_instrument : bool, optional
             Option to build Instrument from file header
 
-        """
-        import h5py
-
-        data = OrderedDict()
-
-        with h5py.File(filename, 'r') as f:
-            data_root = f['data']
+        columns : list of str, optional
+            Columns to read, in addition to the detector, monitor and time
+            columns. Default: None, reads every column
 
-            for key, value in data_root.items():
-                data[key] = np.copy(value)
+        rows : slice, int array or bool array, optional
+            Rows to read. Default: None, reads every row
 
-            self._data = data
-            self.data_keys = dict((key, str(value)) for key, value in data_root['data_keys'].attrs.items())
-
-            if build_hkl:
-                try:
-                    self.Q_keys = dict((key, str(value)) for key, value in data_root['Q_keys'].attrs.items())
-                except KeyError:
-                    warnings.warn('Q_keys could not be built automatically.')
+        """
+        with OutOfCoreData.from_hdf5(filename, columns=columns) as source:
+            subset = source.select(rows=rows, columns=columns)
+            file_header = getattr(source, 'file_header', None)
+
+        self._data = subset._data
+        self._err = subset._err
+        self.data_keys = subset.data_keys
+        if rows is not None:
+            self.m0, self.t0 = subset.m0, subset.t0
+        if file_header is not None:
+            self.file_header = file_header
+
+        if build_hkl:
+            self.Q_keys = subset.Q_keys
 
         if load_instrument:
             self.instrument = load_instr(filename, filetype='hdf5')
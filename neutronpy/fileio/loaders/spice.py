@@ -1,3 +1,4 @@
+import warnings
 from collections import OrderedDict
 
 import numpy as np
@@ -6,9 +7,104 @@ from ...data import Data
 from ...instrument import Instrument
 
 
+def parse_header(file_header):
+    r"""Parses the ``key = value`` lines of a SPICE file header.
+
+    Parameters
+    ----------
+    file_header : list of str
+        Lines of the file header, without the leading ``'# '``
+
+    Returns
+    -------
+    header : OrderedDict
+        Values converted to int or float where possible. ``collimation``
+        and ``latticeconstants`` are converted to lists of floats, and
+        ``monochromator``, ``analyzer`` and ``def_x``, ``def_y`` are kept as
+        strings.
+
+    """
+    header = OrderedDict()
+    for line in file_header:
+        if '=' not in line:
+            continue
+        key, value = (item.strip() for item in line.split('=', 1))
+        if not key:
+            continue
+
+        if key in ('monochromator', 'analyzer', 'def_x', 'def_y'):
+            header[key] = value
+        elif key in ('collimation', 'latticeconstants'):
+            try:
+                header[key] = [float(col.strip()) for col in value.split('-' if key == 'collimation' else ',')]
+            except ValueError:
+                header[key] = value
+        else:
+            for _type in (int, float):
+                try:
+                    header[key] = _type(value)
+                    break
+                except ValueError:
+                    pass
+            else:
+                header[key] = value
+
+    return header
+
+
+def build_instrument(header):
+    r"""Builds an Instrument from a parsed SPICE file header.
+
+    Parameters
+    ----------
+    header : dict
+        Parsed file header, see :py:func:`parse_header`
+
+    Returns
+    -------
+    instrument : :class:`.Instrument`
+
+    """
+    instrument = Instrument()
+    if 'monochromator' in header:
+        instrument.mono.tau = header['monochromator']
+    if 'analyzer' in header:
+        instrument.ana.tau = header['analyzer']
+    if 'collimation' in header:
+        instrument.hcol = header['collimation']
+    if 'samplemosaic' in header:
+        instrument.sample.mosaic = header['samplemosaic']
+    if 'latticeconstants' in header:
+        instrument.sample.abc = header['latticeconstants'][:3]
+        instrument.sample.abg = header['latticeconstants'][3:]
+
+    return instrument
+
+
+def _parse_body(body, num_cols):
+    r"""Converts the numeric lines of a SPICE file into columns with one bulk
+    conversion, falling back to `np.genfromtxt` for irregular rows
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        values = np.fromstring(' '.join(body), dtype=np.float64, sep=' ')
+    if num_cols > 0 and values.size == len(body) * num_cols:
+        return values.reshape(len(body), num_cols).T
+
+    return np.atleast_2d(np.genfromtxt(body, dtype=np.float64)).T
+
+
 class Spice(Data):
     r"""Loads SPICE (HFIR) format ascii data file into a Data object
 
+    Attributes
+    ----------
+    file_header : list of str
+        Lines of the file header
+    header : OrderedDict
+        Parsed ``key = value`` fields of the file header, see
+        :py:func:`parse_header`
+
     """
 
     def __init__(self):
@@ -29,16 +125,21 @@ class Spice(Data):
             Option to build Instrument from file header
 
         """
-        file_header = []
         with open(filename) as f:
-            for line in f:
-                if '#' in line and 'col_headers' not in line:
-                    file_header.append(line.replace('\n', '').replace('# ', ''))
+            lines = f.read().splitlines()
+
+        file_header, body, col_headers = [], [], []
+        lines = iter(lines)
+        for line in lines:
+            if '#' in line:
                 if 'col_headers' in line:
-                    args = next(f).split()
-                    col_headers = [head for head in args[1:]]
+                    col_headers = next(lines).split()[1:]
+                else:
+                    file_header.append(line.replace('# ', ''))
+            elif line.strip():
+                body.append(line)
 
-        args = np.genfromtxt(filename, unpack=True, comments='#', dtype=np.float64)
+        args = _parse_body(body, len(col_headers))
 
         data = OrderedDict()
         for head, col in zip(col_headers, args):
@@ -49,32 +150,16 @@ class Spice(Data):
 
         self._data = data
         self.file_header = file_header
+        self.header = parse_header(file_header)
         self.data_keys = {'monitor': 'monitor', 'detector': 'detector', 'time': 'time'}
 
-        for line in file_header:
-            if 'def_x' in line:
-                self.plot_default_x = line.split('=')[-1].strip()
-            if 'def_y' in line:
-                self.plot_default_y = line.split('=')[-1].strip()
+        if 'def_x' in self.header:
+            self.plot_default_x = self.header['def_x']
+        if 'def_y' in self.header:
+            self.plot_default_y = self.header['def_y']
 
         if build_hkl:
             self.Q_keys = {'h': 'h', 'k': 'k', 'l': 'l', 'e': 'e', 'temp': 'tvti'}
 
         if load_instrument:
-            instrument = Instrument()
-            for item in file_header:
-                line = item.split('=')
-                if line[0].strip() == 'monochromator':
-                    instrument.mono.tau = line[-1].strip()
-                if line[0].strip() == 'analyzer':
-                    instrument.ana.tau = line[-1].strip()
-                if line[0].strip() == 'collimation':
-                    hcol = [float(col.strip()) for col in line[-1].split('-')]
-                    instrument.hcol = hcol
-                if line[0].strip() == 'samplemosaic':
-                    instrument.sample.mosaic = float(line[-1].strip())
-                if line[0].strip() == 'latticeconstants':
-                    instrument.sample.abc = [float(i.strip()) for i in line[-1].split(',')[:3]]
-                    instrument.sample.abg = [float(i.strip()) for i in line[-1].split(',')[3:]]
-
-            self.instrument = instrument
+            self.instrument = build_instrument(self.header)
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+r"""Streaming reader of NeXus/HDF5 detector data
+
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+GRASP_PATHS = OrderedDict([('intensity', 'entry0/data1/intensity1'),
+                           ('qx', 'entry0/data1/qx1'),
+                           ('qy', 'entry0/data1/qy1'),
+                           ('qangles', 'entry0/data1/qangle1'),
+                           ('mod_q', 'entry0/data1/mod_q1'),
+                           ('err_intensity', 'entry0/data1/err_intensity1')])
+
+
+class NexusReader(object):
+    r"""Reads detector data from NeXus/HDF5 files in bounded chunks, without
+    loading whole datasets into memory.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the NeXus/HDF5 file
+
+    paths : dict, optional
+        Dictionary of column name to dataset path in the file. Default: the
+        GRASP exported SANS datasets, see :py:data:`GRASP_PATHS`
+
+    chunk_size : int, optional
+        Default: 1048576. Maximum number of values per column read at once.
+        Whole rows along the first axis are read, at least one at a time,
+        so a single row larger than `chunk_size` is read at once.
+
+    Attributes
+    ----------
+    filename : str
+    paths : OrderedDict
+    chunk_size : int
+    shape : tuple
+
+    Methods
+    -------
+    open
+    close
+    read
+    iter_chunks
+    iter_frames
+    reduce
+
+    Notes
+    -----
+    The file is opened on first access and closed by :py:meth:`close`, or
+    at the end of a ``with`` block.
+
+    """
+
+    def __init__(self, filename, paths=None, chunk_size=2 ** 20):
+        self.filename = filename
+        self.paths = OrderedDict(GRASP_PATHS if paths is None else paths)
+        self.chunk_size = int(chunk_size)
+        self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def open(self):
+        r"""Opens the file, if not already open
+        """
+        if self._file is None:
+            import h5py
+
+            self._file = h5py.File(self.filename, 'r')
+        return self
+
+    def close(self):
+        r"""Closes the file
+        """
+        if getattr(self, '_file', None) is not None:
+            self._file.close()
+            self._file = None
+
+    def _dataset(self, key):
+        self.open()
+        try:
+            return self._file[self.paths.get(key, key)]
+        except KeyError:
+            raise KeyError('Dataset {0} not found in {1}'.format(self.paths.get(key, key), self.filename))
+
+    @property
+    def shape(self):
+        r"""Shape of the datasets, taken from the first column
+        """
+        return self._dataset(next(iter(self.paths))).shape
+
+    def read(self, key, selection=Ellipsis):
+        r"""Reads a selection of a dataset, *e.g.* a slice or pixel range.
+
+        Parameters
+        ----------
+        key : str
+            Column name in :py:attr:`paths`, or dataset path
+
+        selection : slice or tuple, optional
+            h5py selection. Default: the whole dataset
+
+        Returns
+        -------
+        data : ndarray
+
+        """
+        return np.asarray(self._dataset(key)[selection])
+
+    def iter_chunks(self, columns=None, rows=None, chunk_size=None):
+        r"""Iterates over the datasets in chunks along the first axis. Each
+        column is flattened, so that chunks are contiguous pixel ranges.
+
+        Parameters
+        ----------
+        columns : list of str, optional
+            Columns to read. Default: every column in :py:attr:`paths`
+
+        rows : slice, optional
+            Range along the first axis. Default: the whole datasets
+
+        chunk_size : int, optional
+            Maximum number of values per column in a chunk. Default:
+            :py:attr:`chunk_size`. Chunks hold whole rows and at least one
+            row, so chunks of datasets whose rows have more than
+            `chunk_size` values hold a single row each.
+
+        Yields
+        ------
+        (pixels, chunk) : tuple of slice and OrderedDict
+            Flat pixel range of the chunk, and the flattened columns
+
+        """
+        if columns is None:
+            columns = list(self.paths.keys())
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+
+        datasets = OrderedDict((key, self._dataset(key)) for key in columns)
+        shape = next(iter(datasets.values())).shape
+        start, stop, step = (rows or slice(None)).indices(shape[0] if shape else 1)
+        if step != 1:
+            raise ValueError('Only contiguous rows can be streamed.')
+
+        pixels_per_row = int(np.prod(shape[1:])) if len(shape) > 1 else 1
+        rows_per_chunk = max(1, chunk_size // pixels_per_row)
+
+        for row in range(start, stop, rows_per_chunk):
+            end = min(row + rows_per_chunk, stop)
+            chunk = OrderedDict((key, np.asarray(value[row:end]).ravel()) for key, value in datasets.items())
+            yield slice(row * pixels_per_row, end * pixels_per_row), chunk
+
+    def iter_frames(self, key, axis=-1):
+        r"""Iterates over the frames of a dataset along an axis, *e.g.* the
+        time channels or detector frames of an area detector run, reading a
+        single frame at a time.
+
+        Parameters
+        ----------
+        key : str
+            Column name in :py:attr:`paths`, or dataset path
+
+        axis : int, optional
+            Axis along which frames are taken. Default: the last axis
+
+        Yields
+        ------
+        frame : ndarray
+
+        """
+        dataset = self._dataset(key)
+        axis = axis % len(dataset.shape)
+        for n in range(dataset.shape[axis]):
+            selection = tuple(n if i == axis else slice(None) for i in range(len(dataset.shape)))
+            yield np.asarray(dataset[selection])
+
+    def reduce(self, func, initial=None, columns=None, rows=None, chunk_size=None):
+        r"""Reduces the datasets chunk by chunk with bounded memory use.
+
+        Parameters
+        ----------
+        func : callable
+            Called as ``func(accumulator, chunk)``, where ``chunk`` is the
+            OrderedDict of flattened columns yielded by
+            :py:meth:`iter_chunks`; returns the new accumulator
+
+        initial : object, optional
+            Initial value of the accumulator. Default: None
+
+        columns, rows, chunk_size : optional
+            See :py:meth:`iter_chunks`
+
+        Returns
+        -------
+        accumulator : object
+
+        """
+        accumulator = initial
+        for pixels, chunk in self.iter_chunks(columns=columns, rows=rows, chunk_size=chunk_size):
+            accumulator = func(accumulator, chunk)
+        return accumulator
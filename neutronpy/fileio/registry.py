@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+r"""Registry of data file loaders
+
+"""
+import importlib
+import os
+from collections import OrderedDict
+
+
+class LoaderRegistry(object):
+    r"""Registry of the data file formats known to :py:func:`.load_data` and
+    :py:func:`.detect_filetype`.
+
+    Each format has a loader class, which may be given as an import string
+    so that its module is only imported when a file of that format is
+    loaded, and cheap sniffing rules: file extensions, and a function of the
+    first bytes of the file.
+
+    Attributes
+    ----------
+    names : list of str
+    head_size : int
+        Number of bytes read from each file for sniffing
+
+    Methods
+    -------
+    register
+    unregister
+    get_loader
+    sniff
+    detect
+    detect_many
+
+    """
+
+    def __init__(self, head_size=512):
+        self._formats = OrderedDict()
+        self.head_size = head_size
+
+    @property
+    def names(self):
+        r"""Names of the registered formats
+        """
+        return list(self._formats.keys())
+
+    def register(self, name, loader, extensions=None, sniff=None, first=False):
+        r"""Registers a file format.
+
+        Parameters
+        ----------
+        name : str
+            Name of the format, used as `filetype` in :py:func:`.load_data`
+
+        loader : type or str
+            Loader class, a subclass of :class:`.Data` with a
+            ``load(filename, build_hkl, load_instrument)`` method, or its
+            import path as ``'package.module:Class'``
+
+        extensions : list of str, optional
+            File extensions, without the dot, that identify the format.
+            Default: None
+
+        sniff : callable, optional
+            Called as ``sniff(lines)`` with the lines of the first bytes of
+            a file, returns True if the file is of this format. Default: None
+
+        first : bool, optional
+            If True, the format is tried before the formats already
+            registered. Default: False
+
+        """
+        entry = {'loader': loader,
+                 'extensions': tuple(extension.lower() for extension in (extensions or ())),
+                 'sniff': sniff}
+
+        self._formats.pop(name.lower(), None)
+        if first:
+            self._formats = OrderedDict([(name.lower(), entry)] + list(self._formats.items()))
+        else:
+            self._formats[name.lower()] = entry
+
+    def unregister(self, name):
+        r"""Removes a file format.
+
+        Parameters
+        ----------
+        name : str
+            Name of the format
+
+        """
+        del self._formats[name.lower()]
+
+    def get_loader(self, name):
+        r"""Returns the loader class of a format, importing it if needed.
+
+        Parameters
+        ----------
+        name : str
+            Name of the format
+
+        Returns
+        -------
+        loader : type
+
+        """
+        try:
+            entry = self._formats[name.lower()]
+        except KeyError:
+            raise KeyError('Filetype not supported.')
+
+        if not isinstance(entry['loader'], type):
+            module, cls = entry['loader'].split(':')
+            entry['loader'] = getattr(importlib.import_module(module), cls)
+
+        return entry['loader']
+
+    def sniff(self, filename, head=None):
+        r"""Determines the format of a file from its name and first bytes.
+
+        Parameters
+        ----------
+        filename : str
+            File path
+
+        head : bytes, optional
+            First bytes of the file. Default: None, read only if no
+            extension matches
+
+        Returns
+        -------
+        name : str or None
+            Name of the format, None if unknown
+
+        """
+        basename = os.path.basename(filename).lower()
+        for name, entry in self._formats.items():
+            if any(basename.endswith(extension) for extension in entry['extensions']):
+                return name
+
+        if head is None:
+            with open(filename, 'rb') as f:
+                head = f.read(self.head_size)
+
+        lines = head.decode('utf8', 'replace').splitlines()
+        for name, entry in self._formats.items():
+            if entry['sniff'] is not None and entry['sniff'](lines):
+                return name
+
+        return None
+
+    def detect(self, filename):
+        r"""Determines the format of a file.
+
+        Parameters
+        ----------
+        filename : str
+            File path
+
+        Returns
+        -------
+        name : str
+
+        Raises
+        ------
+        ValueError
+            If the format is unknown
+
+        """
+        name = self.sniff(filename)
+        if name is None:
+            raise ValueError('Unknown filetype.')
+        return name
+
+    def detect_many(self, filenames):
+        r"""Determines the format of many files, reading at most
+        :py:attr:`head_size` bytes of each file, and only of files whose
+        extension is not registered.
+
+        Parameters
+        ----------
+        filenames : list of str
+            File paths
+
+        Returns
+        -------
+        names : list of str or None
+            Name of the format of each file, None if unknown or unreadable
+
+        """
+        names = []
+        for filename in filenames:
+            try:
+                names.append(self.sniff(filename))
+            except (IOError, OSError):
+                names.append(None)
+        return names
+
+
+def _line(lines, n):
+    return lines[n] if len(lines) > n else ''
+
+
+registry = LoaderRegistry()
+
+registry.register('ice', 'neutronpy.fileio.loaders.ice:Ice', sniff=lambda lines: '#ICE' in _line(lines, 0))
+registry.register('spice', 'neutronpy.fileio.loaders.spice:Spice', sniff=lambda lines: '# scan' in _line(lines, 0))
+registry.register('grasp', 'neutronpy.fileio.loaders.grasp:Grasp', extensions=['nxs'],
+                  sniff=lambda lines: 'GRASP' in _line(lines, 0).upper())
+registry.register('icp', 'neutronpy.fileio.loaders.icp:Icp', sniff=lambda lines: 'Filename' in _line(lines, 1))
+registry.register('mad', 'neutronpy.fileio.loaders.mad:Mad',
+                  sniff=lambda lines: any(key in _line(lines, 0) for key in ('RRR', 'AAA', 'VVV')))
+registry.register('neutronpy', 'neutronpy.fileio.loaders.neutronpy:Neutronpy', extensions=['h5', 'npy'],
+                  sniff=lambda lines: 'NeutronPy' in _line(lines, 0))
+registry.register('dcs_mslice', 'neutronpy.fileio.loaders.dcs_mslice:DcsMslice',
+                  extensions=['iexy', 'spe', 'xye', 'xyie'])
+
+
+def register_loader(name, loader, extensions=None, sniff=None, first=False):
+    r"""Registers a file format with the default registry, so that
+    :py:func:`.load_data` and :py:func:`.detect_filetype` support it. See
+    :py:meth:`LoaderRegistry.register`.
+    """
+    registry.register(name, loader, extensions=extensions, sniff=sniff, first=first)
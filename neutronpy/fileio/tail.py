@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+r"""Incremental reading of data files that are still being written
+
+"""
+import os
+import time
+
+from ..data.growable import GrowableData
+
+
+class SpiceTail(object):
+    r"""Follows a SPICE (HFIR) file during an acquisition. Each call to
+    :py:meth:`update` parses only the complete lines written since the
+    previous call, and appends the new points to :attr:`data`, a
+    :class:`.GrowableData` object, whose subscribers are notified.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the SPICE file
+
+    build_hkl : bool, optional
+        Option to build Q = [h, k, l, e, temp]. Default: True
+
+    load_instrument : bool, optional
+        Option to build Instrument from file header. Default: False
+
+    Attributes
+    ----------
+    filename : str
+    data : :class:`.GrowableData`
+        Data read so far, with the ``file_header`` and ``header`` attributes
+        of :class:`.Spice`
+    offset : int
+        Position in the file up to which it has been read
+
+    Methods
+    -------
+    update
+    follow
+    subscribe
+    unsubscribe
+
+    Notes
+    -----
+    If the file is replaced by a shorter file, *e.g.* when a scan is
+    restarted, it is read again from the start in the same data object,
+    whose columns are then replaced.
+
+    """
+
+    def __init__(self, filename, build_hkl=True, load_instrument=False):
+        self.filename = filename
+        self.build_hkl = build_hkl
+        self.load_instrument = load_instrument
+        self.data = GrowableData()
+        self._reset()
+
+    def _reset(self):
+        from .loaders.spice import parse_header
+
+        self.offset = 0
+        self._partial = b''
+        self._col_headers = None
+        self._expect_col_headers = False
+
+        self.data._data.clear()
+        self.data._buffers.clear()
+        self.data._n_rows = 0
+        self.data._err = None
+        self.data.m0 = 0
+        self.data.t0 = 0
+        self.data.file_header = []
+        self.data.header = parse_header([])
+        self.data.data_keys = {'monitor': 'monitor', 'detector': 'detector', 'time': 'time'}
+        if self.build_hkl:
+            self.data.Q_keys = {'h': 'h', 'k': 'k', 'l': 'l', 'e': 'e', 'temp': 'tvti'}
+        self.data.invalidate_cache()
+
+    def subscribe(self, callback):
+        r"""Registers a function called with ``(data, rows)`` when new
+        points are read, see :py:meth:`.GrowableData.subscribe`
+        """
+        self.data.subscribe(callback)
+
+    def unsubscribe(self, callback):
+        r"""Removes a function registered with :py:meth:`subscribe`
+        """
+        self.data.unsubscribe(callback)
+
+    def update(self):
+        r"""Reads the lines appended to the file since the last update.
+
+        Returns
+        -------
+        n_new : int
+            Number of new points
+
+        """
+        from .loaders.spice import _parse_body
+
+        if os.path.getsize(self.filename) < self.offset:
+            self._reset()
+
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        self.offset += len(chunk)
+
+        lines = (self._partial + chunk).split(b'\n')
+        self._partial = lines.pop()
+
+        body, header = [], []
+        for line in lines:
+            line = line.decode('utf8', 'replace').rstrip('\r')
+            if self._expect_col_headers:
+                self._col_headers = line.split()[1:]
+                self._expect_col_headers = False
+            elif '#' in line:
+                if 'col_headers' in line:
+                    self._expect_col_headers = True
+                else:
+                    header.append(line.replace('# ', ''))
+            elif line.strip() and self._col_headers is not None:
+                body.append(line)
+
+        if header:
+            self._update_header(header)
+
+        if not body:
+            return 0
+
+        columns = dict(zip(self._col_headers, _parse_body(body, len(self._col_headers))))
+        columns.pop('Pt.', None)
+        rows = self.data.append(columns)
+
+        return rows.stop - rows.start
+
+    def _update_header(self, lines):
+        from .loaders.spice import build_instrument, parse_header
+
+        data = self.data
+        data.file_header.extend(lines)
+        data.header.update(parse_header(lines))
+
+        if 'def_x' in data.header:
+            data.plot_default_x = data.header['def_x']
+        if 'def_y' in data.header:
+            data.plot_default_y = data.header['def_y']
+        if self.load_instrument:
+            data.instrument = build_instrument(data.header)
+
+    def follow(self, interval=2., timeout=None):
+        r"""Polls the file for new points until no points are written for
+        `timeout` seconds.
+
+        Parameters
+        ----------
+        interval : float, optional
+            Time between polls in seconds. Default: 2
+
+        timeout : float, optional
+            Time without new points after which to stop, in seconds.
+            Default: None, never stops
+
+        Yields
+        ------
+        n_new : int
+            Number of new points, at each poll that found new points
+
+        """
+        last = time.time()
+        while True:
+            n_new = self.update()
+            if n_new:
+                last = time.time()
+                yield n_new
+            elif timeout is not None and time.time() - last > timeout:
+                return
+            time.sleep(interval)
@@ -7,8 +7,6 @@ from collections import namedtuple
 
 import numpy as np
 
-from lmfit import Minimizer, Parameters, minimize
-
 from .plot import PlotFit
 from .tools import residual_wrapper
 
@@ -492,6 +490,8 @@ class Fitter(PlotFit):
             Initial fitting parameters
 
         """
+        from lmfit import Minimizer, Parameters
+
         self.params0 = params0
         p = Parameters()
 
@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import numpy as np
 
 
@@ -61,6 +60,8 @@ class PlotFit(object):
                 If this is True it will give a plot of the residuals
 
            """
+           import matplotlib.pyplot as plt
+
            xin=self.data[1]
            yin=self.data[2]
            errin=self.data[3]
@@ -2,28 +2,365 @@
 r"""Scattering methods for Materials class
 
 """
+import numpy as np
 
 
 class HKLGenerator(object):
-    r"""Methods for generating HKL reflections
+    r"""Methods for generating HKL reflections of a :class:`.Material`, using
+    its lattice metric, the rotations of its space group and its structure
+    factor engine. All methods work on arrays of reflections of shape
+    (n_hkl, 3) in chunks, so that millions of reflections can be handled.
+
+    Methods
+    -------
+    generate_hkl_positions
+    find_equivalent_positions
+    apply_scattering_rules
+    find_site_multiplicity
 
     """
-    def generate_hkl_positions(self):
-        r"""Generates hkl positions where scattering is allowed
+    _hkl_chunk_size = 2 ** 20
+
+    def _laue_rotations(self):
+        r"""Returns the distinct rotations of the space group and their
+        inverses, *i.e.* the Laue group acting on reflections
         """
-        pass
+        if getattr(self, 'space_group', None) is None:
+            rotations = np.eye(3, dtype=np.int64)[np.newaxis]
+        else:
+            rotations = np.round(self.space_group.symmetry_operations[:, :3, :3]).astype(np.int64)
+        rotations = np.concatenate((rotations, -rotations))
+        return np.unique(rotations.reshape(-1, 9), axis=0).reshape(-1, 3, 3)
 
-    def find_equivalent_positions(self):
-        r"""Eliminates equivalent hkl positions
+    def _key_base(self, hkl, rotations):
+        r"""Returns the base of the keys of :py:meth:`_equivalent_keys`, from
+        a bound on the indices of the rotated equivalents of the reflections,
+        which may exceed the indices of the reflections, *e.g.* h - k in
+        hexagonal groups
         """
-        pass
+        bound = np.einsum('i,rij->rj', np.abs(hkl).max(axis=0), np.abs(rotations)).max()
+        return 2 * int(bound) + 1
 
-    def apply_scattering_rules(self):
-        r"""Applies scattering rules for the space group
+    def _equivalent_keys(self, hkl, rotations, base):
+        r"""Returns an integer key of every equivalent of every reflection,
+        shape (n_hkl, n_rotations)
         """
-        pass
+        equivalents = np.einsum('ni,rij->nrj', hkl, rotations) + base // 2
+        return (equivalents[..., 0] * base + equivalents[..., 1]) * base + equivalents[..., 2]
+
+    def _chunks(self, n_hkl, n_per_hkl):
+        step = max(1, self._hkl_chunk_size // max(1, n_per_hkl))
+        for start in range(0, n_hkl, step):
+            yield slice(start, start + step)
+
+    def generate_hkl_positions(self, dmin=None, qmax=None, unique=True, tol=1e-6):
+        r"""Generates hkl positions where scattering is allowed, within a
+        d-spacing or :math:`|Q|` cutoff.
+
+        Parameters
+        ----------
+        dmin : float, optional
+            Minimum d-spacing in Å. Default: None, `qmax` is used
+
+        qmax : float, optional
+            Maximum :math:`|Q|` in Å\ :sup:`-1`, equivalent to
+            ``dmin = 2 * pi / qmax``. Default: None
+
+        unique : bool, optional
+            If True, only one reflection of each set of equivalent reflections
+            is returned, see :py:meth:`find_equivalent_positions`. Default:
+            True
+
+        tol : float, optional
+            Tolerance for systematic absences, see
+            :py:meth:`apply_scattering_rules`. Default: 1e-6
+
+        Returns
+        -------
+        (hkl, multiplicity) : tuple of ndarray
+            Allowed reflections of shape (n_hkl, 3), sorted by decreasing
+            d-spacing, and their multiplicity, which is 1 if `unique` is
+            False
 
-    def find_site_multiplicity(self):
-        r"""Finds the multiplicity of the hkl position
         """
-        pass
+        if dmin is None:
+            if qmax is None:
+                raise ValueError('Either dmin or qmax must be given.')
+            dmin = 2. * np.pi / qmax
+
+        gstar = self.Gstar / 4. / np.pi ** 2
+        smax2 = 1. / dmin ** 2
+        limits = np.floor(np.sqrt(np.diag(self.G)) / dmin + 1e-9).astype(np.int64)
+
+        h, k = np.meshgrid(np.arange(-limits[0], limits[0] + 1), np.arange(-limits[1], limits[1] + 1), indexing='ij')
+        hk = np.stack((h.ravel(), k.ravel()), axis=-1)
+        l = np.arange(-limits[2], limits[2] + 1)
+
+        hkl = []
+        for rows in self._chunks(len(hk), len(l)):
+            block = np.concatenate((np.repeat(hk[rows], len(l), axis=0), np.tile(l, len(hk[rows]))[:, np.newaxis]),
+                                   axis=1)
+            s2 = np.einsum('ni,ij,nj->n', block, gstar, block)
+            hkl.append(block[(s2 <= smax2 * (1. + 1e-9)) & np.any(block != 0, axis=1)])
+        hkl = np.concatenate(hkl)
+
+        if unique:
+            hkl, multiplicity = self.find_equivalent_positions(hkl)
+        else:
+            multiplicity = np.ones(len(hkl), dtype=np.int64)
+
+        allowed = self.apply_scattering_rules(hkl, tol=tol, return_mask=True)
+        hkl, multiplicity = hkl[allowed], multiplicity[allowed]
+
+        order = np.lexsort((-hkl[:, 2], -hkl[:, 1], -hkl[:, 0], np.einsum('ni,ij,nj->n', hkl, gstar, hkl).round(9)))
+        return hkl[order], multiplicity[order]
+
+    def find_equivalent_positions(self, hkl):
+        r"""Eliminates equivalent hkl positions, keeping one reflection of
+        each set of reflections related by the Laue group of the space group.
+
+        Parameters
+        ----------
+        hkl : array_like
+            Integer reflections, shape (n_hkl, 3)
+
+        Returns
+        -------
+        (hkl, multiplicity) : tuple of ndarray
+            Representative of each set of equivalent reflections, the largest
+            in lexicographic order, *e.g.* (1, 1, 0) rather than (0, -1, -1) in
+            a cubic group, and the number of distinct equivalent reflections,
+            see :py:meth:`find_site_multiplicity`
+
+        """
+        hkl = np.reshape(np.round(hkl).astype(np.int64), (-1, 3))
+        if len(hkl) == 0:
+            return hkl, np.zeros(0, dtype=np.int64)
+
+        rotations = self._laue_rotations()
+        base = self._key_base(hkl, rotations)
+
+        keys = np.empty(len(hkl), dtype=np.int64)
+        for rows in self._chunks(len(hkl), len(rotations)):
+            keys[rows] = self._equivalent_keys(hkl[rows], rotations, base).max(axis=1)
+
+        keys = np.unique(keys)
+        representatives = np.stack((keys // base ** 2, keys // base % base, keys % base), axis=-1) - base // 2
+
+        return representatives, self.find_site_multiplicity(representatives)
+
+    def apply_scattering_rules(self, hkl, tol=1e-6, return_mask=False):
+        r"""Applies scattering rules for the space group, *i.e.* removes the
+        systematically absent reflections due to lattice centering, screw
+        axes and glide planes.
+
+        Parameters
+        ----------
+        hkl : array_like
+            Reflections, shape (n_hkl, 3)
+
+        tol : float, optional
+            Tolerance on the phases :math:`\mathbf{h} \cdot \mathbf{t}`, in
+            cycles. Default: 1e-6
+
+        return_mask : bool, optional
+            If True, the boolean mask of allowed reflections is returned
+            instead of the reflections. Default: False
+
+        Returns
+        -------
+        hkl : ndarray
+            Allowed reflections, or mask of allowed reflections
+
+        Notes
+        -----
+        A reflection :math:`\mathbf{h}` is absent if, for a symmetry
+        operation :math:`(R, \mathbf{t})` with :math:`\mathbf{h} R =
+        \mathbf{h}`, :math:`\exp(2\pi i \mathbf{h} \cdot \mathbf{t}) \neq
+        1`. This exact rule does not depend on atom positions, so that
+        reflections that are weak or accidentally absent for the atoms of the
+        material are not removed.
+
+        """
+        hkl = np.reshape(np.asarray(hkl), (-1, 3))
+        allowed = np.ones(len(hkl), dtype=bool)
+        if getattr(self, 'space_group', None) is None:
+            return allowed if return_mask else hkl
+
+        operations = self.space_group.symmetry_operations
+        rotations, translations = operations[:, :3, :3], operations[:, :3, 3]
+        for rows in self._chunks(len(hkl), len(operations)):
+            block = np.asarray(hkl[rows], dtype=float)
+            invariant = np.all(np.abs(np.einsum('ni,oij->noj', block, rotations) - block[:, np.newaxis, :]) < 1e-9,
+                               axis=-1)
+            phases = np.dot(block, translations.T)
+            shifted = np.abs(phases - np.round(phases)) > tol
+            allowed[rows] = ~np.any(invariant & shifted, axis=1)
+
+        if return_mask:
+            return allowed
+        return hkl[allowed]
+
+    def find_site_multiplicity(self, hkl):
+        r"""Finds the multiplicity of the hkl positions, *i.e.* the number of
+        distinct reflections equivalent by the Laue group of the space group,
+        which contribute at the same d-spacing in a powder pattern.
+
+        Parameters
+        ----------
+        hkl : array_like
+            Integer reflections, shape (n_hkl, 3)
+
+        Returns
+        -------
+        multiplicity : ndarray
+            Multiplicity of each reflection
+
+        """
+        hkl = np.reshape(np.round(hkl).astype(np.int64), (-1, 3))
+        if len(hkl) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        rotations = self._laue_rotations()
+        base = self._key_base(hkl, rotations)
+
+        multiplicity = np.empty(len(hkl), dtype=np.int64)
+        for rows in self._chunks(len(hkl), len(rotations)):
+            keys = np.sort(self._equivalent_keys(hkl[rows], rotations, base), axis=1)
+            multiplicity[rows] = 1 + np.count_nonzero(np.diff(keys, axis=1), axis=1)
+
+        return multiplicity
+
+
+class PowderPattern(object):
+    r"""Methods for simulating the powder diffraction pattern of a
+    :class:`.Material`, from its unique reflections, their multiplicities
+    and structure factors, see :class:`.HKLGenerator`.
+
+    Methods
+    -------
+    calc_powder_peaks
+    calc_powder_pattern
+
+    """
+    def calc_powder_peaks(self, dmin=None, qmax=None):
+        r"""Calculates the powder diffraction peaks of the material.
+
+        Parameters
+        ----------
+        dmin : float, optional
+            Minimum d-spacing in Å. Default: None, `qmax` is used
+
+        qmax : float, optional
+            Maximum :math:`|Q|` in Å\ :sup:`-1`. Default: None
+
+        Returns
+        -------
+        (hkl, multiplicity, d, F2) : tuple of ndarray
+            Unique reflections sorted by decreasing d-spacing, their
+            multiplicity, d-spacing in Å, and squared structure factor
+
+        Notes
+        -----
+        Reflections are generated once for a given cutoff and lattice, so
+        that repeated calls, *e.g.* in a fit model, only recompute the
+        structure factors.
+
+        """
+        if dmin is None:
+            if qmax is None:
+                raise ValueError('Either dmin or qmax must be given.')
+            dmin = 2. * np.pi / qmax
+
+        key = (float(dmin), tuple(self.abc), tuple(self.abg))
+        cache = getattr(self, '_powder_reflections', None)
+        if cache is None or cache[0] != key:
+            hkl, multiplicity = self.generate_hkl_positions(dmin=dmin)
+            self._powder_reflections = cache = (key, hkl, multiplicity)
+        hkl, multiplicity = cache[1:]
+
+        d = 1. / np.sqrt(np.einsum('ni,ij,nj->n', hkl, self.Gstar / 4. / np.pi ** 2, hkl))
+        F2 = np.abs(self.structure_factor_engine.calculate(hkl, self.Gstar)) ** 2
+
+        return hkl, multiplicity, d, F2
+
+    def calc_powder_pattern(self, x, wavelength=None, axis='two_theta', fwhm=0.5, profile='gaussian', scale=1.,
+                            background=0.):
+        r"""Calculates the powder diffraction pattern of the material.
+
+        Parameters
+        ----------
+        x : array_like
+            Scattering angles 2\ :math:`\theta` in degrees, or :math:`|Q|` in
+            Å\ :sup:`-1`, at which the pattern is calculated
+
+        wavelength : float, optional
+            Incident wavelength in Å, used if `axis` is 'two_theta'.
+            Default: the wavelength of the material
+
+        axis : str, optional
+            'two_theta' or 'q'. Default: 'two_theta'
+
+        fwhm : float, tuple or callable, optional
+            Full width at half maximum of the peaks in units of `x`, or a
+            function of the peak positions returning the widths, *e.g.* a
+            Caglioti function. A tuple of the Lorentzian and Gaussian widths
+            for the 'voigt' profile. Default: 0.5
+
+        profile : str, optional
+            'gaussian', 'lorentzian' or 'voigt', see
+            :py:mod:`neutronpy.functions`. Default: 'gaussian'
+
+        scale : float, optional
+            Scale factor of the intensities. Default: 1
+
+        background : float, optional
+            Constant background. Default: 0
+
+        Returns
+        -------
+        intensity : ndarray
+            Intensity at `x`
+
+        Notes
+        -----
+        The integrated intensity of a peak is
+        :math:`m |F|^2 / (\sin\theta \sin 2\theta)` in 2\ :math:`\theta`,
+        with the Lorentz factor of a constant wavelength powder
+        diffractometer, and :math:`m |F|^2 / Q^2` in :math:`|Q|`.
+
+        """
+        from .. import functions
+
+        x = np.asarray(x, dtype=float)
+        if wavelength is None:
+            wavelength = self.wavelength
+
+        if axis == 'two_theta':
+            dmin = wavelength / 2. / np.sin(np.deg2rad(min(np.max(x), 180.)) / 2.)
+            hkl, multiplicity, d, F2 = self.calc_powder_peaks(dmin=dmin)
+            theta = np.arcsin(wavelength / 2. / d)
+            positions = 2. * np.rad2deg(theta)
+            areas = multiplicity * F2 / (np.sin(theta) * np.sin(2. * theta))
+        elif axis == 'q':
+            hkl, multiplicity, d, F2 = self.calc_powder_peaks(qmax=np.max(x))
+            positions = 2. * np.pi / d
+            areas = multiplicity * F2 / positions ** 2
+        else:
+            raise ValueError("axis must be 'two_theta' or 'q'.")
+
+        if callable(fwhm):
+            fwhm = fwhm(positions)
+        shape = (len(positions), 2) if profile == 'voigt' else (len(positions),)
+        widths = np.broadcast_to(np.asarray(fwhm, dtype=float), shape)
+
+        peaks = np.column_stack((scale * areas, positions, widths))
+        p = np.concatenate(([background, 0.], peaks.ravel()))
+
+        if profile == 'gaussian':
+            return functions.gaussian(p, x)
+        elif profile == 'lorentzian':
+            return functions.lorentzian(p, x)
+        elif profile == 'voigt':
+            return functions.voigt(p, x)
+        raise ValueError("profile must be 'gaussian', 'lorentzian' or 'voigt'.")
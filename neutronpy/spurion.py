@@ -10,6 +10,83 @@ from .crystal import Material
 from .energy import Energy
 
 
+_POWDERS = {'Al': 4.0495, 'Cu': 3.6149}
+_POWDER_MATERIALS = {}
+
+
+def _powder_material(name):
+    r"""Returns the fcc Material of a sample environment metal, created once
+    """
+    if name not in _POWDER_MATERIALS:
+        a = _POWDERS[name]
+        _POWDER_MATERIALS[name] = Material({'name': name,
+                                            'composition': [dict(ion=name, pos=[0, 0, 0])],
+                                            'massNorm': False,
+                                            'lattice': dict(abc=[a, a, a], abg=[90, 90, 90]),
+                                            'formulaUnits': 1.,
+                                            'space_group': 'Fm-3m'})
+    return _POWDER_MATERIALS[name]
+
+
+def powder_lines(material, energy=14.7, orders=(1, 2, 3)):
+    r"""Returns the powder lines of a material for a list of fixed energies,
+    including the higher order wavelengths passed by the monochromator or
+    analyzer, *e.g.* the aluminum or copper of sample environments.
+
+    Parameters
+    ----------
+    material : str or object
+        'Al', 'Cu' or a :class:`.Material`
+
+    energy : float or array_like
+        Fixed energies in meV
+
+    orders : list of int, optional
+        Orders n of the wavelengths :math:`\lambda/n`. Default: (1, 2, 3)
+
+    Returns
+    -------
+    lines : dict
+        Dictionary of arrays, with one element per line: 'energy' in meV,
+        'order', 'hkl', 'multiplicity', 'd' in Å, 'two_theta' in degrees,
+        'F2', the squared structure factor, and 'intensity', times the
+        multiplicity and the Lorentz factor. Lines are sorted by energy then
+        2theta.
+
+    """
+    if isinstance(material, str):
+        material = _powder_material(material)
+
+    energy = np.atleast_1d(np.asarray(energy, dtype=float))
+    orders = np.atleast_1d(np.asarray(orders, dtype=int))
+    wavelengths = Energy(energy=energy).wavelength[:, np.newaxis] / orders[np.newaxis, :]
+
+    hkl, multiplicity, d, F2 = material.calc_powder_peaks(dmin=wavelengths.min() / 2.)
+
+    ratio = wavelengths.ravel()[:, np.newaxis] / 2. / d[np.newaxis, :]
+    index, peak = np.nonzero(ratio <= 1.)
+    theta = np.arcsin(ratio[index, peak])
+
+    lines = {'energy': np.repeat(energy, len(orders))[index],
+             'order': np.tile(orders, len(energy))[index],
+             'hkl': hkl[peak],
+             'multiplicity': multiplicity[peak],
+             'd': d[peak],
+             'two_theta': 2. * np.rad2deg(theta),
+             'F2': F2[peak],
+             'intensity': multiplicity[peak] * F2[peak] / (np.sin(theta) * np.sin(2. * theta))}
+
+    order = np.lexsort((lines['two_theta'], lines['energy']))
+    return dict((key, value[order]) for key, value in lines.items())
+
+
+def _print_lines(lines):
+    print('(h, k, l)  2theta  |F|^2  wavelength')
+    print('------------------------------------')
+    for pos, tt, i0, n in zip(lines['hkl'], lines['two_theta'], lines['F2'], lines['order']):
+        print(list(pos), '{0:.4f}'.format(tt), '{0:.0f}'.format(i0), 'lambda/{0}'.format(n))
+
+
 def aluminum(energy=14.7):
     r"""Returns the positions of aluminum rings given a fixed energy
 
@@ -21,43 +98,29 @@ def aluminum(energy=14.7):
     Returns
     -------
     rings : str
-        Prints a list of the positions in 2theta of the aluminum rings
+        Prints a list of the positions in 2theta of the aluminum rings, for
+        the wavelength and its second and third orders, see
+        :py:func:`powder_lines`
     """
-    e = Energy(energy=energy)
-    struct = {'name': 'Al',
-              'composition': [dict(ion='Al', pos=[0, 0, 0])],
-              'debye-waller': False,
-              'massNorm': False,
-              'lattice': dict(abc=[4.0495, 4.0495, 4.0495], abg=[90, 90, 90]),
-              'formulaUnits': 1.,
-              'wavelength': e.wavelength,
-              'space_group': 'Fm-3m'}
-
-    reflections = ([1, 1, 1], [2, 0, 0], [2, 2, 0], [3, 1, 1])
-
-    struct_obj = Material(struct)
-    wavelengths = [e.wavelength / 3, e.wavelength / 2, e.wavelength]
-    print('(h, k, l)  2theta  |F|^2  wavelength')
-    print('------------------------------------')
+    _print_lines(powder_lines('Al', energy))
+
+
+def copper(energy=14.7):
+    r"""Returns the positions of copper rings given a fixed energy
 
-    hkl = []
-    two_theta = []
-    wavelength_fraction = []
-    str_fac = []
-    for wavelength in wavelengths:
-        for pos in reflections:
-            wavelength_fraction.append('lambda/{0:.0f}'.format(np.round(e.wavelength / wavelength)))
-            hkl.append(str(pos))
-            two_theta.append(struct_obj.get_two_theta(pos, wavelength))
-            str_fac.append(np.abs(struct_obj.calc_nuc_str_fac(pos)) ** 2)
-    hkl = np.array(hkl)
-    two_theta = np.array(two_theta)
-    wavelength_fraction = np.array(wavelength_fraction)
-    str_fac = np.array(str_fac)
-
-    ind = two_theta.argsort()
-    for pos, tt, i0, lam in zip(hkl[ind], two_theta[ind], str_fac[ind], wavelength_fraction[ind]):
-        print(pos, '{0:.4f}'.format(tt), '{0:.0f}'.format(i0), lam)
+    Parameters
+    ----------
+    energy : float
+        Fixed energy in meV
+
+    Returns
+    -------
+    rings : str
+        Prints a list of the positions in 2theta of the copper rings, for
+        the wavelength and its second and third orders, see
+        :py:func:`powder_lines`
+    """
+    _print_lines(powder_lines('Cu', energy))
 
 
 def currat_axe_peaks(instrument, scan, bragg_positions, angle_tol=1):
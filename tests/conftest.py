@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+r"""Test configuration: binary databases compiled during the tests are
+written to a temporary directory instead of the user cache
+
+"""
+import os
+import shutil
+import tempfile
+
+_CACHE_DIR = tempfile.mkdtemp(prefix='neutronpy-tests-')
+
+
+def pytest_configure(config):
+    os.environ['NEUTRONPY_CACHE_DIR'] = _CACHE_DIR
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
@@ -141,6 +141,36 @@ def test_analysis():
     background = dict(type='blah')
     assert (np.abs(data.integrate(background=background) - 1) < 1e-5)
 
+    moments = data.moments(bounds=bounds)
+    assert (np.abs(moments.integral - data.integrate(bounds=bounds)) < 1e-12)
+    assert (np.allclose(moments.position, data.position(bounds=bounds)))
+    assert (np.allclose(moments.width, data.width(bounds=bounds)))
+    assert (moments.keys == ['h', 'k', 'l', 'e', 'temp'])
+
+
+def test_batch_moments():
+    """Tests moments of many data sets and regions of interest
+    """
+    from neutronpy.data import batch_moments
+
+    x = np.linspace(-2, 2, 100)
+    datasets = [Data(h=x, k=0., l=0., e=4., temp=300., detector=functions.gaussian([0, 0, 1, x0, 0.5], x),
+                     monitor=np.ones(x.shape), time=np.ones(x.shape)) for x0 in (-0.5, 0., 0.5)]
+
+    result = batch_moments(datasets)
+    assert (result.integral.shape == (3,))
+    assert (result.position.shape == (3, 5))
+    assert (np.allclose(result.position[:, 0], [-0.5, 0., 0.5], atol=1e-5))
+    assert (np.allclose(result.width[:, 0], [data.width()[0] for data in datasets]))
+
+    rois = [datasets[1].h < 0, datasets[1].h > 0]
+    result = batch_moments(datasets[1], bounds=rois)
+    assert (np.allclose(result.integral, [datasets[1].integrate(bounds=roi) for roi in rois]))
+    assert (np.allclose(result.position[:, 0], [datasets[1].position(bounds=roi)[0] for roi in rois]))
+
+    with pytest.raises(ValueError):
+        batch_moments(datasets, bounds=rois)
+
 
 def test_init_cases():
     """Tests initialization cases
@@ -234,6 +264,131 @@ def test_norms():
     assert (np.all(data.intensity == data.detector / data.time * data.t0))
 
 
+def test_derived_cache():
+    """Test caching and invalidation of Q, intensity and error
+    """
+    data = build_data()
+    assert (data.intensity is data.intensity)
+    assert (data.error is data.error)
+    assert (data.Q is data.Q)
+    assert (not data.intensity.flags.writeable)
+
+    intensity = data.intensity
+    data.detector *= 2
+    assert (np.all(data.intensity == intensity * 2))
+
+    error = data.error
+    data.monitor = data.monitor * 2
+    assert (np.allclose(data.error, error / 2))
+
+    data.time_norm = True
+    assert (np.all(data.intensity == data.detector / data.time * data.t0))
+
+    Q = data.Q
+    data.h = 3
+    assert (np.all(data.Q[:, 0] == 3) and np.all(Q[:, 0] != 3))
+
+    data.data['detector'] = np.ones(data.detector.shape)
+    assert (np.all(data.intensity == 1. / data.time * data.t0))
+
+    data.data['detector'][:] = 2.
+    data.invalidate_cache()
+    assert (np.all(data.intensity == 2. / data.time * data.t0))
+
+
+def test_copy_on_write():
+    """Tests that arithmetic shares unchanged columns with the original
+    """
+    data = build_data()
+    detector = data.detector.copy()
+
+    data_mul = data * 10
+    assert (np.shares_memory(data_mul.h, data.h))
+    assert (not np.shares_memory(data_mul.detector, data.detector))
+    assert (np.all(data_mul.detector == detector * 10))
+    assert (np.all(data.detector == detector))
+
+    # reads do not copy shared columns
+    data_mul.integrate()
+    data_mul.position()
+    for key in ('h', 'k', 'l', 'e', 'temp'):
+        assert (np.shares_memory(data_mul.data[key], data.data[key]))
+
+    # shared columns cannot be modified in place, from either object
+    h = data_mul.h.copy()
+    for obj in (data, data_mul):
+        with pytest.raises(ValueError):
+            obj.data['h'][0] = 99.
+    data.data['h'] = np.where(np.arange(len(h)) == 0, 99., data.h)
+    assert (np.all(data_mul.h == h) and data.h[0] == 99.)
+    data_mul.h = np.where(np.arange(len(h)) == 1, 98., data_mul.h)
+    assert (data_mul.h[1] == 98. and data.h[1] == h[1])
+
+    # arrays given by the caller stay writable
+    error = np.sqrt(detector) + 1.
+    data_err = build_data()
+    data_err.error = error
+    data_err * 2
+    assert (error.flags.writeable)
+    error[0] = 0.
+    assert (np.shares_memory(data_err._err, error))
+
+    data_copy = data.copy()
+    data_copy.h = data.h + 1
+    assert (np.all(data.h != data_copy.h))
+    assert (not np.shares_memory(data.copy(deep=True).h, data.h))
+
+    data_imul = data.copy()
+    data_imul *= 2
+    assert (isinstance(data_imul, Data))
+    assert (np.all(data_imul.detector == detector * 2))
+    data_imul /= 2
+    assert (np.allclose(data_imul.detector, detector))
+    assert (np.all(data.detector == detector))
+
+    data_iadd = data.copy()
+    data_iadd += data
+    assert (isinstance(data_iadd, Data))
+    assert (np.all(data.detector == detector))
+
+
+def test_lazy_pipeline():
+    """Tests that lazy expressions match eager evaluation
+    """
+    data1, data2, data3 = build_data(), build_data(clean=False), build_data()
+    data3.h = data3.h + 0.0125
+    bg = build_data(clean=False)
+
+    eager = (data1 + data2 + data3).subtract_background(bg, x='h') * 2.
+    expression = (data1.lazy() + data2 + data3).subtract_background(bg, x='h') * 2.
+    lazy = expression.evaluate()
+
+    for key in eager.data:
+        assert (np.allclose(eager.data[key], lazy.data[key]))
+    assert (np.allclose(eager.intensity, lazy.intensity))
+    assert (np.allclose(eager.error, lazy.error))
+    assert (np.allclose(expression.integrate(), eager.integrate()))
+
+    plan = expression.explain()
+    assert ('Merge: 3 data sets' in plan)
+    assert ('detector * 2' in plan)
+    assert ('Scale' not in plan)
+    assert ('Scale' in expression.explain(optimize=False))
+
+    eager = (data1 * 0.5 + data2 - bg) / 4.
+    lazy = ((data1.lazy() * 0.5 + data2 - bg) / 4.).evaluate()
+    assert (np.allclose(eager.detector, lazy.detector))
+    assert (np.allclose(eager.monitor, lazy.monitor))
+
+    to_bin = {'h': [-1, 1, 21]}
+    eager = (data1 + data2).bin(to_bin)
+    lazy = (data1.lazy() + data2).bin(to_bin).evaluate()
+    assert (np.allclose(eager.intensity, lazy.intensity))
+
+    with pytest.raises(TypeError):
+        data1.lazy() + object
+
+
 def test_error():
     """Tests exception handling
     """
@@ -335,6 +490,154 @@ def test_background_subtraction():
         data.subtract_background(background_data2, ret=False)
 
 
+def test_background_plan():
+    """Test reusable background interpolation plans
+    """
+    from neutronpy.data import BackgroundPlan
+    from scipy.interpolate import griddata
+
+    data = build_3d_data()
+    background = Data(Q=np.vstack((item.ravel() for item in np.meshgrid(np.linspace(-1, 1, 23),
+                                                                        np.linspace(-1, 1, 19), 0., 0., 300.))).T,
+                      detector=np.random.rand(23 * 19) * 10., monitor=np.full(23 * 19, 1e5),
+                      time=np.full(23 * 19, 15.))
+
+    background_1d = Data(detector=np.random.rand(101), monitor=np.full(101, 1, dtype=float),
+                         time=np.full(101, 1, dtype=float), h=np.linspace(-1.1013, 0.9071, 101))
+
+    for method in ['nearest', 'linear']:
+        plan = BackgroundPlan(background_1d, x='h', method=method)
+        intensity, error = plan.interpolate(data)
+        assert (np.allclose(intensity, griddata(background_1d.h, background_1d.intensity, data.h, method=method),
+                            equal_nan=True))
+
+        plan = BackgroundPlan(background, x=['h', 'k'], method=method)
+        intensity, error = plan.interpolate(data)
+        points = np.vstack((background.h, background.k)).T
+        expected = griddata(points, background.intensity, np.vstack((data.h, data.k)).T, method=method)
+        expected_error = np.sqrt(griddata(points, background.error ** 2, np.vstack((data.h, data.k)).T,
+                                          method=method))
+        assert (np.allclose(intensity, expected, equal_nan=True))
+        assert (np.allclose(error, expected_error, equal_nan=True))
+
+    plan = BackgroundPlan(background, x=['h', 'k'], method='linear')
+    subtracted = data.subtract_background(plan)
+    assert (plan._last is not None)
+    assert (np.allclose(subtracted.detector, data.intensity - expected))
+    assert (np.allclose(subtracted.error, np.sqrt(np.maximum(data.error ** 2, expected_error ** 2))))
+    assert (np.allclose(plan.subtract(data).detector, subtracted.detector))
+    assert (np.allclose(data.subtract_background(background, x=['h', 'k'], method='linear').detector,
+                        subtracted.detector))
+    assert (np.allclose(data.lazy().subtract_background(plan).evaluate().detector, subtracted.detector))
+
+    with pytest.raises(ValueError):
+        BackgroundPlan(background, x='h', method='cubic')
+    with pytest.raises(KeyError):
+        BackgroundPlan(background, x='blah')
+
+
+def test_out_of_core(tmpdir):
+    """Test out-of-core data backed by HDF5 and memmap
+    """
+    import h5py
+    from neutronpy.data import OutOfCoreData
+
+    x = np.linspace(-2, 2, 1001)
+    y = functions.gaussian([0, 0, 1, 0, 0.5], x)
+    data = Data(h=x, k=0., l=0., e=4., temp=300., detector=y, monitor=np.full(x.shape, 2, dtype=float),
+                time=np.full(x.shape, 1, dtype=float))
+
+    filename = str(tmpdir.join('ooc.h5'))
+    with h5py.File(filename, 'w') as f:
+        group = f.create_group('data')
+        for key, value in data.data.items():
+            group.create_dataset(key, data=value)
+
+    with OutOfCoreData.from_hdf5(filename, chunk_size=97) as ooc:
+        assert (ooc.n_rows == 1001)
+        assert (np.allclose(ooc.intensity, data.intensity))
+        assert (np.allclose(ooc.error, data.error))
+        assert (np.abs(ooc.integrate() - data.integrate()) < 1e-10)
+        assert (np.abs(ooc.position()[0] - data.position()[0]) < 1e-10)
+        assert (np.abs(ooc.width()[0] - data.width()[0]) < 1e-10)
+
+        bounds = (data.h >= -1) & (data.h <= 1)
+        assert (np.abs(ooc.integrate(bounds=bounds) - data.integrate(bounds=bounds)) < 1e-10)
+        assert (np.abs(ooc.integrate(bounds=lambda chunk: (chunk['h'] >= -1) & (chunk['h'] <= 1)) -
+                       data.integrate(bounds=bounds)) < 1e-10)
+
+        subset = ooc[100:200]
+        assert (isinstance(subset, Data))
+        assert (np.all(subset.h == data.h[100:200]))
+        assert (np.all(ooc.select(rows=bounds, columns=['h']).h == data.h[bounds]))
+        assert ('k' not in ooc.select(rows=bounds, columns=['h']).data)
+
+        binned = ooc.bin(dict(h=[-2, 2, 41]))
+        assert (binned.detector.shape[0] == 41)
+        assert (np.abs(binned.detector[20] - np.mean(data.detector[np.abs(data.h) <= 0.05])) < 1e-10)
+
+    columns = {}
+    for key, value in data.data.items():
+        np.save(str(tmpdir.join(key + '.npy')), value)
+        columns[key] = str(tmpdir.join(key + '.npy'))
+
+    ooc = OutOfCoreData.from_memmap(columns, chunk_size=64)
+    assert (np.abs(ooc.integrate() - data.integrate()) < 1e-10)
+    assert (np.all(ooc.column('h', rows=slice(0, 10)) == data.h[:10]))
+
+    # the width of a constant column is zero, not the cancellation of raw moments
+    for temp in np.random.RandomState(0).uniform(1., 1000., 20):
+        np.save(str(tmpdir.join('temp.npy')), np.full(x.shape, temp))
+        ooc = OutOfCoreData.from_memmap(columns, chunk_size=64)
+        width = ooc.width(hkle=False, fwhm=True)
+        assert (np.all(np.isfinite(list(width.values()))) and width['temp'] == 0.)
+        assert (np.abs(ooc.position(hkle=False)['temp'] - temp) < 1e-9 * temp)
+        assert (np.abs(ooc.width()[0] - data.width()[0]) < 1e-10)
+
+
+def test_growable_data():
+    """Tests appending rows in amortized constant time
+    """
+    from neutronpy.data import GrowableData
+
+    data = GrowableData()
+    calls = []
+    data.subscribe(lambda obj, rows: calls.append(rows))
+
+    data.append({'h': [0.], 'detector': [0.], 'monitor': [1.], 'time': [1.]})
+    snapshot = data.copy()
+    intensity = data.intensity
+    buffers = [id(buffer) for buffer in data._buffers.values()]
+    for n in range(1, 15):
+        data.append({'h': n, 'detector': 4. * n, 'monitor': 1., 'time': 1.})
+    assert ([id(buffer) for buffer in data._buffers.values()] == buffers)
+    assert (data.n_rows == 15 and data.capacity == 16)
+    assert (len(calls) == 15 and calls[-1] == slice(14, 15))
+    assert (np.all(data.detector == 4. * np.arange(15)))
+    assert (len(snapshot.detector) == 1 and len(intensity) == 1)
+
+    data.append({'h': np.arange(15, 40), 'detector': np.ones(25), 'monitor': np.ones(25), 'time': np.ones(25)})
+    assert (data.n_rows == 40 and data.capacity == 40 and data.h[-1] == 39)
+
+    snapshot.append({'h': 1., 'detector': 8., 'monitor': 1., 'time': 1.})
+    assert (np.all(snapshot.detector == [0., 8.]) and data.detector[1] == 4.)
+
+    data.detector = np.zeros(40)
+    data.append({'h': 40., 'detector': 1., 'monitor': 1., 'time': 1.})
+    assert (np.sum(data.detector) == 1. and data.n_rows == 41)
+
+    with pytest.raises(KeyError):
+        data.append({'h': 41.})
+
+    data = GrowableData({'detector': [10., 10.], 'monitor': [1., 1.], 'time': [1., 1.]})
+    assert (np.all(data.intensity == [10., 10.]))
+    data.append({'detector': 10., 'monitor': 2., 'time': 1.})
+    assert (np.all(data.intensity == [20., 20., 10.]) and data.m0 == 2.)
+    data.m0 = 1.
+    data.append({'detector': 10., 'monitor': 4., 'time': 1.})
+    assert (data.m0 == 1. and np.all(data.intensity == [10., 10., 5., 2.5]))
+
+
 @patch("matplotlib.pyplot.show")
 def test_plotting(mock_show):
     """Test plotting
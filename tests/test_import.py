@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+r"""Tests import of neutronpy
+
+"""
+import subprocess
+import sys
+
+import pytest
+
+IMPORT_TIME_RATIO = 1.
+
+
+def test_import_time():
+    """Tests that importing neutronpy is fast and does not import heavy
+    dependencies. The import time, after numpy, is measured relative to
+    the import time of numpy in the same process, so that the budget does
+    not depend on the speed of the machine.
+    """
+    output = subprocess.check_output([sys.executable, '-c', '''
+import sys, timeit
+start = timeit.default_timer()
+import numpy
+middle = timeit.default_timer()
+import neutronpy
+stop = timeit.default_timer()
+print(middle - start)
+print(stop - middle)
+print(','.join(sorted(name for name in ('h5py', 'lmfit', 'matplotlib', 'pkg_resources', 'PyQt5', 'scipy')
+                      if name in sys.modules)))
+'''])
+    numpy_time, neutronpy_time, modules = output.decode().splitlines()
+    assert (float(neutronpy_time) < IMPORT_TIME_RATIO * float(numpy_time))
+    assert (modules == '')
+
+
+def test_lazy_attributes():
+    """Tests that subpackages and classes are available on first access
+    """
+    import neutronpy
+    from neutronpy import Material, crystal
+
+    assert (Material is crystal.Material and neutronpy.Data is neutronpy.data.Data)
+    assert ('Material' in dir(neutronpy) and 'fileio' in neutronpy.__all__)
+    assert (isinstance(neutronpy.__version__, str))
+    with pytest.raises(AttributeError):
+        neutronpy.not_a_module
+
+
+if __name__ == '__main__':
+    pytest.main()
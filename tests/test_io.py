@@ -3,6 +3,7 @@
 
 """
 import os
+from collections import OrderedDict
 
 import numpy as np
 import pytest
@@ -132,5 +133,286 @@ def test_filetype_detection():
         detect_filetype(os.path.join(os.path.dirname(__file__), 'filetypes/scan0006.test'))
 
 
+def test_load_scans(tmpdir):
+    """Tests ingest of a directory into a Scans collection
+    """
+    import shutil
+    from neutronpy.fileio import load_scans
+
+    path = os.path.join(os.path.dirname(__file__), 'filetypes/HB1A')
+    for n in range(222, 226):
+        shutil.copy(os.path.join(path, 'HB1A_exp0718_scan0{0}.dat'.format(n)), str(tmpdir))
+    tmpdir.join('notes.txt').write('not a data file\n')
+
+    scans = load_scans(str(tmpdir), processes=2)
+    assert (list(scans.scans.keys()) == [222, 223, 224, 225])
+    assert (np.all(scans.scans[223].detector == load_data(
+        os.path.join(path, 'HB1A_exp0718_scan0223.dat')).detector))
+    assert (len(scans.index) == 5)
+    entry = scans.index[str(tmpdir.join('HB1A_exp0718_scan0222.dat'))]
+    assert (entry['metadata']['scan'] == 222)
+    assert (entry['metadata']['filetype'] == 'spice')
+    assert (entry['metadata']['def_x'] == 'l')
+    assert (scans.index[str(tmpdir.join('notes.txt'))]['key'] is None)
+
+    shutil.copy(os.path.join(path, 'HB1A_exp0718_scan0226.dat'), str(tmpdir))
+    rescans = load_scans(str(tmpdir.join('*.dat')), scans=scans, processes=1)
+    assert (list(rescans.scans.keys()) == [222, 223, 224, 225, 226])
+    assert (rescans.scans[222] is scans.scans[222])
+    filename = str(tmpdir.join('HB1A_exp0718_scan0222.dat'))
+    assert (rescans.index[filename] == scans.index[filename] and rescans.index[filename] is not scans.index[filename])
+    rescans.index[filename]['key'] = None
+    assert (scans.index[filename]['key'] == 222)
+
+    with open(os.path.join(path, 'HB1A_exp0718_scan0227.dat')) as f:
+        lines = f.readlines()
+    truncated = [n for n, line in enumerate(lines) if line.startswith('# col_headers')][0] + 1
+    tmpdir.join('HB1A_exp0718_scan0227.dat').write(''.join(lines[:truncated]))
+    for processes in (1, 2):
+        rescans = load_scans(str(tmpdir), scans=scans, processes=processes)
+        assert (list(rescans.scans.keys()) == [222, 223, 224, 225, 226])
+        entry = rescans.index[str(tmpdir.join('HB1A_exp0718_scan0227.dat'))]
+        assert (entry['key'] is None and entry['error'].startswith('StopIteration'))
+        assert (rescans.index[str(tmpdir.join('HB1A_exp0718_scan0226.dat'))]['error'] is None)
+    assert (rescans.scans[226] is not None)
+
+
+def test_spice_header():
+    """Tests the parsed header of SPICE files
+    """
+    data = load_data(os.path.join(os.path.dirname(__file__), 'filetypes/HB1A/HB1A_exp0718_scan0222.dat'))
+    assert (data.header['scan'] == 222)
+    assert (data.header['def_x'] == 'l')
+    assert (data.header['collimation'] == [40., 40., 40., 60.])
+    assert (np.allclose(data.header['latticeconstants'], [13.659912, 9.922999, 6.896657, 90., 90., 90.]))
+    assert (data.plot_default_y == 'detector')
+    assert ('Pt.' not in data.data)
+    assert (len(data.detector) == len(data.data['l']))
+    assert (data.detector[0] == 168.)
+
+
+def test_dcs_mslice_blocks(tmpdir):
+    """Tests the block readers of SPE and XYIE files
+    """
+    spe = load_data(os.path.join(os.path.dirname(__file__), 'filetypes/test_filetypes.spe'))
+    xyie = load_data(os.path.join(os.path.dirname(__file__), 'filetypes/test_filetypes.xyie'))
+    for data in (spe, xyie):
+        assert (len(data.detector) == 35 * 66)
+        assert (len(data.monitor) == len(data.detector))
+        assert (len(np.unique(data.data['x'])) == 35)
+        assert (len(np.unique(data.data['y'])) == 66)
+    assert (np.allclose(spe.detector, xyie.detector, rtol=1e-2, atol=1e-3))
+
+    tmpdir.join('fixed.spe').write('2 3\n### x\n  -0.5000-0.2500 0.000\n### y\n 0.1 0.2 0.3 0.0\n'
+                                   '### I\n 1.0 2.0-1.00e+20\n### Errors\n 0.1 0.2 0.3\n'
+                                   '### I\n 4.0 5.0 6.0\n### Errors\n 0.4 0.5 0.6\n')
+    data = load_data(str(tmpdir.join('fixed.spe')))
+    assert (np.allclose(data.data['x'], [-0.5, -0.25] * 3))
+    assert (np.allclose(data.data['y'], [0.1, 0.1, 0.2, 0.2, 0.3, 0.3]))
+    assert (np.allclose(data.detector, [1., 4., 2., 5., -1e20, 6.]))
+    assert (np.allclose(data.error, [0.1, 0.4, 0.2, 0.5, 0.3, 0.6]))
+
+
+def test_load_data_cache(tmpdir):
+    """Tests the binary cache of parsed files
+    """
+    import shutil
+    from neutronpy.fileio import DataCache
+
+    filename = str(tmpdir.join('scan0222.dat'))
+    shutil.copy(os.path.join(os.path.dirname(__file__), 'filetypes/HB1A/HB1A_exp0718_scan0222.dat'), filename)
+    cache = DataCache(str(tmpdir.join('cache')), max_size=2 ** 20)
+
+    data = load_data(filename, cache=cache)
+    assert (cache.size > 0)
+    cached = load_data(filename, cache=cache)
+    assert (isinstance(cached.detector, np.memmap))
+    assert (type(cached) is type(data))
+    for key in data.data:
+        assert (np.all(cached.data[key] == data.data[key]))
+    assert (cached.Q_keys == data.Q_keys)
+    assert (cached.header == data.header)
+    assert (cached.file_header == data.file_header)
+    assert (np.all(cached.intensity == data.intensity))
+
+    with open(filename, 'a') as f:
+        f.write('# modified\n')
+    os.utime(filename, (0, 0))
+    assert (cache.get(filename, type(data)) is None)
+    assert (load_data(filename, cache=cache).file_header[-1] == 'modified')
+    assert (len(os.listdir(cache.directory)) == 1)
+
+    cache.invalidate(filename)
+    assert (cache.size == 0)
+
+    cache.max_size = 0
+    load_data(filename, cache=cache)
+    assert (cache.size == 0)
+
+
+def test_hdf5_chunked_lazy(tmpdir):
+    """Tests chunked, compressed HDF5 files and partial loading
+    """
+    import h5py
+    from neutronpy.fileio import open_data
+
+    data = build_data()
+    data._err = np.sqrt(data.detector)
+    filename = str(tmpdir.join('data'))
+    save_data(data, filename, filetype='hdf5', overwrite=True, chunk_size=16)
+    save_data(data, filename + '_f32', filetype='hdf5', overwrite=True, compression='lzf', float32=True)
+
+    with h5py.File(filename + '.h5', 'r') as f:
+        assert (f['data/detector'].compression == 'gzip')
+        assert (f['data/detector'].chunks == (16,))
+        assert (np.all(f['data/error'][()] == data._err))
+    with h5py.File(filename + '_f32.h5', 'r') as f:
+        assert (f['data/h'].compression == 'lzf')
+        assert (f['data/h'].dtype == np.float32)
+
+    loaded = load_data(filename + '.h5')
+    for key in data.data:
+        assert (np.all(loaded.data[key] == data.data[key]))
+    assert (np.all(loaded.error == data.error))
+
+    with open_data(filename + '.h5', columns=['h', 'e']) as lazy:
+        assert (sorted(lazy.data_columns) == ['detector', 'e', 'h', 'monitor', 'time'])
+        assert (np.all(lazy.column('h') == data.h))
+
+    cut = open_data(filename + '.h5', columns=['h', 'e'], rows=slice(10, 20))
+    assert (np.all(cut.h == data.h[10:20]))
+    assert (np.all(cut.detector == data.detector[10:20]))
+    assert (np.allclose(cut.intensity, data.intensity[10:20]))
+    assert ('k' not in cut.data)
+
+    f32 = load_data(filename + '_f32.h5')
+    assert (np.allclose(f32.detector, data.detector, rtol=1e-6))
+
+
+def test_nexus_reader(tmpdir):
+    """Tests streaming of NeXus/HDF5 detector data
+    """
+    import h5py
+    from neutronpy.fileio import NexusReader
+
+    filename = os.path.join(os.path.dirname(__file__), 'filetypes/000000.nxs')
+    with h5py.File(filename, 'r') as f:
+        intensity = f['entry0/data1/intensity1'][()]
+
+    with NexusReader(filename, chunk_size=1000) as reader:
+        assert (reader.shape == (128, 128, 1))
+        chunks = list(reader.iter_chunks(columns=['intensity', 'qx']))
+        assert (len(chunks) == 19)
+        assert (max(len(chunk['qx']) for pixels, chunk in chunks) <= 1000)
+        assert (np.all(np.concatenate([chunk['intensity'] for pixels, chunk in chunks]) == intensity.ravel()))
+        assert (chunks[1][0] == slice(896, 1792))
+
+        total = reader.reduce(lambda acc, chunk: acc + chunk['intensity'].sum(), initial=0., columns=['intensity'])
+        assert (np.isclose(total, intensity.sum()))
+
+        frames = list(reader.iter_frames('intensity'))
+        assert (len(frames) == 1 and np.all(frames[0] == intensity[..., 0]))
+        assert (np.all(reader.read('intensity', (slice(0, 2), slice(None), 0)) == intensity[:2, :, 0]))
+        with pytest.raises(KeyError):
+            reader.read('blah')
+
+    assert (reader._file is None)
+
+    with NexusReader(filename, paths={'counts': 'entry0/data1/intensity1'}) as reader:
+        assert (np.all(reader.read('counts') == intensity))
+
+    with h5py.File(str(tmpdir.join('frames.h5')), 'w') as f:
+        f.create_dataset('entry/counts', data=np.arange(24.).reshape(4, 3, 2))
+    reader = NexusReader(str(tmpdir.join('frames.h5')), paths={'counts': 'entry/counts'}, chunk_size=6)
+    frames = list(reader.iter_frames('counts', axis=0))
+    assert (len(frames) == 4 and frames[1].shape == (3, 2))
+    assert ([pixels for pixels, chunk in reader.iter_chunks(rows=slice(1, 3))] == [slice(6, 12), slice(12, 18)])
+    chunks = list(reader.iter_chunks(chunk_size=4))
+    assert (len(chunks) == 4 and all(len(chunk['counts']) == 6 for pixels, chunk in chunks))
+    reader.close()
+
+
+def test_loader_registry(tmpdir):
+    """Tests registration of a custom format and batch sniffing
+    """
+    import subprocess
+    import sys
+
+    from neutronpy.fileio import LoaderRegistry, detect_filetypes, register_loader
+    from neutronpy.fileio.loaders import Spice
+    from neutronpy.fileio.registry import registry
+
+    class Custom(Data):
+        def load(self, filename, build_hkl=True, load_instrument=False):
+            values = np.loadtxt(filename, skiprows=1)
+            self._data = OrderedDict([('x', values[:, 0]), ('detector', values[:, 1]),
+                                      ('monitor', np.ones(len(values))), ('time', np.ones(len(values)))])
+            self.data_keys = {'detector': 'detector', 'monitor': 'monitor', 'time': 'time'}
+            self.Q_keys = {}
+
+    tmpdir.join('run1.txt').write('#SITE\n1 10\n2 20\n')
+    register_loader('site', Custom, sniff=lambda lines: lines[0].startswith('#SITE'))
+    try:
+        data = load_data(str(tmpdir.join('run1.txt')))
+        assert (isinstance(data, Custom) and np.all(data.detector == [10, 20]))
+
+        filetypes = detect_filetypes([str(tmpdir.join('run1.txt')),
+                                      os.path.join(os.path.dirname(__file__), 'filetypes/scan0001.dat'),
+                                      os.path.join(os.path.dirname(__file__), 'filetypes/scan0006.test'),
+                                      str(tmpdir.join('missing.spe')), str(tmpdir.join('missing.dat'))])
+        assert (filetypes == ['site', 'spice', None, 'dcs_mslice', None])
+    finally:
+        registry.unregister('site')
+
+    with pytest.raises(KeyError):
+        load_data(str(tmpdir.join('run1.txt')), filetype='site')
+
+    local = LoaderRegistry(head_size=4)
+    local.register('spice', 'neutronpy.fileio.loaders.spice:Spice', sniff=lambda lines: lines[0] == '# sc')
+    assert (local.detect(os.path.join(os.path.dirname(__file__), 'filetypes/scan0001.dat')) == 'spice')
+    assert (local.get_loader('SPICE') is Spice)
+
+    modules = subprocess.check_output([sys.executable, '-c',
+                                       'import sys, neutronpy.fileio; '
+                                       'print(sorted(m for m in sys.modules if ".loaders." in m))'])
+    assert (modules.decode().strip() == '[]')
+
+
+def test_spice_tail(tmpdir):
+    """Tests incremental reading of a SPICE file being written
+    """
+    from neutronpy.fileio import SpiceTail
+
+    with open(os.path.join(os.path.dirname(__file__), 'filetypes/scan0001.dat'), 'rb') as f:
+        contents = f.read()
+    filename = tmpdir.join('live.dat')
+    reference = load_data(os.path.join(os.path.dirname(__file__), 'filetypes/scan0001.dat'))
+
+    cut1 = contents.index(b'     10 ')
+    cut2 = cut1 + 50
+    filename.write_binary(contents[:cut1])
+
+    tail = SpiceTail(str(filename))
+    updates = []
+    tail.subscribe(lambda data, rows: updates.append(rows))
+    assert (tail.update() == 9 and tail.data.header['def_x'] == 'h')
+    assert (tail.update() == 0)
+
+    with open(str(filename), 'ab') as f:
+        f.write(contents[cut1:cut2])
+    assert (tail.update() == 0)
+
+    with open(str(filename), 'ab') as f:
+        f.write(contents[cut2:])
+    assert (tail.update() == len(reference.detector) - 9 and tail.offset == len(contents))
+    assert (updates == [slice(0, 9), slice(9, len(reference.detector))])
+    assert (tail.data.data_columns == reference.data_columns)
+    assert (np.all(tail.data.Q == reference.Q) and np.all(tail.data.intensity == reference.intensity))
+    assert (tail.data.header['Sum of Counts'] == reference.header['Sum of Counts'])
+
+    filename.write_binary(contents[:cut1])
+    assert (tail.update() == 9 and tail.data.n_rows == 9)
+
+
 if __name__ == '__main__':
     pytest.main()
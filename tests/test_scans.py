@@ -76,3 +76,52 @@ def test_waterfall(mock_show):
     scansin=load_scans(222,243)
     s_obj=npysc.Scans(scans_dict=scansin)
     s_obj.waterfall(x='l',label_column='coldtip',offset=5000)
+
+def test_stacked_reductions():
+    """
+    test segment reductions of the stacked columns against reductions of each scan
+    """
+    scansin=load_scans(222,243)
+    tst_obj=npysc.Scans(scans_dict=scansin)
+    lengths=np.array([len(scan.data['l']) for scan in scansin.values()])
+    assert np.all(tst_obj.lengths==lengths)
+    assert np.all(tst_obj.column('l')==np.concatenate([scan.data['l'] for scan in scansin.values()]))
+    for func, method in ((np.mean, tst_obj.mean_col), (np.sum, tst_obj.sum_col),
+                         (np.min, tst_obj.min_col), (np.max, tst_obj.max_col)):
+        expected=np.array([func(scan.data['detector']) for scan in scansin.values()])
+        assert np.allclose(method('detector'), expected)
+    expected=np.array([np.median(scan.data['detector']) for scan in scansin.values()])
+    assert np.allclose(tst_obj.func_col('detector', np.median), expected)
+    with pytest.raises(ValueError):
+        tst_obj.segment_reduce('detector', 'std')
+    # stacked columns are rebuilt on update
+    tst_obj.update(collections.OrderedDict([(300, scansin[222])]))
+    assert tst_obj.num_scans == 23
+    assert len(tst_obj.column('l')) == lengths.sum() + lengths[0]
+    # and when scans or their columns are replaced or added
+    tst_obj=npysc.Scans(scans_dict=collections.OrderedDict([(222, scansin[222].copy()), (223, scansin[223])]))
+    assert len(tst_obj.mean_col('l')) == 2
+    tst_obj.scans[224]=scansin[224]
+    assert np.allclose(tst_obj.mean_col('l'), [np.mean(scansin[n].data['l']) for n in (222, 223, 224)])
+    tst_obj.scans[223]=scansin[225]
+    assert np.isclose(tst_obj.max_col('detector')[1], np.max(scansin[225].data['detector']))
+    tst_obj.scans[222].data['l']=scansin[222].data['l'] + 1.
+    assert np.isclose(tst_obj.min_col('l')[0], np.min(scansin[222].data['l']) + 1.)
+    # func_col applies any function to columns of any type
+    for scan in tst_obj.scans.values():
+        scan.data['label']=np.array(['a'] * len(scan.data['l']))
+    assert np.all(tst_obj.func_col('label', len) == tst_obj.lengths)
+
+@patch('matplotlib.pyplot.show')
+def test_pcolor_single_mesh(mock_show):
+    """
+    test that pcolor draws the whole collection as a single rasterized mesh
+    """
+    from matplotlib.collections import PolyCollection
+    scansin=load_scans(222,243)
+    s_obj=npysc.Scans(scans_dict=scansin)
+    fh=s_obj.pcolor(x='l',y='coldtip',color_norm='log')
+    meshes=[item for item in fh.axes[0].collections if isinstance(item, PolyCollection)]
+    assert len(meshes) == 1
+    assert meshes[0].get_rasterized()
+    assert len(meshes[0].get_array()) == s_obj.offsets[-1]
@@ -2,28 +2,88 @@
 r"""Unit tests for scattering functions
 
 """
+import numpy as np
 import pytest
-from neutronpy import Data, scattering
+from neutronpy import Data, Material, scattering
+
+
+def _material(space_group, abc):
+    return Material({'name': 'test',
+                     'composition': [dict(ion='Al', pos=[0, 0, 0])],
+                     'massNorm': False,
+                     'lattice': dict(abc=abc, abg=[90, 90, 90]),
+                     'space_group': space_group})
 
 
 def test_gen_hkl():
-    pattern = scattering.pattern.HKLGenerator()
-    pattern.generate_hkl_positions()
+    material = _material('Fm-3m', [4.0495, 4.0495, 4.0495])
+    hkl, multiplicity = material.generate_hkl_positions(dmin=1.)
+    assert (hkl[:4].tolist() == [[1, 1, 1], [2, 0, 0], [2, 2, 0], [3, 1, 1]])
+    assert (multiplicity[:4].tolist() == [8, 6, 12, 24])
+
+    all_hkl, ones = material.generate_hkl_positions(qmax=2 * np.pi, unique=False)
+    assert (len(all_hkl) == multiplicity.sum() and np.all(ones == 1))
+    assert (np.all([material.get_d_spacing(q) >= 1. - 1e-9 for q in all_hkl]))
+    with pytest.raises(ValueError):
+        material.generate_hkl_positions()
 
 
 def test_find_equiv_pos():
-    pattern = scattering.pattern.HKLGenerator()
-    pattern.find_equivalent_positions()
+    material = _material('P4/mmm', [4, 4, 6])
+    hkl, multiplicity = material.find_equivalent_positions([[1, 0, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1], [1, 2, 3]])
+    assert (hkl.tolist() == [[0, 0, 1], [1, 0, 0], [2, 1, 3]])
+    assert (multiplicity.tolist() == [2, 4, 16])
 
 
 def test_app_rules():
-    pattern = scattering.pattern.HKLGenerator()
-    pattern.apply_scattering_rules()
+    material = _material('Fd-3m', [5.431, 5.431, 5.431])
+    hkl = material.apply_scattering_rules([[1, 1, 1], [2, 0, 0], [2, 2, 0], [4, 0, 0], [4, 2, 0], [2, 2, 2]])
+    assert (hkl.tolist() == [[1, 1, 1], [2, 2, 0], [4, 0, 0], [2, 2, 2]])
+    assert (material.apply_scattering_rules([[1, 0, 0]], return_mask=True).tolist() == [False])
+
+    material = _material('P-1', [4, 5, 6])
+    assert (material.apply_scattering_rules([[4, 4, 0]]).tolist() == [[4, 4, 0]])
+    hkl, multiplicity = material.generate_hkl_positions(dmin=1.)
+    assert (len(hkl) == len(material.generate_hkl_positions(dmin=1., unique=False)[0]) // 2)
+    assert (np.all(multiplicity == 2))
 
 
 def test_multiplicity():
-    pattern = scattering.pattern.HKLGenerator()
-    pattern.find_site_multiplicity()
+    material = _material('P1', [4, 5, 6])
+    assert (material.find_site_multiplicity([[1, 0, 0], [1, 2, 3]]).tolist() == [2, 2])
+    material = _material('Pm-3m', [4, 4, 4])
+    assert (material.find_site_multiplicity([[1, 0, 0], [1, 1, 0], [1, 1, 1], [1, 2, 0], [1, 2, 3]]).tolist() ==
+            [6, 12, 8, 24, 48])
+
+    material = _material('P6/mmm', [3, 3, 5])
+    assert (material.find_site_multiplicity([[2, 1, 2], [1, 0, 0], [1, 1, 0], [2, 1, 0], [0, 0, 1]]).tolist() ==
+            [24, 6, 6, 12, 2])
+    h, k, l = np.meshgrid(*[np.arange(-3, 4)] * 3, indexing='ij')
+    hkl = np.stack((h.ravel(), k.ravel(), l.ravel()), axis=-1)
+    unique, multiplicity = material.find_equivalent_positions(hkl[np.any(hkl != 0, axis=1)])
+    rotations = np.round(material.space_group.symmetry_operations[:, :3, :3])
+    for q, m in zip(unique, multiplicity):
+        equivalents = np.concatenate((np.dot(q, rotations), -np.dot(q, rotations)))
+        assert (m == len(np.unique(equivalents, axis=0)))
+
+
+def test_powder_pattern():
+    material = _material('Fm-3m', [4.0495, 4.0495, 4.0495])
+    hkl, multiplicity, d, F2 = material.calc_powder_peaks(dmin=1.)
+    assert (np.allclose(F2, np.abs(material.calc_nuc_str_fac(hkl.T)) ** 2))
+    assert (np.allclose(d, [material.get_d_spacing(q) for q in hkl]))
+
+    two_theta = np.linspace(20, 120, 2001)
+    pattern = material.calc_powder_pattern(two_theta, wavelength=2.359, fwhm=0.3, background=1.)
+    assert (np.isclose(two_theta[np.argmax(pattern)], material.get_two_theta([1, 1, 1], 2.359), atol=0.05))
+    assert (np.isclose(pattern.min(), 1.))
+
+    q = np.linspace(0.5, 6, 1001)
+    for profile, fwhm in (('gaussian', lambda x: 0.01 * x), ('lorentzian', 0.02), ('voigt', (0.02, 0.03))):
+        pattern = material.calc_powder_pattern(q, axis='q', fwhm=fwhm, profile=profile)
+        assert (np.isclose(q[np.argmax(pattern)], material.get_q([1, 1, 1]), atol=0.01))
+    with pytest.raises(ValueError):
+        material.calc_powder_pattern(q, axis='d')
 
 
 def test_polarization_correction():
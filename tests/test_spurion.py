@@ -4,6 +4,7 @@ r"""Tests spurion search
 """
 import warnings
 
+import numpy as np
 import pytest
 from mock import patch
 from neutronpy import Instrument, spurion
@@ -19,6 +20,21 @@ def test_aluminum_rings(mock_stdout):
         pytest.fail('Aluminum ring finder failed')
 
 
+def test_powder_lines():
+    """Check powder lines tabulated for several energies
+    """
+    lines = spurion.powder_lines('Cu', [5., 14.7], orders=[1, 2])
+    first = (lines['energy'] == 14.7) & (lines['order'] == 1)
+    assert (lines['hkl'][first][:2].tolist() == [[1, 1, 1], [2, 0, 0]])
+    assert (np.allclose(lines['two_theta'][first][0], 2 * np.rad2deg(np.arcsin(2.3590066 / 2 / (3.6149 / np.sqrt(3))))))
+    assert (np.all(np.diff(lines['energy']) >= 0))
+    assert (len(lines['hkl']) == len(lines['two_theta']) == len(lines['intensity']))
+    assert (np.sum(lines['energy'] == 5.) < np.sum(lines['energy'] == 14.7))
+
+    with patch('sys.stdout'):
+        spurion.copper(5.)
+
+
 def test_currat_axe():
     with warnings.catch_warnings(record=True) as w:
         spurion.currat_axe_peaks(Instrument(), [[0.8, 0.8, 0], [1.2, 1.2, 0], 17], [[1, 1, 0]], angle_tol=1)
@@ -10,7 +10,8 @@ use('Agg')
 
 from mock import patch
 from neutronpy import Material
-from neutronpy.crystal.structure_factors import MagneticFormFactor
+from neutronpy.crystal.structure_factors import (MagneticFormFactor, MagneticFormFactorTable,
+                                                  MagneticStructureFactorEngine, StructureFactorEngine)
 
 
 input = {'name': 'FeTe',
@@ -51,6 +52,29 @@ def test_str_fac():
     assert (np.sum(abs(structure.calc_nuc_str_fac((0, 0, tuple_example))) ** 2) - 16831011.814390473 < 1e-6)
 
 
+def test_str_fac_engine():
+    """Tests batched structure factors and Debye-Waller factors
+    """
+    structure = Material(input)
+    h, k, l = np.meshgrid(np.arange(4), np.arange(4), np.arange(-3, 4), indexing='ij')
+    hkl = np.stack((h.ravel(), k.ravel(), l.ravel()), axis=-1)
+
+    nsf = structure.calc_nuc_str_fac((h, k, l))
+    assert (nsf.shape == h.shape)
+    assert (np.allclose(nsf.ravel(), [structure.calc_nuc_str_fac(tuple(q)) for q in hkl]))
+
+    engine = structure.structure_factor_engine
+    chunked = StructureFactorEngine(engine.positions, engine.b, chunk_size=5)
+    assert (np.allclose(chunked.calculate(hkl, structure.Gstar), nsf.ravel()))
+
+    isotropic = StructureFactorEngine(engine.positions, engine.b, Uiso=0.01)
+    anisotropic = StructureFactorEngine(engine.positions, engine.b, Uaniso=0.01 * np.eye(3))
+    s2 = 1. / np.array([structure.get_d_spacing(q) for q in hkl[1:]]) ** 2
+    assert (np.allclose(isotropic.debye_waller(hkl[1:], structure.Gstar)[:, 0], np.exp(-2 * np.pi ** 2 * 0.01 * s2)))
+    assert (np.allclose(isotropic.calculate(hkl, structure.Gstar), anisotropic.calculate(hkl, structure.Gstar)))
+    assert (engine.debye_waller(hkl, structure.Gstar) is None)
+
+
 def test_N_atoms():
     """Tests number of atoms in X g of material
     """
@@ -123,5 +147,131 @@ def test_mag_form_fac_case2():
     assert (abs(np.sum(formfac) - 74.155233575216599) < 1e-12)
 
 
+def test_mag_form_fac_table():
+    """Tests tabulated magnetic form factors of many ions
+    """
+    table = MagneticFormFactorTable(qmax=10.)
+    ions = ['Fe', 'Co2+', 'Mn3+']
+    q = np.linspace(0, 12, 121).reshape(11, 11)
+
+    ff = table.calc_mag_form_fac(ions, q, g=[2., 1.5, 2.])
+    assert (ff.shape == (3, 11, 11))
+    for ion, g, value in zip(ions, [2., 1.5, 2.], ff):
+        exact = MagneticFormFactor(ion).calc_mag_form_fac(q=q, g=g)[0]
+        assert (np.allclose(value, exact, atol=1e-5))
+        assert (np.allclose(table.calc_mag_form_fac(ion, q, g, interpolate=False), exact))
+        assert (table.accuracy(ion, g) < 1e-5)
+
+    assert (abs(table.calc_mag_form_fac('Fe', 1.) - 0.932565) < 1e-5)
+    assert (table.table('Fe') is table.table('Fe', 2))
+    with pytest.raises(KeyError):
+        table.calc_mag_form_fac('Xx', q)
+
+
+def test_mag_str_fac():
+    """Tests magnetic structure factors and interaction vectors
+    """
+    afm = {'name': 'AFM',
+           'composition': [{'ion': 'Fe', 'pos': [0, 0, 0]}, {'ion': 'Fe', 'pos': [0.5, 0.5, 0.5]}],
+           'massNorm': False,
+           'lattice': dict(abc=[3., 3., 3.], abg=[90, 90, 90]),
+           'magnetic_unit_cell': {'atoms': [{'ion': 'Fe', 'pos': [0, 0, 0], 'moment': [0, 0, 2]},
+                                            {'ion': 'Fe', 'pos': [0.5, 0.5, 0.5], 'moment': [0, 0, -2]}]}}
+    structure = Material(afm)
+    ff = MagneticFormFactorTable().calc_mag_form_fac('Fe', structure.get_q([1, 0, 0]))
+
+    F = structure.calc_mag_str_fac(([1, 1, 0], [0, 1, 0], [0, 0, 1]))
+    assert (F.shape == (3, 3))
+    assert (np.allclose(F[0], [0, 0, 0.2695 * 4 * ff], atol=1e-5) and np.allclose(F[1], 0))
+
+    M = structure.calc_mag_int_vec(([1, 0], [0, 0], [0, 1]))
+    assert (np.allclose(M[0], F[0]) and np.allclose(M[1], 0))
+
+    hexagonal = Material({'name': 'hex', 'composition': [{'ion': 'Fe', 'pos': [0, 0, 0]}], 'massNorm': False,
+                          'lattice': dict(abc=[3., 3., 5.], abg=[90, 90, 120]),
+                          'magnetic_cell': {'atoms': [{'ion': 'Fe', 'pos': [0, 0, 0], 'moment': [1, 0, 0]}]}})
+    M = hexagonal.calc_mag_int_vec((1, 0, 0))
+    F = hexagonal.calc_mag_str_fac((1, 0, 0))
+    assert (np.isclose(np.linalg.norm(M), 0.5 * np.linalg.norm(F)))
+
+    engine = hexagonal.magnetic_structure_factor_engine
+    hkl = np.random.rand(50, 3) * 4
+    chunked = MagneticStructureFactorEngine(engine.positions, engine.moments, engine.ions, chunk_size=7)
+    assert (np.allclose(chunked.interaction_vector(hkl, hexagonal.Gstar),
+                        engine.interaction_vector(hkl, hexagonal.Gstar)))
+
+    with pytest.raises(AttributeError):
+        Material(input).calc_mag_str_fac((1, 0, 0))
+
+
+def test_database_registry():
+    """Tests that databases are loaded once and indexed
+    """
+    import os
+    from neutronpy import constants
+    from neutronpy.constants import DatabaseRegistry
+    from neutronpy.crystal import SpaceGroup
+
+    registry = DatabaseRegistry()
+    assert (registry.element('Fe') is registry.element(26) is registry.element('iron') is registry.element('Fe2+')
+            is registry.element('56Fe'))
+    assert (registry.scattering_length('Fe')['Coh b'] == constants.scattering_lengths()['Fe']['Coh b'])
+    assert (registry.space_group(225) == registry.space_group('Fm-3m'))
+    assert (registry.cache_directory.startswith(os.environ['NEUTRONPY_CACHE_DIR']))
+    with pytest.raises(KeyError):
+        registry.element('Xx')
+    with pytest.raises(KeyError):
+        registry.space_group(231)
+
+    assert (registry.warm_up().loaded == ['magnetic_ion_j', 'periodic_table', 'scattering_lengths', 'symmetry'])
+
+    constants.databases.preload()
+    with patch('json.load') as load:
+        structure = Material(input)
+        MagneticFormFactor('Fe2+')
+        assert (SpaceGroup(129).symbol == SpaceGroup('P4/nmm').symbol)
+        assert (not load.called)
+    assert (structure.muCell == 2 * registry.element('Fe')['mass'] + 2 * registry.element('Te')['mass'])
+
+    table = constants.periodic_table()
+    assert (type(table) is dict and type(table['Fe']) is dict)
+    table['Fe']['mass'] = 0.
+    assert (constants.periodic_table()['Fe']['mass'] == constants.databases.element('Fe')['mass'] > 0)
+    assert (type(constants.symmetry()['space_groups']) is dict)
+
+
+def test_binary_databases(tmpdir):
+    """Tests that binary databases match and are tied to their JSON source
+    """
+    import json
+    import os
+    import shutil
+    from neutronpy import constants
+    from neutronpy.constants import DatabaseRegistry
+
+    source, cache = tmpdir.mkdir('source'), tmpdir.join('cache')
+    shutil.copy(os.path.join(os.path.dirname(constants.__file__), 'database', 'periodic_table.json'), str(source))
+    reference = DatabaseRegistry(binary=False).get('periodic_table')
+
+    registry = DatabaseRegistry(directory=str(source), cache_directory=str(cache))
+    assert (dict(registry.get('periodic_table')) == reference)
+    assert (cache.join('periodic_table.bin').check())
+
+    with patch('json.load') as load, patch('json.loads') as loads:
+        registry = DatabaseRegistry(directory=str(source), cache_directory=str(cache))
+        assert (registry.element(26) == reference['Fe'] and isinstance(registry.element('Fe')['mass'], float))
+        assert (registry.element('Ac')['mass'] == 227 and isinstance(registry.element('Ac')['mass'], int))
+        assert (not load.called and not loads.called)
+
+    modified = dict(reference, Fe=dict(reference['Fe'], mass=56.))
+    source.join('periodic_table.json').write(json.dumps(modified))
+    assert (DatabaseRegistry(directory=str(source), cache_directory=str(cache)).element('Fe')['mass'] == 56.)
+
+    cache.remove()
+    DatabaseRegistry(directory=str(source)).compile(['periodic_table'], directory=str(source))
+    assert (DatabaseRegistry(directory=str(source), cache_directory=str(cache)).element('Fe')['mass'] == 56.)
+    assert (not cache.check())
+
+
 if __name__ == "__main__":
     pytest.main()
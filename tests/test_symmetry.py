@@ -2,6 +2,7 @@
 r"""Tests of space group symmetry operations
 
 """
+import numpy as np
 import pytest
 from neutronpy import symmetry
 
@@ -870,5 +871,51 @@ def test_operators():
             assert (op in symops_str)
 
 
+def test_space_groups():
+    """Tests that the space groups database is loaded on first access
+    """
+    from neutronpy.constants import databases
+    assert (symmetry.space_groups is symmetry.space_groups)
+    assert (len(symmetry.space_groups) == 230 and type(symmetry.space_groups) is dict)
+    assert (symmetry.space_groups['Fm-3m'] == databases.space_group(225)[1])
+    with pytest.raises(AttributeError):
+        symmetry.not_an_attribute
+
+
+def test_operation_tables():
+    """Tests that operation tables are computed once and shared
+    """
+    tables = symmetry.operation_tables()
+    assert (len(tables) == 230)
+    for symbol, operations in tables.items():
+        assert (operations.shape[1:] == (4, 4) and not operations.flags.writeable)
+        assert (symmetry.space_group_operations(symbol) is operations)
+
+    sg = symmetry.SpaceGroup('Fm-3m')
+    assert (sg.symmetry_operations is symmetry.space_group_operations(225))
+    assert (symmetry.space_group_operations(225) is symmetry.space_group_operations(sg.full_name))
+    assert (symmetry.closure(sg.string_generators).shape == (192, 4, 4))
+    assert (symmetry.closure(np.array(sg.generators)).shape == (192, 4, 4))
+    with pytest.raises(ValueError):
+        symmetry.closure(sg.string_generators, 48)
+    with pytest.raises(KeyError):
+        symmetry.space_group_operations('Xx')
+
+
+def test_expand_sites():
+    sg = symmetry.SpaceGroup('Fm-3m')
+    assert (len(sg.symmetrize_position([0, 0, 0])) == 4)
+    assert (len(sg.symmetrize_position([0.25, 0.25, 0.25])) == 8)
+    assert (len(sg.symmetrize_position([0.1, 0.15, 0.37])) == 192)
+
+    positions, occupancies, species, sites = sg.expand_sites([[0, 0, 0], [0.5, 0.5, 0.5 + 1e-6]], [1, 0.5],
+                                                             ['Na', 'Cl'])
+    assert (positions.shape == (8, 3) and np.all((positions >= 0) & (positions < 1)))
+    assert (np.all(occupancies == [1] * 4 + [0.5] * 4))
+    assert (list(species) == ['Na'] * 4 + ['Cl'] * 4)
+    assert (np.all(sites == [0] * 4 + [1] * 4))
+    assert (np.allclose(sorted(positions[:4].sum(axis=1)), [0, 1, 1, 1]))
+
+
 if __name__ == "__main__":
     pytest.main()